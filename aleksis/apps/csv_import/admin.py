@@ -1,5 +1,18 @@
 from django.contrib import admin
 
-from aleksis.apps.csv_import.models import ImportTemplate
+from aleksis.apps.csv_import.models import ImportJob, ImportTemplate
 
 admin.site.register(ImportTemplate)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("template", "school_term", "full_sync", "dry_run", "duplicate_of")
+    readonly_fields = (
+        "diff",
+        "stats",
+        "errors_file",
+        "profile_file",
+        "content_hash",
+        "duplicate_of",
+    )
@@ -1,4 +1,5 @@
-from django.db import OperationalError, ProgrammingError
+import django.apps
+from django.db.models.signals import post_delete, post_save, pre_save
 
 from aleksis.core.util.apps import AppConfig
 
@@ -22,13 +23,35 @@ class CSVImportConfig(AppConfig):
     def ready(self):
         super().ready()
 
-        # Create default import templates
-        try:
-            from aleksis.apps.csv_import.default_templates import (  # noqa
-                update_or_create_default_templates,
-            )
+        from aleksis.apps.csv_import.field_types import field_type_registry
+        from aleksis.apps.csv_import.util.class_range_helpers import (
+            group_deleted,
+            group_saved,
+            group_saving,
+        )
+        from aleksis.apps.csv_import.util.references import delete_references, sync_references
+        from aleksis.core.models import Group
 
-            update_or_create_default_templates()
-        except (ProgrammingError, OperationalError):
-            # Catch if there are no migrations yet
-            pass  # noqa
+        pre_save.connect(group_saving, sender=Group)
+        post_save.connect(group_saved, sender=Group)
+        post_delete.connect(group_deleted, sender=Group)
+        for model in field_type_registry.allowed_models:
+            post_save.connect(sync_references, sender=model)
+            post_delete.connect(delete_references, sender=model)
+
+    def post_migrate(
+        self,
+        app_config: django.apps.AppConfig,
+        verbosity: int,
+        interactive: bool,
+        using: str,
+        **kwargs,
+    ) -> None:
+        super().post_migrate(app_config, verbosity, interactive, using, **kwargs)
+
+        # Create default import templates after migrations instead of on every start
+        from aleksis.apps.csv_import.default_templates import (  # noqa
+            update_or_create_default_templates,
+        )
+
+        update_or_create_default_templates()
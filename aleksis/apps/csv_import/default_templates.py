@@ -1,8 +1,11 @@
+import hashlib
+import json
 import os
 from typing import Sequence
 
 from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from django.db.models import Model
 
 import toml
@@ -12,12 +15,23 @@ from .models import ImportTemplate, ImportTemplateField
 
 
 def update_or_create_template(
-    model: Model, name: str, verbose_name: str, extra_args: dict, fields: Sequence[FieldType],
+    model: Model,
+    name: str,
+    verbose_name: str,
+    extra_args: dict,
+    fields: Sequence[FieldType],
+    checksum: str = "",
 ):
     """Update or create an import template in database."""
     ct = ContentType.objects.get_for_model(model)
     template, updated = ImportTemplate.objects.update_or_create(
-        name=name, defaults={"verbose_name": verbose_name, "content_type": ct, **extra_args},
+        name=name,
+        defaults={
+            "verbose_name": verbose_name,
+            "content_type": ct,
+            "default_checksum": checksum,
+            **extra_args,
+        },
     )
 
     for i, field in enumerate(fields):
@@ -28,18 +42,51 @@ def update_or_create_template(
     ImportTemplateField.objects.filter(template=template, index__gt=i).delete()
 
 
-def update_or_create_default_templates():
-    """Update or create default import templates."""
-    template_defs = toml.load(os.path.join(os.path.dirname(__file__), "default_templates.toml"))
+def get_default_template_definitions() -> dict:
+    """Get the definitions of all default import templates by their names."""
+    return toml.load(os.path.join(os.path.dirname(__file__), "default_templates.toml"))
 
+
+def get_template_checksum(name: str, definition: dict) -> str:
+    """Get a checksum of the definition of a default template and of the field type registry."""
+    data = [name, definition, sorted(field_type_registry.field_types.keys())]
+    return hashlib.sha1(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def update_or_create_default_templates(force: bool = False) -> int:
+    """Update or create default import templates.
+
+    Templates whose definitions did not change since they were last written
+    are skipped, so nothing is written if all templates are up to date.
+
+    :param force: Write all templates, even if their definitions did not change
+    :return: Number of written templates
+    """
+    template_defs = get_default_template_definitions()
+    checksums = {name: get_template_checksum(name, defs) for name, defs in template_defs.items()}
+    stored_checksums = dict(
+        ImportTemplate.objects.filter(name__in=checksums.keys()).values_list(
+            "name", "default_checksum"
+        )
+    )
+
+    written = 0
     for name, defs in template_defs.items():
+        if not force and stored_checksums.get(name) == checksums[name]:
+            continue
+
         model = apps.get_model(defs["model"])
         fields = [field_type_registry.get_from_name(field_type) for field_type in defs["fields"]]
 
-        update_or_create_template(
-            model,
-            name=name,
-            verbose_name=defs.get("verbose_name", ""),
-            extra_args=defs.get("extra_args", {}),
-            fields=fields,
-        )
+        with transaction.atomic():
+            update_or_create_template(
+                model,
+                name=name,
+                verbose_name=defs.get("verbose_name", ""),
+                extra_args=defs.get("extra_args", {}),
+                fields=fields,
+                checksum=checksums[name],
+            )
+        written += 1
+
+    return written
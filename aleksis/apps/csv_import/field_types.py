@@ -1,25 +1,26 @@
-from typing import Callable, Optional, Sequence, Tuple, Type
+from functools import partial
+from typing import Callable, Dict, Optional, Sequence, Tuple, Type
 from uuid import uuid4
 
 from django.apps import apps
+from django.db import transaction
 from django.db.models import Model
 from django.utils.functional import classproperty
 from django.utils.translation import gettext as _
 
-from aleksis.apps.csv_import.util.class_range_helpers import (
-    get_classes_per_grade,
-    get_classes_per_short_name,
-    parse_class_range,
-)
+from aleksis.apps.csv_import.util.class_range_helpers import ClassRangeResolver
+from aleksis.apps.csv_import.util.context import ImportContext
 from aleksis.apps.csv_import.util.converters import (
+    parse_booleans,
     parse_comma_separated_data,
     parse_date,
+    parse_dates,
     parse_phone_number,
     parse_sex,
+    parse_sexes,
 )
 from aleksis.apps.csv_import.util.import_helpers import bulk_get_or_create, with_prefix
-from aleksis.core.models import Group, Person, SchoolTerm
-from aleksis.core.util.core_helpers import get_site_preferences
+from aleksis.core.models import Group, Person
 
 
 class FieldType:
@@ -28,6 +29,14 @@ class FieldType:
     models: Sequence = []
     data_type: type = str
     converter: Optional[Callable] = None
+    column_converter: Optional[Callable] = None
+    # Arguments of the converters which are filled from the import context
+    converter_settings: Dict[str, str] = {}
+    # Values repeat across many rows, so parsers may store the column as categorical
+    low_cardinality: bool = False
+    # Related objects are created in prepare_chunk, so partitions of an import
+    # must not prepare the same values at the same time
+    creates_related: bool = False
     alternative: Optional[str] = None
 
     @classproperty
@@ -35,8 +44,35 @@ class FieldType:
         return cls.name
 
     @classmethod
-    def prepare(cls, school_term: SchoolTerm):
-        cls.school_term = school_term
+    def prepare(cls, context: ImportContext):
+        """Prepare field type for an import job.
+
+        Field types which look up other objects should load them
+        into the lookup index here, so processing a row costs no query.
+        """
+        cls.context = context
+        cls.school_term = context.school_term
+        cls.lookup_index = context.lookup_index
+
+    @classmethod
+    def prepare_chunk(cls, values: Sequence):
+        """Prepare field type for the values of one chunk of the file.
+
+        Field types which need related objects for their values should
+        get or create them here at once instead of for every row.
+        """
+
+    @classmethod
+    def get_converter(cls, context: ImportContext) -> Optional[Callable]:
+        """Get the converter for single values with settings from the import context."""
+        if cls.converter and not cls.column_converter:
+            return context.bind(cls.converter, cls.converter_settings)
+
+    @classmethod
+    def get_column_converter(cls, context: ImportContext) -> Optional[Callable]:
+        """Get the converter for whole columns with settings from the import context."""
+        if cls.column_converter:
+            return context.bind(cls.column_converter, cls.converter_settings)
 
 
 class MatchFieldType(FieldType):
@@ -76,6 +112,7 @@ class FieldTypeRegistry:
         self.allowed_field_types_for_models = {}
         self.allowed_models = set()
         self.converters = {}
+        self.column_converters = {}
         self.alternatives = {}
         self.match_field_types = []
         self.process_field_types = []
@@ -93,7 +130,10 @@ class FieldTypeRegistry:
             self.allowed_field_types_for_models.setdefault(model, []).append(field_type)
             self.allowed_models.add(model)
 
-        if field_type.converter:
+        # Converters for whole columns are preferred over converters for single values
+        if field_type.column_converter:
+            self.column_converters[field_type.name] = field_type.column_converter
+        elif field_type.converter:
             self.converters[field_type.name] = field_type.converter
 
         if field_type.alternative:
@@ -118,7 +158,13 @@ class FieldTypeRegistry:
 
     @property
     def unique_references_by_priority(self) -> Sequence[FieldType]:
-        return sorted(self.match_field_types)
+        """Return all match field types, the one with the highest priority first."""
+        return [
+            field_type
+            for __, field_type in sorted(
+                self.match_field_types, key=lambda item: item[0], reverse=True
+            )
+        ]
 
 
 field_type_registry = FieldTypeRegistry()
@@ -140,8 +186,10 @@ class IsActiveFieldType(DirectMappingFieldType):
     name = "is_active"
     verbose_name = _("Is active? (0/1)")
     models = [Person]
+    low_cardinality = True
     db_field = "is_active"
     data_type = bool
+    column_converter = parse_booleans
 
 
 @field_type_registry.register
@@ -203,6 +251,8 @@ class DateOfBirthFieldType(DirectMappingFieldType):
     models = [Person]
     db_field = "date_of_birth"
     converter = parse_date
+    column_converter = parse_dates
+    converter_settings = {"languages": "date_languages"}
 
 
 @field_type_registry.register
@@ -210,8 +260,10 @@ class SexFieldType(DirectMappingFieldType):
     name = "sex"
     verbose_name = _("Sex")
     models = [Person]
+    low_cardinality = True
     db_field = "sex"
     converter = parse_sex
+    column_converter = parse_sexes
 
 
 @field_type_registry.register
@@ -253,6 +305,7 @@ class PhoneNumberFieldType(DirectMappingFieldType):
     models = [Person]
     db_field = "phone_number"
     converter = parse_phone_number
+    converter_settings = {"country": "phone_number_country"}
 
 
 @field_type_registry.register
@@ -262,6 +315,7 @@ class MobileNumberFieldType(DirectMappingFieldType):
     models = [Person]
     db_field = "mobile_number"
     converter = parse_phone_number
+    converter_settings = {"country": "phone_number_country"}
 
 
 @field_type_registry.register
@@ -280,42 +334,76 @@ class DepartmentsFieldType(ProcessFieldType):
     name = "departments"
     verbose_name = _("Comma-seperated list of departments")
     models = [Person]
+    low_cardinality = True
+    creates_related = True
     converter = parse_comma_separated_data
 
-    def process(self, instance: Model, value):
-        with_chronos = apps.is_installed("aleksis.apps.chronos")
-        if with_chronos:
-            Subject = apps.get_model("chronos", "Subject")
+    @classmethod
+    def prepare(cls, context: ImportContext):
+        super().prepare(context)
+        cls.groups = {}
 
-        group_type = get_site_preferences()["csv_import__group_type_departments"]
-        group_prefix = get_site_preferences()["csv_import__group_prefix_departments"]
+    @classmethod
+    def prepare_chunk(cls, values: Sequence):
+        """Get or create the subjects and groups of all departments of a chunk at once."""
+        short_names = {short_name for value in values if value for short_name in value}
+        if not short_names:
+            cls.groups = {}
+            return
+
+        names = {short_name: short_name for short_name in short_names}
+        subjects = {}
+        if cls.context.with_chronos:
+            Subject = apps.get_model("chronos", "Subject")
 
-        groups = []
-        for subject_name in value:
-            if with_chronos:
-                # Get department subject
-                subject, __ = Subject.objects.get_or_create(
-                    short_name=subject_name, defaults={"name": subject_name}
+            subjects = {
+                subject.short_name: subject
+                for subject in Subject.objects.filter(short_name__in=short_names)
+            }
+            new_subjects = [
+                Subject(short_name=short_name, name=short_name)
+                for short_name in short_names
+                if short_name not in subjects
+            ]
+            if new_subjects:
+                Subject.objects.bulk_create(new_subjects)
+                # Not all databases return primary keys of bulk created objects
+                subjects = {
+                    subject.short_name: subject
+                    for subject in Subject.objects.filter(short_name__in=short_names)
+                }
+            names = {short_name: subject.name for short_name, subject in subjects.items()}
+
+        group_type = cls.context.group_type_departments
+        group_prefix = cls.context.group_prefix_departments
+        groups = {
+            group.short_name: group
+            for group in Group.objects.filter(group_type=group_type, short_name__in=short_names)
+        }
+
+        for short_name in short_names:
+            group = groups.get(short_name)
+            subject = subjects.get(short_name)
+            if not group:
+                # New groups have to be saved one by one to create their Django groups
+                group = Group(
+                    group_type=group_type,
+                    short_name=short_name,
+                    name=with_prefix(group_prefix, names[short_name]),
                 )
-                name = subject.name
-                short_name = subject.short_name
-            else:
-                name = subject_name
-                short_name = subject_name
-
-            # Get department group
-            group, __ = Group.objects.get_or_create(
-                group_type=group_type,
-                short_name=short_name,
-                defaults={"name": with_prefix(group_prefix, name)},
-            )
-            if with_chronos:
+                if subject:
+                    group.subject = subject
+                group.save()
+                groups[short_name] = group
+            elif subject and group.subject_id != subject.pk:
                 group.subject = subject
-            group.save()
+                group.save()
 
-            groups.append(group)
+        cls.groups = groups
 
-        instance.member_of.add(*groups)
+    def process(self, instance: Model, value):
+        groups = [self.groups[short_name] for short_name in value]
+        self.context.m2m_writer.add(instance, "member_of", groups)
 
 
 @field_type_registry.register
@@ -323,11 +411,31 @@ class GroupSubjectByShortNameFieldType(ProcessFieldType):
     name = "group_subject_short_name"
     verbose_name = _("Short name of the subject")
     models = [Group]
+    low_cardinality = True
+
+    @classmethod
+    def prepare(cls, context: ImportContext):
+        """Prefetch subjects."""
+        super().prepare(context)
+        if context.with_chronos:
+            context.lookup_index.load(apps.get_model("chronos", "Subject"), "short_name")
 
     def process(self, instance: Model, value):
-        subject = get_subject_by_short_name(value)
-        instance.subject = subject
-        instance.save()
+        if not self.context.with_chronos:
+            raise RuntimeError(
+                _(f"{instance}: Failed to import the subject: Chronos is not installed.")
+            )
+
+        Subject = apps.get_model("chronos", "Subject")
+        try:
+            subject = self.lookup_index.get(Subject, "short_name", value)
+        except Subject.DoesNotExist:
+            raise RuntimeError(
+                _(f"{instance}: Failed to import the subject: Subject {value} does not exist.")
+            )
+        if instance.subject_id != subject.pk:
+            instance.subject = subject
+            instance.save()
 
 
 @field_type_registry.register
@@ -335,16 +443,17 @@ class ClassRangeFieldType(ProcessFieldType):
     name = "class_range"
     verbose_name = _("Class range (e. g. 7a-d)")
     models = [Group]
+    low_cardinality = True
 
     @classmethod
-    def prepare(cls, school_term: SchoolTerm):
-        """Prefetch class groups."""
-        cls.classes_per_short_name = get_classes_per_short_name(school_term)
-        cls.classes_per_grade = get_classes_per_grade(cls.classes_per_short_name.keys())
+    def prepare(cls, context: ImportContext):
+        """Get the resolver for the classes of the school term."""
+        super().prepare(context)
+        cls.resolver = ClassRangeResolver.for_school_term(context.school_term)
 
     def process(self, instance: Model, value):
-        classes = parse_class_range(self.classes_per_short_name, self.classes_per_grade, value,)
-        instance.parent_groups.set(classes)
+        classes = self.resolver.resolve(value)
+        self.context.m2m_writer.add(instance, "parent_groups", classes, sync=True)
 
 
 @field_type_registry.register
@@ -352,13 +461,21 @@ class PrimaryGroupByShortNameFieldType(ProcessFieldType):
     name = "primary_group_short_name"
     verbose_name = _("Short name of the person's primary group")
     models = [Person]
+    low_cardinality = True
+
+    @classmethod
+    def prepare(cls, context: ImportContext):
+        """Prefetch groups of the school term."""
+        super().prepare(context)
+        context.lookup_index.load(Group, "short_name", school_term=context.school_term)
 
     def process(self, instance: Model, value):
         try:
-            group = Group.objects.get(short_name=value, school_term=self.school_term)
-            instance.primary_group = group
-            instance.member_of.add(group)
-            instance.save()
+            group = self.lookup_index.get(Group, "short_name", value, school_term=self.school_term)
+            self.context.m2m_writer.add(instance, "member_of", [group])
+            if instance.primary_group_id != group.pk:
+                instance.primary_group = group
+                instance.save()
         except Group.DoesNotExist:
             raise RuntimeError(
                 _(
@@ -373,16 +490,38 @@ class GroupOwnerByShortNameFieldType(MultipleValuesFieldType):
     name = "group_owner_short_name"
     verbose_name = _("Short name of a single group owner")
     models = [Group]
+    low_cardinality = True
+    creates_related = True
 
-    def process(self, instance: Model, values: Sequence):
-        group_owners = bulk_get_or_create(
+    @classmethod
+    def prepare(cls, context: ImportContext):
+        super().prepare(context)
+        cls.owners = {}
+        cls.new_owners = {}
+
+    @classmethod
+    def prepare_chunk(cls, values: Sequence):
+        """Get or create all group owners of a chunk which were not seen in the file before."""
+        short_names = {value for value in values if value} - cls.owners.keys()
+        cls.new_owners = {}
+        if not short_names:
+            return
+
+        cls.new_owners = bulk_get_or_create(
             Person,
-            values,
+            short_names,
             attr="short_name",
             default_attrs="last_name",
             defaults={"first_name": "?"},
         )
-        instance.owners.set(group_owners)
+        # Created persons only exist if the transaction of the chunk is not rolled back
+        transaction.on_commit(partial(cls.owners.update, cls.new_owners))
+
+    def process(self, instance: Model, values: Sequence):
+        group_owners = [
+            self.owners.get(value) or self.new_owners[value] for value in values if value
+        ]
+        self.context.m2m_writer.add(instance, "owners", group_owners, sync=True)
 
 
 @field_type_registry.register
@@ -391,10 +530,20 @@ class GroupMembershipByShortNameFieldType(MultipleValuesFieldType):
     verbose_name = _("Short name of the group the person is a member of")
 
     models = [Person]
+    low_cardinality = True
+
+    @classmethod
+    def prepare(cls, context: ImportContext):
+        """Prefetch groups of the school term."""
+        super().prepare(context)
+        context.lookup_index.load(Group, "short_name", school_term=context.school_term)
 
     def process(self, instance: Model, values: Sequence):
-        groups = Group.objects.filter(short_name__in=values, school_term=self.school_term)
-        instance.member_of.add(*groups)
+        groups = self.lookup_index.filter(Group, "short_name", values, school_term=self.school_term)
+        self.context.m2m_writer.add(instance, "member_of", groups)
+        # Groups which do not exist are skipped
+        if {value for value in values if value} - {group.short_name for group in groups}:
+            self.context.unresolved = True
 
 
 @field_type_registry.register
@@ -403,6 +552,11 @@ class ChildByUniqueReference(ProcessFieldType):
     verbose_name = _("Child by unique reference (from students import)")
     models = [Person]
 
+    @classmethod
+    def prepare_chunk(cls, values: Sequence):
+        """Fetch the children of all rows of a chunk at once."""
+        cls.lookup_index.load(Person, "import_ref_csv", {value for value in values if value})
+
     def process(self, instance: Model, value):
-        child = Person.objects.get(import_ref_csv=value)
-        instance.children.add(child)
+        child = self.lookup_index.get(Person, "import_ref_csv", value)
+        self.context.m2m_writer.add(instance, "children", [child])
@@ -2,7 +2,11 @@ from django import forms
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
-from aleksis.apps.csv_import.models import ImportTemplate
+from aleksis.apps.csv_import.models import (
+    PARSER_ENGINE_CHOICES,
+    ImportTemplate,
+    validate_parser_engine,
+)
 from aleksis.core.models import SchoolTerm
 
 
@@ -14,11 +18,52 @@ class CSVUploadForm(forms.Form):
     template = forms.ModelChoiceField(
         queryset=ImportTemplate.objects.all(), label=_("Import template")
     )
+    full_sync = forms.BooleanField(
+        required=False,
+        label=_("Deactivate objects missing in the file"),
+        help_text=_(
+            "If enabled, all persons with an import reference which are not included "
+            "in the file will be deactivated."
+        ),
+    )
+    dry_run = forms.BooleanField(
+        required=False,
+        label=_("Dry run"),
+        help_text=_(
+            "If enabled, only the number of objects which would be created, updated "
+            "or deactivated is shown. Nothing is written to the database."
+        ),
+    )
+    force = forms.BooleanField(
+        required=False,
+        label=_("Import even if the file was already imported"),
+        help_text=_(
+            "If disabled, files which were already imported with the same template "
+            "and school term are not imported again."
+        ),
+    )
+    parser_engine = forms.ChoiceField(
+        required=False,
+        choices=[("", _("CSV parser of the import template"))] + PARSER_ENGINE_CHOICES,
+        validators=[validate_parser_engine],
+        label=_("CSV parser"),
+    )
+    profile = forms.BooleanField(
+        required=False,
+        label=_("Profile the import"),
+        help_text=_(
+            "If enabled, the import is run under a profiler. A report of the slowest "
+            "functions and the largest memory allocations is attached to the import job."
+        ),
+    )
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, user=None, **kwargs):
         try:
             school_terms = SchoolTerm.objects.on_day(timezone.now().date())
             kwargs["initial"] = {"school_term": school_terms[0] if school_terms.exists() else None}
         except SchoolTerm.DoesNotExist:
             pass
         super().__init__(*args, **kwargs)
+
+        if not user or not user.has_perm("csv_import.profile_import_rule"):
+            del self.fields["profile"]
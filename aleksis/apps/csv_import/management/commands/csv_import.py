@@ -1,26 +1,127 @@
-from django.core.management.base import BaseCommand
+import os
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
-from aleksis.apps.csv_import.models import ImportTemplate
-from aleksis.apps.csv_import.util.process import import_csv
-from aleksis.core.util import messages
+from aleksis.apps.csv_import.models import ImportJob, ImportTemplate
+from aleksis.apps.csv_import.settings import PROGRESS_INTERVAL
+from aleksis.apps.csv_import.util.process import start_import
+from aleksis.apps.csv_import.util.reader import PARSER_ENGINES
+from aleksis.apps.csv_import.util.stats import format_stats
+from aleksis.core.models import SchoolTerm
 
 
 class Command(BaseCommand):
     def add_arguments(self, parser):
+        parser.add_argument("csv_path", help=_("Path to CSV file with exported teachers"))
+        parser.add_argument("template", help=_("Name of import template which should be used"))
+        parser.add_argument(
+            "--school-term",
+            type=int,
+            help=_("ID of the related school term (defaults to the current school term)"),
+        )
+        parser.add_argument(
+            "--full-sync", action="store_true", help=_("Deactivate objects missing in the file"),
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help=_("Only show changes without writing them to the database"),
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help=_("Import even if the file was already imported"),
+        )
+        parser.add_argument(
+            "--progress-interval",
+            type=float,
+            default=PROGRESS_INTERVAL,
+            help=_("Minimum number of seconds between progress updates"),
+        )
         parser.add_argument(
-            "csv_path", help=_("Path to CSV file with exported teachers"), required=True
+            "--parser-engine",
+            choices=PARSER_ENGINES,
+            default="",
+            help=_("CSV parser to use (defaults to the parser of the import template)"),
         )
         parser.add_argument(
-            "template", help=_("Name of import template which should be used"), required=True,
+            "--profile",
+            action="store_true",
+            help=_("Run the import under a profiler and attach a report to the import job"),
+        )
+        parser.add_argument(
+            "--stats",
+            action="store_true",
+            help=_("Show time and database queries spent in each phase of the import"),
         )
 
     def handle(self, *args, **options):
         template_name = options["template"]
         try:
-            template = ImportTemplate.objects.get(name=template_name).pk
+            template = ImportTemplate.objects.get(name=template_name)
         except ImportTemplate.DoesNotExist:
-            messages.error(None, _("The provided template does not exist."))
+            raise CommandError(_("The provided template does not exist."))
+
+        if options["school_term"]:
+            try:
+                school_term = SchoolTerm.objects.get(pk=options["school_term"])
+            except SchoolTerm.DoesNotExist:
+                raise CommandError(_("The provided school term does not exist."))
+        else:
+            school_term = SchoolTerm.objects.on_day(timezone.now().date()).first()
+
+        csv_path = options["csv_path"]
+        with open(csv_path, "rb") as f:
+            import_job = ImportJob(
+                template=template,
+                school_term=school_term,
+                full_sync=options["full_sync"],
+                dry_run=options["dry_run"],
+                force=options["force"],
+                parser_engine=options["parser_engine"],
+                profile=options["profile"],
+                progress_interval=options["progress_interval"],
+            )
+            import_job.attach_file(File(f, name=os.path.basename(csv_path)))
+
+        start_import(import_job).wait()
+
+        import_job.refresh_from_db()
+        if import_job.duplicate_of:
+            self.stdout.write(
+                _(
+                    f"The file was already imported with import job "
+                    f"{import_job.duplicate_of.pk}. Use --force to import it again."
+                )
+            )
             return
 
-        import_csv.delay(template, options["csv_path"])
+        diff = import_job.diff
+        self.stdout.write(
+            _(
+                f"Created: {diff.get('created', 0)}, updated: {diff.get('updated', 0)}, "
+                f"unchanged: {diff.get('unchanged', 0)}, "
+                f"deactivated: {diff.get('deactivated', 0)}, failed: {diff.get('failed', 0)}"
+            )
+        )
+
+        if options["dry_run"]:
+            for change in diff.get("changes", []):
+                self.stdout.write(f"{change['action']} {change['reference']}")
+                for name, (old_value, new_value) in change["fields"].items():
+                    self.stdout.write(f"  {name}: {old_value!r} -> {new_value!r}")
+            if diff.get("truncated"):
+                self.stdout.write(_("Further changes were omitted."))
+
+        # Files are printed by their name in the storage, which might not be a local file system
+        if import_job.errors_file:
+            self.stdout.write(_(f"Failed rows: {import_job.errors_file.name}"))
+        if import_job.profile_file:
+            self.stdout.write(_(f"Profiling report: {import_job.profile_file.name}"))
+
+        if options["stats"] and import_job.stats:
+            for line in format_stats(import_job.stats):
+                self.stdout.write(line)
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.translation import gettext as _
+
+from aleksis.apps.csv_import.util.benchmark import get_benchmark_names, run_benchmark
+from aleksis.apps.csv_import.util.reader import PARSER_ENGINES, is_parser_engine_available
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "templates", nargs="*", help=_("Names of default templates (defaults to all)")
+        )
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[1000], help=_("Numbers of rows to import"),
+        )
+        parser.add_argument("--seed", type=int, default=0, help=_("Seed of the generated files"))
+        parser.add_argument(
+            "--engines",
+            nargs="+",
+            choices=PARSER_ENGINES,
+            default=[""],
+            help=_("CSV parsers to compare (defaults to the parser of each template)"),
+        )
+
+    def handle(self, *args, **options):
+        names = options["templates"] or get_benchmark_names()
+        for name in names:
+            if name not in get_benchmark_names():
+                raise CommandError(_(f"There is no default template named {name}."))
+        for engine in options["engines"]:
+            if engine and not is_parser_engine_available(engine):
+                raise CommandError(_(f"The CSV parser {engine} is not installed."))
+
+        for name in names:
+            for rows in options["rows"]:
+                for engine in options["engines"]:
+                    # All imported data is removed again after each benchmark
+                    with transaction.atomic():
+                        result = run_benchmark(name, rows, options["seed"], engine=engine)
+                        transaction.set_rollback(True)
+
+                    self.stdout.write(
+                        f"{name} ({rows} rows, {result.engine}): "
+                        f"{result.rows_per_second:.1f} rows/s, "
+                        f"{result.read_seconds:.2f} s reading, "
+                        f"{result.queries_per_row:.3f} queries/row, "
+                        f"{result.peak_memory / 2 ** 20:.1f} MiB peak memory, "
+                        f"{result.progress_updates} progress updates, {result.errors} errors, "
+                        f"{result.failed} failed rows"
+                    )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.utils.translation import gettext as _
+
+from aleksis.apps.csv_import.default_templates import update_or_create_default_templates
+
+
+class Command(BaseCommand):
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help=_("Write all default templates, even if they did not change"),
+        )
+
+    def handle(self, *args, **options):
+        written = update_or_create_default_templates(force=options["force"])
+        self.stdout.write(_(f"{written} default templates were updated or created."))
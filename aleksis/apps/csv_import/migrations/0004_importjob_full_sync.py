@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2021-07-03 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0003_fix_uniqueness_per_site'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='full_sync',
+            field=models.BooleanField(default=False, help_text='If enabled, all objects with an import reference which are not included in the file will be deactivated.', verbose_name='Deactivate objects missing in the file'),
+        ),
+    ]
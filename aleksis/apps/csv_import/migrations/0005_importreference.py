@@ -0,0 +1,70 @@
+# Generated by Django 3.2.4 on 2021-07-03 14:37
+
+import django.contrib.sites.managers
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def migrate_import_references(apps, schema_editor):
+    """Copy import references from the extended data of persons and groups."""
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    ImportReference = apps.get_model("csv_import", "ImportReference")
+
+    for model_name in ("Person", "Group"):
+        model = apps.get_model("core", model_name)
+        content_type = ContentType.objects.get_for_model(model)
+
+        qs = model._base_manager.filter(extended_data__has_key="import_ref_csv")
+        references = [
+            ImportReference(
+                site_id=obj.site_id,
+                content_type=content_type,
+                object_id=obj.pk,
+                source="csv",
+                reference=obj.extended_data["import_ref_csv"],
+            )
+            for obj in qs.only("pk", "site_id", "extended_data")
+            if obj.extended_data["import_ref_csv"]
+        ]
+        ImportReference.objects.bulk_create(references, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('sites', '0002_alter_domain_unique'),
+        ('core', '0019_fix_uniqueness_per_site'),
+        ('csv_import', '0004_importjob_full_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('extended_data', models.JSONField(default=dict, editable=False)),
+                ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                ('source', models.CharField(default='csv', max_length=255, verbose_name='Source')),
+                ('reference', models.CharField(max_length=255, verbose_name='Reference')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='contenttypes.contenttype', verbose_name='Content type')),
+                ('site', models.ForeignKey(default=1, editable=False, on_delete=django.db.models.deletion.CASCADE, to='sites.site')),
+            ],
+            options={
+                'verbose_name': 'Import reference',
+                'verbose_name_plural': 'Import references',
+            },
+            managers=[
+                ('objects', django.contrib.sites.managers.CurrentSiteManager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='importreference',
+            index=models.Index(fields=['content_type', 'object_id'], name='import_reference_object'),
+        ),
+        migrations.AddConstraint(
+            model_name='importreference',
+            constraint=models.UniqueConstraint(fields=('site_id', 'content_type', 'source', 'reference'), name='unique_import_reference_per_site'),
+        ),
+        migrations.RunPython(migrate_import_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.4 on 2021-07-10 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0005_importreference'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='dry_run',
+            field=models.BooleanField(default=False, help_text='If enabled, changes are only computed and not written to the database.', verbose_name='Dry run'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='diff',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Summary of changes'),
+        ),
+    ]
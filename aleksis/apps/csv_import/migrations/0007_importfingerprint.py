@@ -0,0 +1,38 @@
+# Generated by Django 3.2.4 on 2021-07-11 09:02
+
+import django.contrib.sites.managers
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0002_alter_domain_unique'),
+        ('csv_import', '0006_importjob_dry_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('extended_data', models.JSONField(default=dict, editable=False)),
+                ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                ('fingerprint', models.CharField(max_length=40, verbose_name='Fingerprint')),
+                ('site', models.ForeignKey(default=1, editable=False, on_delete=django.db.models.deletion.CASCADE, to='sites.site')),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprints', to='csv_import.importtemplate', verbose_name='Import template')),
+            ],
+            options={
+                'verbose_name': 'Import fingerprint',
+                'verbose_name_plural': 'Import fingerprints',
+            },
+            managers=[
+                ('objects', django.contrib.sites.managers.CurrentSiteManager()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='importfingerprint',
+            constraint=models.UniqueConstraint(fields=('template', 'object_id'), name='unique_fingerprint_per_template_object'),
+        ),
+    ]
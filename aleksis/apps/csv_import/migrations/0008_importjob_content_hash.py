@@ -0,0 +1,29 @@
+# Generated by Django 3.2.4 on 2021-07-11 16:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0007_importfingerprint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, verbose_name='Content hash'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='force',
+            field=models.BooleanField(default=False, help_text='If disabled, files which were already imported with the same template and school term are not imported again.', verbose_name='Import even if the file was already imported'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='csv_import.importjob', verbose_name='Duplicate of'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2021-07-12 10:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0008_importjob_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='stats',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Statistics'),
+        ),
+    ]
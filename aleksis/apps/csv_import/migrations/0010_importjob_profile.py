@@ -0,0 +1,23 @@
+# Generated by Django 3.2.4 on 2021-07-12 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0009_importjob_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='profile',
+            field=models.BooleanField(default=False, help_text='If enabled, the import is run under a profiler and a report is attached to the import job.', verbose_name='Profile the import'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='profile_file',
+            field=models.FileField(blank=True, editable=False, upload_to='csv_import/profiles/', verbose_name='Profiling report'),
+        ),
+    ]
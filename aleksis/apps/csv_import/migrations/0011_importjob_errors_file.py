@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2021-07-13 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0010_importjob_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='errors_file',
+            field=models.FileField(blank=True, editable=False, upload_to='csv_import/errors/', verbose_name='Error report'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.4 on 2021-07-13 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0011_importjob_errors_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='progress_interval',
+            field=models.FloatField(default=1.0, help_text='The progress of the import is reported at most this often.', verbose_name='Seconds between progress updates'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='progress_rows',
+            field=models.PositiveIntegerField(default=0, help_text='If set, progress is also reported after this number of rows, even if the interval has not passed yet.', verbose_name='Rows between progress updates'),
+        ),
+    ]
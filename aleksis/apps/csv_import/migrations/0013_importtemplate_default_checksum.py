@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2021-07-14 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0012_importjob_progress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importtemplate',
+            name='default_checksum',
+            field=models.CharField(blank=True, editable=False, max_length=40, verbose_name='Checksum of the default template definition'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.4 on 2021-07-15 10:41
+
+import aleksis.apps.csv_import.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0013_importtemplate_default_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importtemplate',
+            name='parser_engine',
+            field=models.CharField(choices=[('pandas', 'pandas'), ('arrow', 'PyArrow (fastest for large files)'), ('csv', 'Python csv module (fastest for small files)')], default='pandas', max_length=10, validators=[aleksis.apps.csv_import.models.validate_parser_engine], verbose_name='CSV parser'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='parser_engine',
+            field=models.CharField(blank=True, choices=[('pandas', 'pandas'), ('arrow', 'PyArrow (fastest for large files)'), ('csv', 'Python csv module (fastest for small files)')], help_text='If not set, the CSV parser of the import template is used.', max_length=10, validators=[aleksis.apps.csv_import.models.validate_parser_engine], verbose_name='CSV parser'),
+        ),
+    ]
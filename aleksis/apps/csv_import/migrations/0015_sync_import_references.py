@@ -0,0 +1,45 @@
+# Generated by Django 3.2.4 on 2021-07-16 09:12
+
+from django.db import migrations
+
+
+def sync_import_references(apps, schema_editor):
+    """Remove references of deleted objects and add references set after 0005."""
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    ImportReference = apps.get_model("csv_import", "ImportReference")
+
+    for model_name in ("Person", "Group"):
+        model = apps.get_model("core", model_name)
+        content_type = ContentType.objects.get_for_model(model)
+
+        references = ImportReference.objects.filter(content_type=content_type)
+        references.exclude(object_id__in=model._base_manager.values("pk")).delete()
+
+        qs = model._base_manager.filter(extended_data__has_key="import_ref_csv").exclude(
+            pk__in=references.values("object_id")
+        )
+        ImportReference.objects.bulk_create(
+            [
+                ImportReference(
+                    site_id=obj.site_id,
+                    content_type=content_type,
+                    object_id=obj.pk,
+                    source="csv",
+                    reference=obj.extended_data["import_ref_csv"],
+                )
+                for obj in qs.only("pk", "site_id", "extended_data")
+                if obj.extended_data["import_ref_csv"]
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0014_parser_engine'),
+    ]
+
+    operations = [
+        migrations.RunPython(sync_import_references, migrations.RunPython.noop),
+    ]
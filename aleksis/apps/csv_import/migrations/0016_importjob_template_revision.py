@@ -0,0 +1,18 @@
+# Generated by Django 3.2.4 on 2021-07-16 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('csv_import', '0015_sync_import_references'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='template_revision',
+            field=models.CharField(blank=True, editable=False, max_length=40, verbose_name='Revision of the template'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.4 on 2021-07-19 08:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_school_terms(apps, schema_editor):
+    """Store the school terms of the objects of existing references."""
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    ImportReference = apps.get_model("csv_import", "ImportReference")
+    Group = apps.get_model("core", "Group")
+
+    ImportReference.objects.filter(content_type=ContentType.objects.get_for_model(Group)).update(
+        school_term_id=models.Subquery(
+            Group._base_manager.filter(pk=models.OuterRef("object_id")).values("school_term_id")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_fix_uniqueness_per_site'),
+        ('csv_import', '0016_importjob_template_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importreference',
+            name='school_term',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.schoolterm', verbose_name='School term'),
+        ),
+        migrations.RemoveConstraint(
+            model_name='importreference',
+            name='unique_import_reference_per_site',
+        ),
+        migrations.RunPython(set_school_terms, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='importreference',
+            constraint=models.UniqueConstraint(condition=models.Q(('school_term__isnull', True)), fields=('site_id', 'content_type', 'source', 'reference'), name='unique_import_reference_per_site'),
+        ),
+        migrations.AddConstraint(
+            model_name='importreference',
+            constraint=models.UniqueConstraint(condition=models.Q(('school_term__isnull', False)), fields=('site_id', 'content_type', 'source', 'school_term', 'reference'), name='unique_import_reference_per_school_term'),
+        ),
+    ]
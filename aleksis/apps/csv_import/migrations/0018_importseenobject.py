@@ -0,0 +1,37 @@
+# Generated by Django 3.2.4 on 2021-07-19 10:17
+
+import django.contrib.sites.managers
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sites', '0002_alter_domain_unique'),
+        ('csv_import', '0017_importreference_school_term'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportSeenObject',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('extended_data', models.JSONField(default=dict, editable=False)),
+                ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                ('import_job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seen_objects', to='csv_import.importjob', verbose_name='Import job')),
+                ('site', models.ForeignKey(default=1, editable=False, on_delete=django.db.models.deletion.CASCADE, to='sites.site')),
+            ],
+            options={
+                'verbose_name': 'Object found by an import',
+                'verbose_name_plural': 'Objects found by imports',
+            },
+            managers=[
+                ('objects', django.contrib.sites.managers.CurrentSiteManager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='importseenobject',
+            index=models.Index(fields=['import_job', 'object_id'], name='import_seen_object'),
+        ),
+    ]
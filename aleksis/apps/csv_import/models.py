@@ -1,14 +1,34 @@
 import codecs
+import hashlib
+import json
+import os
+from typing import Optional
 
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
+from django.core.files import File
 from django.db import models
 from django.utils.translation import gettext as _
 
 from aleksis.apps.csv_import.field_types import field_type_registry
+from aleksis.apps.csv_import.settings import PROGRESS_INTERVAL
+from aleksis.apps.csv_import.util.import_helpers import HashingReader
+from aleksis.apps.csv_import.util.reader import is_parser_engine_available
 from aleksis.core.mixins import ExtensibleModel
 from aleksis.core.models import Group, GroupType, SchoolTerm
 
+PARSER_ENGINE_CHOICES = [
+    ("pandas", _("pandas")),
+    ("arrow", _("PyArrow (fastest for large files)")),
+    ("csv", _("Python csv module (fastest for small files)")),
+]
+
+
+def validate_parser_engine(engine: str):
+    """Check that the modules needed by a parser engine are installed."""
+    if engine and not is_parser_engine_available(engine):
+        raise ValidationError(_(f"The CSV parser {engine} is not installed."))
+
 
 def get_allowed_content_types_query():
     """Get all allowed content types."""
@@ -39,6 +59,13 @@ class ImportTemplate(ExtensibleModel):
         verbose_name=_("CSV separator"),
         help_text=_("For whitespace use \\\\s+, for tab \\\\t"),
     )
+    parser_engine = models.CharField(
+        max_length=10,
+        choices=PARSER_ENGINE_CHOICES,
+        default="pandas",
+        validators=[validate_parser_engine],
+        verbose_name=_("CSV parser"),
+    )
 
     group = models.ForeignKey(
         Group,
@@ -61,10 +88,30 @@ class ImportTemplate(ExtensibleModel):
         ),
     )
 
+    default_checksum = models.CharField(
+        max_length=40,
+        blank=True,
+        editable=False,
+        verbose_name=_("Checksum of the default template definition"),
+    )
+
     @property
     def parsed_separator(self):
         return codecs.escape_decode(bytes(self.separator, "utf-8"))[0].decode("utf-8")
 
+    @property
+    def revision(self) -> str:
+        """Get a checksum of all settings which affect how files are imported."""
+        data = [
+            self.content_type_id,
+            self.separator,
+            self.has_header_row,
+            self.group_id,
+            self.group_type_id,
+            list(self.fields.values_list("index", "field_type")),
+        ]
+        return hashlib.sha1(json.dumps(data).encode()).hexdigest()
+
     def save(self, *args, **kwargs):
         if not self.content_type.model == "person":
             self.group = None
@@ -130,7 +177,232 @@ class ImportJob(ExtensibleModel):
         blank=True,
         null=True,
     )
+    full_sync = models.BooleanField(
+        default=False,
+        verbose_name=_("Deactivate objects missing in the file"),
+        help_text=_(
+            "If enabled, all objects with an import reference which are not included "
+            "in the file will be deactivated."
+        ),
+    )
+    dry_run = models.BooleanField(
+        default=False,
+        verbose_name=_("Dry run"),
+        help_text=_("If enabled, changes are only computed and not written to the database."),
+    )
+    diff = models.JSONField(
+        default=dict, blank=True, editable=False, verbose_name=_("Summary of changes")
+    )
+    stats = models.JSONField(default=dict, blank=True, editable=False, verbose_name=_("Statistics"))
+    content_hash = models.CharField(
+        max_length=64, blank=True, db_index=True, editable=False, verbose_name=_("Content hash")
+    )
+    template_revision = models.CharField(
+        max_length=40, blank=True, editable=False, verbose_name=_("Revision of the template")
+    )
+    force = models.BooleanField(
+        default=False,
+        verbose_name=_("Import even if the file was already imported"),
+        help_text=_(
+            "If disabled, files which were already imported with the same template "
+            "and school term are not imported again."
+        ),
+    )
+    progress_interval = models.FloatField(
+        default=PROGRESS_INTERVAL,
+        verbose_name=_("Seconds between progress updates"),
+        help_text=_("The progress of the import is reported at most this often."),
+    )
+    progress_rows = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_("Rows between progress updates"),
+        help_text=_(
+            "If set, progress is also reported after this number of rows, "
+            "even if the interval has not passed yet."
+        ),
+    )
+    parser_engine = models.CharField(
+        max_length=10,
+        choices=PARSER_ENGINE_CHOICES,
+        blank=True,
+        validators=[validate_parser_engine],
+        verbose_name=_("CSV parser"),
+        help_text=_("If not set, the CSV parser of the import template is used."),
+    )
+    profile = models.BooleanField(
+        default=False,
+        verbose_name=_("Profile the import"),
+        help_text=_(
+            "If enabled, the import is run under a profiler and a report "
+            "is attached to the import job."
+        ),
+    )
+    profile_file = models.FileField(
+        upload_to="csv_import/profiles/",
+        blank=True,
+        editable=False,
+        verbose_name=_("Profiling report"),
+    )
+    errors_file = models.FileField(
+        upload_to="csv_import/errors/",
+        blank=True,
+        editable=False,
+        verbose_name=_("Error report"),
+    )
+    duplicate_of = models.ForeignKey(
+        "self",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name=_("Duplicate of"),
+        related_name="duplicates",
+    )
+
+    def get_parser_engine(self) -> str:
+        """Get the name of the parser engine used to read the file."""
+        return self.parser_engine or self.template.parser_engine
+
+    def get_earlier_import(self) -> Optional["ImportJob"]:
+        """Get the latest finished import of the same file, template and school term."""
+        qs = ImportJob.objects.filter(
+            template=self.template,
+            school_term=self.school_term,
+            content_hash=self.content_hash,
+            template_revision=self.template_revision,
+            dry_run=False,
+            duplicate_of__isnull=True,
+        ).exclude(diff={})
+        if self.full_sync:
+            qs = qs.filter(full_sync=True)
+        if self.pk:
+            qs = qs.exclude(pk=self.pk)
+        return qs.order_by("-pk").first()
+
+    def attach_file(self, file: File):
+        """Store an uploaded file for this job and save the job.
+
+        The hash of the content is computed while the file is written to the
+        storage. If the same file was already imported with the same revision of
+        the template and the import is not forced, the job is marked as a
+        duplicate and the stored file is replaced by the earlier one. Dry runs
+        are never duplicates, so they always show what the import would change.
+        """
+        reader = HashingReader(file)
+        self.data_file.save(os.path.basename(file.name), File(reader, name=file.name), save=False)
+        self.content_hash = reader.hexdigest()
+        self.template_revision = self.template.revision
+
+        if not self.force and not self.dry_run:
+            self.duplicate_of = self.get_earlier_import()
+        if self.duplicate_of:
+            self.data_file.delete(save=False)
+            self.data_file.name = self.duplicate_of.data_file.name
+        self.save()
 
     class Meta:
         verbose_name = _("Import job")
         verbose_name_plural = _("Import jobs")
+
+
+class ImportReference(ExtensibleModel):
+    """Reference of an imported object in the system it was imported from.
+
+    References are stored in this indexed table instead of in the extended
+    data of the objects, so objects can be looked up by their references quickly.
+    Objects of school terms, like groups, use the same references in every school
+    term, so references are unique per school term.
+    """
+
+    content_type = models.ForeignKey(
+        ContentType, models.CASCADE, verbose_name=_("Content type"), related_name="+"
+    )
+    object_id = models.BigIntegerField(verbose_name=_("Object ID"))
+    source = models.CharField(max_length=255, default="csv", verbose_name=_("Source"))
+    reference = models.CharField(max_length=255, verbose_name=_("Reference"))
+    school_term = models.ForeignKey(
+        SchoolTerm,
+        models.CASCADE,
+        verbose_name=_("School term"),
+        related_name="+",
+        blank=True,
+        null=True,
+    )
+
+    def __str__(self):
+        return f"{self.source}: {self.reference}"
+
+    class Meta:
+        verbose_name = _("Import reference")
+        verbose_name_plural = _("Import references")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("site_id", "content_type", "source", "reference"),
+                condition=models.Q(school_term__isnull=True),
+                name="unique_import_reference_per_site",
+            ),
+            models.UniqueConstraint(
+                fields=("site_id", "content_type", "source", "school_term", "reference"),
+                condition=models.Q(school_term__isnull=False),
+                name="unique_import_reference_per_school_term",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=("content_type", "object_id"), name="import_reference_object"),
+        ]
+
+
+class ImportFingerprint(ExtensibleModel):
+    """Fingerprint of the row an object was last imported from with a template.
+
+    Rows with the same fingerprint as the last import are skipped. Objects whose
+    rows cannot be skipped have an empty fingerprint, so all objects imported
+    with a template are known.
+    """
+
+    template = models.ForeignKey(
+        ImportTemplate,
+        on_delete=models.CASCADE,
+        verbose_name=_("Import template"),
+        related_name="fingerprints",
+    )
+    object_id = models.BigIntegerField(verbose_name=_("Object ID"))
+    fingerprint = models.CharField(max_length=40, verbose_name=_("Fingerprint"))
+
+    def __str__(self):
+        return f"{self.template}: {self.object_id}"
+
+    class Meta:
+        verbose_name = _("Import fingerprint")
+        verbose_name_plural = _("Import fingerprints")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("template", "object_id"), name="unique_fingerprint_per_template_object"
+            ),
+        ]
+
+
+class ImportSeenObject(ExtensibleModel):
+    """Object found in the file of an import job.
+
+    They are stored while importing with full sync, so all missing
+    objects can be deactivated with one query afterwards.
+    """
+
+    import_job = models.ForeignKey(
+        ImportJob,
+        on_delete=models.CASCADE,
+        verbose_name=_("Import job"),
+        related_name="seen_objects",
+    )
+    object_id = models.BigIntegerField(verbose_name=_("Object ID"))
+
+    def __str__(self):
+        return f"{self.import_job}: {self.object_id}"
+
+    class Meta:
+        verbose_name = _("Object found by an import")
+        verbose_name_plural = _("Objects found by imports")
+        indexes = [
+            models.Index(fields=("import_job", "object_id"), name="import_seen_object"),
+        ]
@@ -1,8 +1,12 @@
 from django.utils.translation import gettext_lazy as _
 
-import pycountry
 from dynamic_preferences.preferences import Section
-from dynamic_preferences.types import ChoicePreference, ModelChoicePreference, StringPreference
+from dynamic_preferences.types import (
+    ChoicePreference,
+    IntegerPreference,
+    ModelChoicePreference,
+    StringPreference,
+)
 
 from aleksis.core.models import Group, GroupType
 from aleksis.core.registries import site_preferences_registry
@@ -57,5 +61,33 @@ class PhoneNumberCountry(ChoicePreference):
     name = "phone_number_country"
     required = True
     default = "GB"
-    choices = [(x.alpha_2, x.alpha_2) for x in pycountry.countries]
     verbose_name = _("Country for phone number parsing")
+
+    def get_choices(self):
+        # pycountry loads all countries when first used, so only do it when needed
+        import pycountry  # noqa
+
+        return [(x.alpha_2, x.alpha_2) for x in pycountry.countries]
+
+
+@site_preferences_registry.register
+class ChunkSize(IntegerPreference):
+    section = csv_import
+    name = "chunk_size"
+    default = 1000
+    required = True
+    verbose_name = _("Number of rows which are imported at once")
+    help_text = _("Larger values make imports faster, but need more memory.")
+
+
+@site_preferences_registry.register
+class Partitions(IntegerPreference):
+    section = csv_import
+    name = "partitions"
+    default = 1
+    required = True
+    verbose_name = _("Number of parts large files are imported in at the same time")
+    help_text = _(
+        "Rows are split into parts by their unique reference. Each part is imported "
+        "by its own background worker, so this should not exceed the number of workers."
+    )
@@ -1,6 +1,9 @@
-from rules import add_perm
+from rules import add_perm, is_superuser
 
 from aleksis.core.util.predicates import has_global_perm, has_person
 
 import_data_predicate = has_person & has_global_perm("csv_import.import_data")
 add_perm("csv_import.import_data_rule", import_data_predicate)
+
+profile_import_predicate = import_data_predicate & is_superuser
+add_perm("csv_import.profile_import_rule", profile_import_predicate)
@@ -1,6 +1,11 @@
 STATE_ACTIVE = (True, 2)
 TRUE_VALUES = ["+", "Ja", "yes", "Yes", "ja"]
 FALSE_VALUES = ["-", "Nein", "no", "No", "nein"]
+# Values pandas itself recognises as booleans, in addition to TRUE_VALUES and FALSE_VALUES
+BOOLEAN_VALUES = {
+    **{value: True for value in TRUE_VALUES + ["True", "TRUE", "true", "1"]},
+    **{value: False for value in FALSE_VALUES + ["False", "FALSE", "false", "0"]},
+}
 SEXES = {
     "w": "f",
     "m": "m",
@@ -9,3 +14,24 @@ SEXES = {
     "female": "f",
     "male": "m",
 }
+IMPORT_BATCH_SIZE = 500
+CONVERTER_CACHE_SIZE = 4096
+# Number of compiled import plans which are cached, usually one per import template
+PLAN_CACHE_SIZE = 32
+# Maximum number of changed objects which are stored in the diff of an import job
+DIFF_MAX_CHANGES = 1000
+# Number of attempts to import a chunk if it fails due to a deadlock or serialization failure
+IMPORT_RETRIES = 3
+# PostgreSQL error codes of serialization failures and deadlocks
+TRANSIENT_ERROR_CODES = {"40001", "40P01"}
+# Number of functions and memory allocation sites in profiling reports of import jobs
+PROFILE_FUNCTIONS = 60
+PROFILE_ALLOCATION_SITES = 30
+# Number of frames stored per memory allocation while profiling
+PROFILE_TRACEBACK_FRAMES = 5
+# Default number of seconds between progress updates of import jobs
+PROGRESS_INTERVAL = 1.0
+# Number of sample rows shown per group of errors of an import job
+ERROR_SAMPLES = 5
+# Maximum length of error messages shown for sample rows
+ERROR_MESSAGE_LENGTH = 200
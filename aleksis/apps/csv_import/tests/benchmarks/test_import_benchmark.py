@@ -0,0 +1,79 @@
+"""Benchmarks of imports with synthetic files.
+
+They are slow, so they only run if ``CSV_IMPORT_BENCHMARK`` is set. Results are
+compared to ``baseline.json`` next to this file, and benchmarks without a baseline
+fail. If ``CSV_IMPORT_BENCHMARK_UPDATE`` is set, the baseline is replaced with the
+results instead. Every file is imported
+with each installed CSV parser to compare them.
+"""
+
+import json
+import os
+
+import pytest
+
+from aleksis.apps.csv_import.default_templates import update_or_create_default_templates
+from aleksis.apps.csv_import.settings import PROGRESS_INTERVAL
+from aleksis.apps.csv_import.util.benchmark import get_benchmark_names, run_benchmark
+from aleksis.apps.csv_import.util.reader import PARSER_ENGINES, is_parser_engine_available
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+SIZES = [1000, 10000, 100000]
+
+# Allowed deviations from the baseline
+MIN_ROWS_PER_SECOND = 0.75
+MAX_QUERIES_PER_ROW = 1.1
+MAX_PEAK_MEMORY = 1.25
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        not os.environ.get("CSV_IMPORT_BENCHMARK"), reason="CSV_IMPORT_BENCHMARK is not set"
+    ),
+]
+
+
+def load_baseline() -> dict:
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as f:
+        return json.load(f)
+
+
+def save_baseline(key: str, result: dict):
+    baseline = load_baseline()
+    baseline[key] = result
+    with open(BASELINE_PATH, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+@pytest.mark.parametrize("engine", PARSER_ENGINES)
+@pytest.mark.parametrize("rows", SIZES)
+@pytest.mark.parametrize("name", get_benchmark_names())
+def test_import_benchmark(name, rows, engine):
+    if not is_parser_engine_available(engine):
+        pytest.skip(f"The CSV parser {engine} is not installed")
+    update_or_create_default_templates()
+
+    result = run_benchmark(name, rows, engine=engine)
+
+    # Generated files are valid, so all rows have to be imported
+    assert result.errors == 0
+    assert result.failed == 0
+
+    # Progress updates are bounded by time, plus the forced first and last one
+    assert result.progress_updates <= result.seconds / PROGRESS_INTERVAL + 2
+
+    key = f"{name}_{rows}" if engine == "pandas" else f"{name}_{rows}_{engine}"
+    if os.environ.get("CSV_IMPORT_BENCHMARK_UPDATE"):
+        save_baseline(key, result.as_dict())
+        return
+
+    baseline = load_baseline().get(key)
+    if not baseline:
+        pytest.fail(f"No baseline for {key}, set CSV_IMPORT_BENCHMARK_UPDATE to record it")
+
+    assert result.rows_per_second >= baseline["rows_per_second"] * MIN_ROWS_PER_SECOND
+    assert result.queries_per_row <= baseline["queries_per_row"] * MAX_QUERIES_PER_ROW
+    assert result.peak_memory <= baseline["peak_memory"] * MAX_PEAK_MEMORY
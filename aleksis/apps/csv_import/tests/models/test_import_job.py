@@ -0,0 +1,71 @@
+import hashlib
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+import pytest
+
+from aleksis.apps.csv_import.field_types import FirstNameFieldType
+from aleksis.apps.csv_import.models import ImportJob, ImportTemplate
+from aleksis.core.models import Person
+
+pytestmark = pytest.mark.django_db
+
+
+def _create_job(template, content, **kwargs):
+    import_job = ImportJob(template=template, **kwargs)
+    import_job.attach_file(ContentFile(content, name="test.csv"))
+    return import_job
+
+
+def test_import_job_duplicate():
+    template = ImportTemplate.objects.create(
+        content_type=ContentType.objects.get_for_model(Person), name="foo", verbose_name="Bar",
+    )
+
+    first_job = _create_job(template, b"unique_reference\n1\n")
+    assert first_job.content_hash
+    assert first_job.duplicate_of is None
+
+    # Unfinished imports are not considered
+    assert _create_job(template, b"unique_reference\n1\n").duplicate_of is None
+
+    first_job.diff = {"created": 1}
+    first_job.save()
+
+    second_job = _create_job(template, b"unique_reference\n1\n")
+    assert second_job.duplicate_of == first_job
+    assert second_job.data_file.name == first_job.data_file.name
+
+    assert _create_job(template, b"unique_reference\n2\n").duplicate_of is None
+    assert _create_job(template, b"unique_reference\n1\n", force=True).duplicate_of is None
+    assert _create_job(template, b"unique_reference\n1\n", full_sync=True).duplicate_of is None
+    assert _create_job(template, b"unique_reference\n1\n", dry_run=True).duplicate_of is None
+
+
+def test_import_job_content_hash():
+    template = ImportTemplate.objects.create(
+        content_type=ContentType.objects.get_for_model(Person), name="foo", verbose_name="Bar",
+    )
+    content = b"unique_reference\n1\n" * 10000
+
+    import_job = _create_job(template, content)
+    assert import_job.content_hash == hashlib.sha256(content).hexdigest()
+    assert import_job.data_file.read() == content
+
+
+def test_import_job_duplicate_template_revision():
+    template = ImportTemplate.objects.create(
+        content_type=ContentType.objects.get_for_model(Person), name="foo", verbose_name="Bar",
+    )
+    first_job = _create_job(template, b"unique_reference\n1\n", diff={"created": 1})
+    assert first_job.template_revision == template.revision
+
+    second_job = _create_job(template, b"unique_reference\n1\n")
+    assert second_job.duplicate_of == first_job
+    assert default_storage.exists(first_job.data_file.name)
+
+    # Files are imported again after the template was changed
+    template.fields.create(field_type=FirstNameFieldType.name, index=1)
+    assert _create_job(template, b"unique_reference\n1\n").duplicate_of is None
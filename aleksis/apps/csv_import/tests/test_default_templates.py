@@ -0,0 +1,34 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from aleksis.apps.csv_import.default_templates import (
+    get_default_template_definitions,
+    update_or_create_default_templates,
+)
+from aleksis.apps.csv_import.models import ImportTemplate
+
+pytestmark = pytest.mark.django_db
+
+
+def test_update_or_create_default_templates():
+    definitions = get_default_template_definitions()
+
+    update_or_create_default_templates(force=True)
+    for name, definition in definitions.items():
+        template = ImportTemplate.objects.get(name=name)
+        assert template.default_checksum
+        assert [field.field_type for field in template.fields.order_by("index")] == definition[
+            "fields"
+        ]
+
+    # Nothing is written if the definitions did not change
+    with CaptureQueriesContext(connection) as queries:
+        assert update_or_create_default_templates() == 0
+    assert len(queries) == 1
+
+    ImportTemplate.objects.filter(name="pedasos_teachers").update(default_checksum="")
+    assert update_or_create_default_templates() == 1
+
+    assert update_or_create_default_templates(force=True) == len(definitions)
@@ -0,0 +1,63 @@
+import pytest
+
+from aleksis.apps.csv_import.field_types import (
+    ChildByUniqueReference,
+    DepartmentsFieldType,
+    GroupMembershipByShortNameFieldType,
+)
+from aleksis.apps.csv_import.util.context import ImportContext
+from aleksis.apps.csv_import.util.references import set_references
+from aleksis.core.models import Group, Person
+
+pytestmark = pytest.mark.django_db
+
+
+def test_departments_field_type():
+    jane = Person.objects.create(first_name="Jane", last_name="Doe")
+    john = Person.objects.create(first_name="John", last_name="Doe")
+    Group.objects.create(name="Maths", short_name="M")
+
+    context = ImportContext()
+    DepartmentsFieldType.prepare(context)
+    DepartmentsFieldType.prepare_chunk([["M", "E"], ["M"], []])
+    assert set(DepartmentsFieldType.groups) == {"M", "E"}
+    assert Group.objects.filter(short_name="M").count() == 1
+
+    DepartmentsFieldType().process(jane, ["M", "E"])
+    DepartmentsFieldType().process(john, ["M"])
+    context.m2m_writer.write()
+
+    assert set(jane.member_of.values_list("short_name", flat=True)) == {"M", "E"}
+    assert set(john.member_of.values_list("short_name", flat=True)) == {"M"}
+
+
+def test_child_by_unique_reference_loads_only_chunk(django_assert_num_queries):
+    jane = Person.objects.create(first_name="Jane", last_name="Doe")
+    john = Person.objects.create(first_name="John", last_name="Doe")
+    guardian = Person.objects.create(first_name="Mary", last_name="Doe")
+    set_references([(jane, "1"), (john, "2")], "csv")
+
+    context = ImportContext()
+    ChildByUniqueReference.prepare(context)
+    ChildByUniqueReference.prepare_chunk(["1", "", "3"])
+
+    with django_assert_num_queries(0):
+        ChildByUniqueReference().process(guardian, "1")
+    assert context.lookup_index.get_all(Person, "import_ref_csv", "2") == [john]
+
+    context.m2m_writer.write()
+    assert list(guardian.children.all()) == [jane]
+
+
+def test_group_membership_marks_missing_groups():
+    jane = Person.objects.create(first_name="Jane", last_name="Doe")
+    Group.objects.create(name="5a", short_name="5a")
+
+    context = ImportContext()
+    GroupMembershipByShortNameFieldType.prepare(context)
+
+    GroupMembershipByShortNameFieldType().process(jane, ["5a", ""])
+    assert not context.unresolved
+
+    GroupMembershipByShortNameFieldType().process(jane, ["5a", "5b"])
+    assert context.unresolved
@@ -0,0 +1,91 @@
+"""Check that loading the app does not import dependencies only needed for imports."""
+
+import os
+import subprocess
+import sys
+from typing import List, Set, Tuple
+
+#: Dependencies which must only be imported when data is imported
+HEAVY_MODULES = {"pandas", "dateparser", "phonenumbers", "pycountry"}
+
+#: Maximum time spent importing the modules of this app, in microseconds
+IMPORT_TIME_BUDGET = 1_000_000
+
+APP = "aleksis.apps.csv_import"
+CODE = f"import django; django.setup(); import {APP}.views, {APP}.field_types"
+
+
+def parse_import_times(output: str) -> List[Tuple[str, int, Set[str]]]:
+    """Parse the output of ``python -X importtime``.
+
+    :return: Imported modules with their cumulative import times and all
+        modules imported while importing them
+    """
+    modules = []
+    pending: List[Tuple[int, Set[str]]] = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        __, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        level = len(name) - len(name.lstrip())
+        name = name.strip()
+
+        # Modules are listed after all modules they imported, which are indented deeper
+        imported = set()
+        while pending and pending[-1][0] > level:
+            imported |= pending.pop()[1]
+        modules.append((name, int(cumulative), imported))
+        pending.append((level, imported | {name}))
+    return modules
+
+
+def get_import_times() -> List[Tuple[str, int, Set[str]]]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODE],
+        capture_output=True,
+        text=True,
+        env=os.environ,
+        check=True,
+    )
+    return parse_import_times(result.stderr)
+
+
+def test_parse_import_times():
+    output = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:        10 |         10 |     pandas.core",
+            "import time:        20 |         30 |   pandas",
+            "import time:         5 |         35 | foo",
+            "import time:         1 |          1 | bar",
+        ]
+    )
+    modules = {
+        name: (cumulative, imported) for name, cumulative, imported in parse_import_times(output)
+    }
+    assert modules["foo"] == (35, {"pandas", "pandas.core"})
+    assert modules["bar"] == (1, set())
+
+
+def test_import_time():
+    modules = get_import_times()
+
+    for name, __, imported in modules:
+        if not name.startswith(APP):
+            continue
+        heavy = {module.split(".")[0] for module in imported} & HEAVY_MODULES
+        assert not heavy, f"{name} imports {', '.join(sorted(heavy))}"
+
+    # Only count modules of this app which were not imported by other modules of it
+    imported_by_app = set()
+    for name, __, imported in modules:
+        if name.startswith(APP):
+            imported_by_app |= {module for module in imported if module.startswith(APP)}
+    total = sum(
+        cumulative
+        for name, cumulative, __ in modules
+        if name.startswith(APP) and name not in imported_by_app
+    )
+    assert total <= IMPORT_TIME_BUDGET
@@ -0,0 +1,56 @@
+import csv
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+import pytest
+
+from aleksis.apps.csv_import.default_templates import (
+    get_default_template_definitions,
+    update_or_create_default_templates,
+)
+from aleksis.apps.csv_import.util.benchmark import generate_file, get_benchmark_names, run_import
+
+
+def test_generate_file():
+    for name in get_benchmark_names():
+        definition = get_default_template_definitions()[name]
+        content = generate_file(name, 50)
+
+        assert content == generate_file(name, 50)
+        assert content != generate_file(name, 50, seed=1)
+
+        rows = list(csv.reader(io.StringIO(content.decode()), delimiter="\t"))
+        assert len(rows) == 51
+        assert all(len(row) == len(definition["fields"]) for row in rows)
+
+
+def test_generate_file_unique_references():
+    content = generate_file("pedasos_courses", 1000).decode()
+    short_names = [line.split("\t")[0] for line in content.splitlines()[1:]]
+    assert len(set(short_names)) == 1000
+
+
+def list_files(path: str = "csv_import") -> set:
+    if not default_storage.exists(path):
+        return set()
+    directories, files = default_storage.listdir(path)
+    return {f"{path}/{name}" for name in files}.union(
+        *(list_files(f"{path}/{directory}") for directory in directories)
+    )
+
+
+@pytest.mark.django_db
+def test_run_import_deletes_files(monkeypatch):
+    update_or_create_default_templates()
+    name = get_benchmark_names()[0]
+
+    def save_errors(self, import_job):
+        import_job.errors_file.save("errors.csv", ContentFile(b"error"), save=False)
+
+    monkeypatch.setattr("aleksis.apps.csv_import.util.errors.ErrorReport.save", save_errors)
+    files = list_files()
+    run_import(name, generate_file(name, 10))
+
+    assert list_files() == files
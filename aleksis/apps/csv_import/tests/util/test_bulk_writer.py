@@ -0,0 +1,87 @@
+import pytest
+
+from aleksis.apps.csv_import.util.bulk_writer import BulkWriter
+from aleksis.core.models import Person
+
+pytestmark = pytest.mark.django_db
+
+
+def test_bulk_writer_create():
+    writer = BulkWriter(Person)
+    for short_name in ["FOO", "BAR", "BAZ"]:
+        writer.add({}, "short_name", short_name, {"first_name": "Foo", "last_name": short_name})
+    operations = writer.flush()
+
+    assert len(operations) == 3
+    assert all(operation.created and operation.instance.pk for operation in operations)
+    assert writer.created_count == 3
+    assert writer.updated_count == 0
+    assert Person.objects.filter(short_name__in=["FOO", "BAR", "BAZ"]).count() == 3
+
+
+def test_bulk_writer_update_changed_fields():
+    Person.objects.create(short_name="FOO", first_name="Foo", last_name="Foo")
+    Person.objects.create(short_name="BAR", first_name="Bar", last_name="Bar")
+
+    writer = BulkWriter(Person)
+    writer.add({}, "short_name", "FOO", {"first_name": "Foo", "last_name": "Foo"})
+    writer.add({}, "short_name", "BAR", {"first_name": "Baz", "last_name": "Bar"})
+    operations = writer.flush()
+
+    assert [operation.changed_fields for operation in operations] == [set(), {"first_name"}]
+    assert writer.created_count == 0
+    assert writer.updated_count == 1
+    assert Person.objects.get(short_name="BAR").first_name == "Baz"
+
+
+def test_bulk_writer_duplicate_rows():
+    writer = BulkWriter(Person)
+    written = writer.add({}, "short_name", "FOO", {"first_name": "Foo", "last_name": "Foo"})
+    assert written == []
+
+    written = writer.add({}, "short_name", "FOO", {"first_name": "Bar", "last_name": "Foo"})
+    assert len(written) == 1
+
+    writer.flush()
+    assert writer.created_count == 1
+    assert writer.updated_count == 1
+    assert Person.objects.get(short_name="FOO").first_name == "Bar"
+
+
+def test_bulk_writer_batch_size():
+    writer = BulkWriter(Person, batch_size=2)
+    assert writer.add({}, "short_name", "FOO", {"first_name": "Foo", "last_name": "Foo"}) == []
+    assert len(writer.add({}, "short_name", "BAR", {"first_name": "Bar", "last_name": "Bar"})) == 2
+    assert writer.flush() == []
+
+
+def test_bulk_writer_errors_per_row():
+    writer = BulkWriter(Person)
+    writer.add({}, "short_name", "FOO", {"first_name": "Foo", "last_name": "Foo"})
+    writer.add({}, "short_name", "BAR", {"first_name": None, "last_name": "Bar"})
+    operations = writer.flush()
+
+    assert operations[0].error is None
+    assert operations[1].error is not None
+    assert writer.created_count == 1
+    assert Person.objects.filter(short_name="FOO").exists()
+    assert not Person.objects.filter(short_name="BAR").exists()
+
+
+def test_bulk_writer_dry_run(django_assert_num_queries):
+    Person.objects.create(short_name="FOO", first_name="Foo", last_name="Foo")
+
+    writer = BulkWriter(Person, dry_run=True)
+    writer.add({}, "short_name", "FOO", {"first_name": "Bar", "last_name": "Foo"})
+    writer.add({}, "short_name", "BAR", {"first_name": "Bar", "last_name": "Bar"})
+
+    # Only existing objects are fetched
+    with django_assert_num_queries(1):
+        operations = writer.flush()
+
+    assert operations[0].diff == {"first_name": ("Foo", "Bar")}
+    assert operations[1].created
+    assert writer.created_count == 1
+    assert writer.updated_count == 1
+    assert Person.objects.get(short_name="FOO").first_name == "Foo"
+    assert not Person.objects.filter(short_name="BAR").exists()
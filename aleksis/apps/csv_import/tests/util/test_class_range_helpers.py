@@ -1,12 +1,13 @@
 import pytest
 
 from aleksis.apps.csv_import.util.class_range_helpers import (
+    ClassRangeResolver,
+    get_class_sort_key,
     get_classes_per_grade,
     get_classes_per_short_name,
     get_grade_and_class_from_class_range,
     get_max_class,
     get_min_class,
-    parse_class_range,
 )
 from aleksis.core.models import Group
 
@@ -103,13 +104,64 @@ def test_get_classes_per_short_name():
         assert classes_per_short_name[class_].short_name == class_
 
 
-def test_parse_class_range():
+def test_get_class_sort_key():
+    assert sorted(reversed(CLASSES), key=get_class_sort_key) == CLASSES
+    assert sorted(["10a", "9b", "Ea", "9a"], key=get_class_sort_key) == ["9a", "9b", "10a", "Ea"]
+
+
+def test_class_range_resolver():
     Group.objects.bulk_create([Group(short_name=name, name=name) for name in CLASSES])
 
-    classes_per_short_name = get_classes_per_short_name(None)
+    resolver = ClassRangeResolver.for_school_term(None)
+
+    classes = resolver.resolve("5-Q2")
+    assert [x.short_name for x in classes] == CLASSES
+
+    classes = resolver.resolve("5a-d")
+    assert [x.short_name for x in classes] == ["5a", "5b", "5c", "5d"]
+
+    classes = resolver.resolve("8c-9b")
+    assert [x.short_name for x in classes] == ["8c", "8d", "9a", "9b"]
+
+    classes = resolver.resolve("Q1b")
+    assert [x.short_name for x in classes] == ["Q1b"]
+
+    for class_range in ("5e", "11a-b", "foo"):
+        with pytest.raises(ValueError):
+            resolver.resolve(class_range)
 
-    classes = parse_class_range(classes_per_short_name, CLASSES_PER_GRADE, "5-Q2")
-    assert sorted([x.short_name for x in classes]) == CLASSES
 
-    classes = parse_class_range(classes_per_short_name, CLASSES_PER_GRADE, "5a-d")
-    assert sorted([x.short_name for x in classes]) == ["5a", "5b", "5c", "5d"]
+def test_class_range_resolver_cache():
+    Group.objects.bulk_create([Group(short_name=name, name=name) for name in CLASSES])
+
+    resolver = ClassRangeResolver.for_school_term(None)
+    assert ClassRangeResolver.for_school_term(None) is resolver
+
+    Group.objects.create(short_name="10a", name="10a")
+
+    resolver = ClassRangeResolver.for_school_term(None)
+    assert [x.short_name for x in resolver.resolve("9d-10")] == ["9d", "10a"]
+
+
+def test_class_range_resolver_cache_unchanged_group():
+    Group.objects.bulk_create([Group(short_name=name, name=name) for name in CLASSES])
+    resolver = ClassRangeResolver.for_school_term(None)
+
+    group = Group.objects.get(short_name="5a")
+    group.name = "Class 5a"
+    group.save()
+    assert ClassRangeResolver.for_school_term(None) is resolver
+
+    group.save(update_fields=["name"])
+    assert ClassRangeResolver.for_school_term(None) is resolver
+
+    group.short_name = "5e"
+    group.save()
+    resolver = ClassRangeResolver.for_school_term(None)
+    assert [x.short_name for x in resolver.resolve("5b-e")] == ["5b", "5c", "5d", "5e"]
+
+    group.delete()
+    resolver = ClassRangeResolver.for_school_term(None)
+    assert [x.short_name for x in resolver.resolve("5b-d")] == ["5b", "5c", "5d"]
+    with pytest.raises(ValueError):
+        resolver.resolve("5e")
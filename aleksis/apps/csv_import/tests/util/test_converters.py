@@ -1,13 +1,18 @@
 from datetime import date
 
+import pandas
 import pytest
 from phonenumbers import PhoneNumber
 
 from aleksis.apps.csv_import.util.converters import (
+    get_date_formats,
+    parse_booleans,
     parse_comma_separated_data,
     parse_date,
+    parse_dates,
     parse_phone_number,
     parse_sex,
+    parse_sexes,
 )
 from aleksis.core.util.core_helpers import get_site_preferences
 
@@ -26,6 +31,19 @@ def test_parse_phone_number():
     assert parse_phone_number("01635550217") != fake_number
 
 
+def test_parse_phone_number_country():
+    fake_number = PhoneNumber(country_code=49, national_number=1635550217)
+    assert parse_phone_number("0163-555-0217", country="DE") == fake_number
+    assert parse_phone_number("0163-555-0217", country="GB") != fake_number
+
+
+def test_parse_phone_number_cached():
+    number_1 = parse_phone_number("0163-555-0217", country="DE")
+    number_2 = parse_phone_number("0163-555-0217", country="DE")
+    assert number_1 == number_2
+    assert number_1 is not number_2
+
+
 def test_parse_phone_number_none():
     assert parse_phone_number("") is None
     assert parse_phone_number("foo") is None
@@ -47,6 +65,34 @@ def test_parse_sex_none():
     assert parse_sex("foo") == ""
 
 
+def test_parse_sexes():
+    values = pandas.Series(["w", "M", "weiblich", "Männlich", "", "foo"])
+    assert parse_sexes(values).tolist() == ["f", "m", "f", "m", "", ""]
+
+
+def test_parse_booleans():
+    values = pandas.Series(["+", "-", "Ja", "nein", "1", "0", "True", "false"])
+    assert parse_booleans(values).tolist() == [True, False, True, False, True, False, True, False]
+
+
+def test_parse_booleans_invalid():
+    with pytest.raises(ValueError):
+        parse_booleans(pandas.Series(["+", "foo"]))
+
+
+def test_get_date_formats():
+    assert get_date_formats(("de",)) == ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%d-%m-%Y")
+    assert get_date_formats(()) == ("%Y-%m-%d", "%m.%d.%Y", "%m/%d/%Y", "%m-%d-%Y")
+    assert get_date_formats(("de", "en")) == ("%Y-%m-%d",)
+
+
+def test_parse_dates():
+    values = ["12.01.2020", "1.2.2020", "2020-11-12", "11/12/2020", "", "foo", "12.143.1912"]
+    for languages in ["de", "", "de,en"]:
+        get_site_preferences()["csv_import__date_languages"] = languages
+        assert parse_dates(pandas.Series(values)).tolist() == [parse_date(v) for v in values]
+
+
 def test_parse_dd_mm_yyyy():
     get_site_preferences()["csv_import__date_languages"] = "de"
     assert parse_date("12.01.2020") == date(2020, 1, 12)
@@ -62,6 +108,11 @@ def test_parse_dd_mm_yyyy_none():
     assert parse_date("12.143.1912") is None
 
 
+def test_parse_date_languages():
+    assert parse_date("12.01.2020", languages=["de"]) == date(2020, 1, 12)
+    assert parse_date("12.01.2020", languages=["en"]) == date(2020, 12, 1)
+
+
 def test_parse_date_iso():
     get_site_preferences()["csv_import__date_languages"] = ""
     assert parse_date("2020-11-12") == date(2020, 11, 12)
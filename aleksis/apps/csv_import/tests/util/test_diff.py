@@ -0,0 +1,74 @@
+from datetime import date
+
+from aleksis.apps.csv_import.util.bulk_writer import WriteOperation
+from aleksis.apps.csv_import.util.diff import ImportDiff, serialize_value
+
+
+def test_serialize_value():
+    assert serialize_value(None) is None
+    assert serialize_value(True) is True
+    assert serialize_value(1) == 1
+    assert serialize_value("foo") == "foo"
+    assert serialize_value(date(2021, 7, 1)) == "2021-07-01"
+
+
+def test_import_diff():
+    created = WriteOperation({}, "short_name", "FOO", {"first_name": "Foo"}, created=True)
+    updated = WriteOperation(
+        {},
+        "short_name",
+        "BAR",
+        {"first_name": "Baz"},
+        changed_fields={"first_name"},
+        diff={"first_name": ("Bar", "Baz")},
+    )
+    unchanged = WriteOperation({}, "short_name", "BAZ", {"first_name": "Baz"})
+    failed = WriteOperation({}, "short_name", "QUX", {}, error=ValueError())
+
+    diff = ImportDiff()
+    diff.add([created, updated, unchanged, failed])
+    diff.deactivated = 2
+
+    assert diff.as_dict() == {
+        "created": 1,
+        "updated": 1,
+        "unchanged": 1,
+        "deactivated": 2,
+        "failed": 1,
+        "changes": [
+            {"action": "create", "reference": "FOO", "fields": {"first_name": [None, "Foo"]}},
+            {"action": "update", "reference": "BAR", "fields": {"first_name": ["Bar", "Baz"]}},
+        ],
+        "truncated": False,
+    }
+
+
+def test_import_diff_max_changes():
+    diff = ImportDiff(max_changes=1)
+    diff.add(
+        [
+            WriteOperation({}, "short_name", value, {}, created=True)
+            for value in ["FOO", "BAR", "BAZ"]
+        ]
+    )
+
+    assert diff.created == 3
+    assert len(diff.changes) == 1
+    assert diff.truncated
+
+
+def test_import_diff_merge():
+    first = ImportDiff(max_changes=2)
+    first.add([WriteOperation({}, "short_name", "FOO", {}, created=True)])
+
+    second = ImportDiff()
+    second.add(
+        [WriteOperation({}, "short_name", value, {}, created=True) for value in ["BAR", "BAZ"]]
+    )
+    second.unchanged = 3
+    first.merge(second.as_dict())
+
+    assert first.created == 3
+    assert first.unchanged == 3
+    assert [change["reference"] for change in first.changes] == ["FOO", "BAR"]
+    assert first.truncated
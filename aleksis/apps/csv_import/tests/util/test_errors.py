@@ -0,0 +1,56 @@
+from aleksis.apps.csv_import.util.errors import ErrorReport, get_row_error
+
+
+def test_get_row_error():
+    assert get_row_error(ValueError("Invalid date"), "1", "date_of_birth") == (
+        "1",
+        "ValueError",
+        "date_of_birth",
+        "Invalid date",
+    )
+    assert get_row_error(KeyError("foo")) == ("", "KeyError", "", "'foo'")
+
+
+def test_error_report():
+    report = ErrorReport(max_samples=2)
+    for i in range(10):
+        report.add(get_row_error(ValueError(f"Unknown class {i}a"), i, "class_range"))
+    report.add(get_row_error(RuntimeError("Chronos is not installed."), 11, "group_subject"))
+
+    assert report.count == 11
+    groups = report.as_dict()["groups"]
+    assert groups["ValueError:class_range"]["count"] == 10
+    assert groups["ValueError:class_range"]["samples"] == [
+        ["0", "Unknown class 0a"],
+        ["1", "Unknown class 1a"],
+    ]
+    assert groups["RuntimeError:group_subject"]["count"] == 1
+
+    messages = report.get_messages("groups")
+    assert len(messages) == 3
+    assert messages[0].startswith("10 groups failed to be imported due to ValueError")
+    assert "0: Unknown class 0a" in messages[0]
+    assert "Unknown class 5a" not in messages[0]
+
+    report._text.flush()
+    report._file.seek(0)
+    lines = report._file.read().decode().splitlines()
+    assert lines[0] == "reference,error,field_type,message"
+    assert len(lines) == 12
+    report.close()
+
+
+def test_error_report_merge():
+    report = ErrorReport(max_samples=2)
+    report.add(get_row_error(ValueError("foo"), 1))
+
+    other = ErrorReport(max_samples=2)
+    other.add(get_row_error(ValueError("bar"), 2))
+    other.add(get_row_error(ValueError("baz"), 3))
+
+    report.merge(other.as_dict())
+    assert report.count == 3
+    assert report.groups["ValueError:"]["count"] == 3
+    assert report.groups["ValueError:"]["samples"] == [["1", "foo"], ["2", "bar"]]
+    report.close()
+    other.close()
@@ -0,0 +1,40 @@
+from datetime import date
+
+from django.contrib.contenttypes.models import ContentType
+
+import pytest
+
+from aleksis.apps.csv_import.models import ImportTemplate
+from aleksis.apps.csv_import.util.fingerprints import (
+    get_fingerprints,
+    get_row_fingerprint,
+    set_fingerprints,
+)
+from aleksis.core.models import Person
+
+
+def test_get_row_fingerprint():
+    row = {"first_name": "Jane", "date_of_birth": date(2010, 1, 1), "is_active": True}
+    cols = ["first_name", "date_of_birth"]
+
+    fingerprint = get_row_fingerprint(row, cols, "1")
+    assert fingerprint == get_row_fingerprint(dict(row, is_active=False), cols, "1")
+    assert fingerprint != get_row_fingerprint(dict(row, first_name="John"), cols, "1")
+    assert fingerprint != get_row_fingerprint(row, cols, "2")
+    assert fingerprint != get_row_fingerprint(row, cols, "1", [1, None])
+    assert get_row_fingerprint(row, cols, "1", [1, None]) != get_row_fingerprint(
+        row, cols, "1", [2, None]
+    )
+
+
+@pytest.mark.django_db
+def test_set_and_get_fingerprints():
+    template = ImportTemplate.objects.create(
+        content_type=ContentType.objects.get_for_model(Person), name="foo", verbose_name="Bar",
+    )
+
+    set_fingerprints(template, {1: "a", 2: "b"})
+    set_fingerprints(template, {2: "c", 3: "d"})
+
+    assert get_fingerprints(template, [1, 2, 3, 4]) == {1: "a", 2: "c", 3: "d"}
+    assert get_fingerprints(template, [4]) == {}
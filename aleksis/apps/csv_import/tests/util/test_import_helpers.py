@@ -1,4 +1,15 @@
-from aleksis.apps.csv_import.util.import_helpers import has_is_active_field, is_active, with_prefix
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.db import OperationalError
+
+from aleksis.apps.csv_import.util.import_helpers import (
+    HashingReader,
+    has_is_active_field,
+    is_active,
+    is_transient_error,
+    with_prefix,
+)
 from aleksis.core.models import Group, GroupType, Person
 
 
@@ -22,3 +33,33 @@ def test_with_prefix():
     assert with_prefix(None, "Bar") == "Bar"
     assert with_prefix(None, "") == ""
     assert with_prefix("", "") == ""
+
+
+class FakePostgresError(Exception):
+    def __init__(self, pgcode):
+        self.pgcode = pgcode
+
+
+def test_is_transient_error():
+    for pgcode, transient in [("40001", True), ("40P01", True), ("23505", False)]:
+        error = OperationalError()
+        error.__cause__ = FakePostgresError(pgcode)
+        assert is_transient_error(error) == transient
+
+    assert not is_transient_error(OperationalError())
+
+
+def test_hashing_reader():
+    content = b"a,b\n1,2\n" * 1000
+    expected = hashlib.sha256(content).hexdigest()
+
+    reader = HashingReader(ContentFile(content))
+    while reader.read(1000):
+        pass
+    assert reader.hexdigest() == expected
+
+    # Reading out of order falls back to reading the file again
+    reader = HashingReader(ContentFile(content))
+    reader.seek(10)
+    reader.read()
+    assert reader.hexdigest() == expected
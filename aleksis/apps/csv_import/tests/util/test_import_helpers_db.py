@@ -1,6 +1,16 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+
 import pytest
 
-from aleksis.apps.csv_import.util.import_helpers import bulk_get_or_create
+from aleksis.apps.csv_import.models import ImportJob, ImportTemplate
+from aleksis.apps.csv_import.util.fingerprints import set_fingerprints
+from aleksis.apps.csv_import.util.import_helpers import (
+    bulk_get_or_create,
+    deactivate,
+    deactivate_missing,
+    set_seen_objects,
+)
 from aleksis.core.models import Person
 
 pytestmark = pytest.mark.django_db
@@ -9,12 +19,25 @@ pytestmark = pytest.mark.django_db
 def test_bulk_get_or_create_person():
     short_names = ["FOO", "BAR", "BAZ"]
 
-    # with pytest.raises(Ex)
     r = bulk_get_or_create(Person, short_names, "short_name")
-    assert sorted([x.short_name for x in r]) == sorted(short_names)
+    assert sorted(r.keys()) == sorted(short_names)
+    assert all(person.pk and person.short_name == key for key, person in r.items())
+
+    r2 = bulk_get_or_create(Person, short_names + ["FOO"], "short_name")
+    assert r2 == r
+    assert Person.objects.count() == 3
 
-    r = bulk_get_or_create(Person, short_names, "short_name")
-    assert sorted([x.short_name for x in r]) == sorted(short_names)
+
+def test_bulk_get_or_create_person_defaults_not_shared():
+    defaults = {"first_name": "?"}
+
+    r = bulk_get_or_create(
+        Person, ["FOO", "BAR"], "short_name", default_attrs="last_name", defaults=defaults
+    )
+
+    assert defaults == {"first_name": "?"}
+    assert r["FOO"].last_name == "FOO"
+    assert r["BAR"].last_name == "BAR"
 
 
 def test_bulk_get_or_create_person_default_attrs():
@@ -22,7 +45,7 @@ def test_bulk_get_or_create_person_default_attrs():
 
     r = bulk_get_or_create(Person, short_names, "short_name", default_attrs="last_name")
 
-    for person in r:
+    for person in r.values():
         assert person.short_name in short_names
         assert person.short_name == person.last_name
 
@@ -34,7 +57,7 @@ def test_bulk_get_or_create_person_default_attrs_list():
         Person, short_names, "short_name", default_attrs=["first_name", "last_name"]
     )
 
-    for person in r:
+    for person in r.values():
         assert person.short_name == person.last_name
         assert person.short_name == person.first_name
 
@@ -46,7 +69,7 @@ def test_bulk_get_or_create_person_defaults():
 
     r = bulk_get_or_create(Person, short_names, "short_name", defaults=defaults)
 
-    for person in r:
+    for person in r.values():
         assert person.first_name == "foo"
         assert person.last_name == "bar"
 
@@ -60,6 +83,45 @@ def test_bulk_get_or_create_person_defaults_default_attrs():
         Person, short_names, "short_name", default_attrs=["first_name"], defaults=defaults,
     )
 
-    for person in r:
+    for person in r.values():
         assert person.short_name == person.first_name
         assert person.last_name == "foo"
+
+
+def test_deactivate():
+    foo = Person.objects.create(short_name="FOO", first_name="Foo", last_name="Foo")
+    bar = Person.objects.create(short_name="BAR", first_name="Bar", last_name="Bar")
+
+    assert deactivate(Person, [foo.pk]) == 1
+    assert deactivate(Person, [foo.pk]) == 0
+
+    foo.refresh_from_db()
+    bar.refresh_from_db()
+    assert not foo.is_active
+    assert bar.is_active
+
+
+def test_deactivate_missing():
+    content_type = ContentType.objects.get_for_model(Person)
+    template = ImportTemplate.objects.create(content_type=content_type, name="foo")
+    other_template = ImportTemplate.objects.create(content_type=content_type, name="bar")
+    import_job = ImportJob(template=template, full_sync=True)
+    import_job.attach_file(ContentFile(b"short_name\nFOO\n", name="test.csv"))
+
+    foo = Person.objects.create(short_name="FOO", first_name="Foo", last_name="Foo")
+    bar = Person.objects.create(short_name="BAR", first_name="Bar", last_name="Bar")
+    baz = Person.objects.create(short_name="BAZ", first_name="Baz", last_name="Baz")
+    qux = Person.objects.create(first_name="Qux", last_name="Qux")
+    set_fingerprints(template, {foo.pk: "1", bar.pk: ""})
+    set_fingerprints(other_template, {baz.pk: "1"})
+    set_seen_objects(import_job, [foo.pk])
+
+    assert deactivate_missing(Person, template, import_job, dry_run=True) == 1
+    assert deactivate_missing(Person, template, import_job) == 1
+
+    for person in (foo, bar, baz, qux):
+        person.refresh_from_db()
+    assert foo.is_active
+    assert not bar.is_active
+    assert baz.is_active
+    assert qux.is_active
@@ -0,0 +1,47 @@
+import pytest
+
+from aleksis.apps.csv_import.util.lookup_index import LookupIndex
+from aleksis.core.models import Group, Person
+
+pytestmark = pytest.mark.django_db
+
+
+def test_lookup_index_complete(django_assert_num_queries):
+    Group.objects.bulk_create([Group(short_name=name, name=name) for name in ["5a", "5b", "5c"]])
+
+    index = LookupIndex()
+    with django_assert_num_queries(1):
+        index.load(Group, "short_name", school_term=None)
+        index.load(Group, "short_name", school_term=None)
+
+        assert index.get(Group, "short_name", "5a", school_term=None).name == "5a"
+        groups = index.filter(Group, "short_name", ["5b", "5c", "5d"], school_term=None)
+        assert [g.short_name for g in groups] == ["5b", "5c"]
+
+        with pytest.raises(Group.DoesNotExist):
+            index.get(Group, "short_name", "5d", school_term=None)
+
+
+def test_lookup_index_values(django_assert_num_queries):
+    Person.objects.create(short_name="FOO", first_name="Foo", last_name="Foo")
+    Person.objects.create(short_name="BAR", first_name="Bar", last_name="Bar")
+
+    index = LookupIndex()
+    with django_assert_num_queries(1):
+        index.load(Person, "short_name", ["FOO", "BAZ"])
+        assert index.get(Person, "short_name", "FOO").first_name == "Foo"
+        assert index.get_all(Person, "short_name", "BAZ") == []
+
+    # Values which were not loaded before are fetched on demand
+    with django_assert_num_queries(1):
+        assert index.get(Person, "short_name", "BAR").first_name == "Bar"
+
+
+def test_lookup_index_add():
+    index = LookupIndex()
+    index.load(Person, "short_name", ["FOO"])
+
+    person = Person.objects.create(short_name="FOO", first_name="Foo", last_name="Foo")
+    index.add(person, "short_name")
+
+    assert index.get(Person, "short_name", "FOO") == person
@@ -0,0 +1,50 @@
+import pytest
+
+from aleksis.apps.csv_import.util.m2m_writer import M2MRelation, M2MWriter
+from aleksis.core.models import Group, Person
+
+pytestmark = pytest.mark.django_db
+
+
+def test_m2m_relation():
+    relation = M2MRelation(Person, "member_of")
+    assert relation.through == Group.members.through
+    assert relation.source == "person_id"
+    assert relation.target == "group_id"
+
+    relation = M2MRelation(Group, "owners")
+    assert relation.through == Group.owners.through
+    assert relation.target == "person_id"
+
+
+def test_m2m_writer_add():
+    foo = Group.objects.create(name="Foo", short_name="foo")
+    bar = Group.objects.create(name="Bar", short_name="bar")
+    jane = Person.objects.create(first_name="Jane", last_name="Doe")
+    john = Person.objects.create(first_name="John", last_name="Doe")
+    jane.member_of.add(foo)
+
+    writer = M2MWriter()
+    writer.add(jane, "member_of", [foo, bar])
+    writer.add(john, "member_of", [foo])
+    writer.add(john, "member_of", [foo])
+
+    assert writer.write() == (2, 0)
+    assert set(jane.member_of.all()) == {foo, bar}
+    assert set(john.member_of.all()) == {foo}
+
+    # Links are cleared after writing
+    assert writer.write() == (0, 0)
+
+
+def test_m2m_writer_sync():
+    group = Group.objects.create(name="Foo", short_name="foo")
+    jane = Person.objects.create(first_name="Jane", last_name="Doe")
+    john = Person.objects.create(first_name="John", last_name="Doe")
+    group.owners.add(jane)
+
+    writer = M2MWriter()
+    writer.add(group, "owners", [john], sync=True)
+
+    assert writer.write() == (1, 1)
+    assert list(group.owners.all()) == [john]
@@ -0,0 +1,100 @@
+from django.contrib.contenttypes.models import ContentType
+
+import pytest
+
+from aleksis.apps.csv_import.field_types import (
+    DepartmentsFieldType,
+    EmailFieldType,
+    FirstNameFieldType,
+    GroupOwnerByShortNameFieldType,
+    IgnoreFieldType,
+    IsActiveFieldType,
+    NameFieldType,
+    ShortNameFieldType,
+    UniqueReferenceFieldType,
+    field_type_registry,
+)
+from aleksis.apps.csv_import.models import ImportTemplate
+from aleksis.apps.csv_import.util.plan import ImportPlan
+from aleksis.core.models import Group, Person
+
+
+def test_unique_references_by_priority():
+    field_types = field_type_registry.unique_references_by_priority
+    assert field_types.index(EmailFieldType) < field_types.index(UniqueReferenceFieldType)
+    assert field_types.index(UniqueReferenceFieldType) < field_types.index(ShortNameFieldType)
+
+
+def test_plan_match_field_type():
+    plan = ImportPlan(Person, [ShortNameFieldType, UniqueReferenceFieldType])
+    assert plan.match_field_type == UniqueReferenceFieldType
+
+    with pytest.raises(ValueError):
+        ImportPlan(Person, [FirstNameFieldType])
+
+
+def test_plan_read_cols():
+    plan = ImportPlan(Person, [UniqueReferenceFieldType, IgnoreFieldType, FirstNameFieldType])
+    assert len(plan.cols) == 3
+    assert plan.read_cols == ["unique_reference", "first_name"]
+
+
+@pytest.mark.parametrize(
+    "field_types,match_field_type",
+    [
+        ([ShortNameFieldType, UniqueReferenceFieldType, EmailFieldType], EmailFieldType),
+        ([EmailFieldType, ShortNameFieldType], EmailFieldType),
+        ([ShortNameFieldType, UniqueReferenceFieldType], UniqueReferenceFieldType),
+        ([UniqueReferenceFieldType, ShortNameFieldType], UniqueReferenceFieldType),
+        ([FirstNameFieldType, ShortNameFieldType], ShortNameFieldType),
+    ],
+)
+def test_plan_match_field_type_priority(field_types, match_field_type):
+    # E-mail addresses are preferred over unique references and short names,
+    # independent of the order of the columns and of the field type registry
+    assert ImportPlan(Person, field_types).match_field_type == match_field_type
+
+
+def test_plan_build_values():
+    plan = ImportPlan(Person, [UniqueReferenceFieldType, FirstNameFieldType, DepartmentsFieldType])
+    assert plan.process_columns == [("departments", DepartmentsFieldType)]
+
+    row = {"unique_reference": "1", "first_name": "Jane", "departments": "M", "is_active": True}
+    assert plan.build_values(row) == {"first_name": "Jane", "is_active": True}
+
+    plan = ImportPlan(Person, [UniqueReferenceFieldType, IsActiveFieldType])
+    assert plan.direct_mappings == [("is_active", "is_active")]
+
+
+def test_plan_alternatives():
+    plan = ImportPlan(Group, [ShortNameFieldType])
+    assert plan.alternatives == [(NameFieldType.name, "short_name")]
+    assert plan.build_values({"short_name": "5a"}) == {"name": "5a"}
+
+    plan = ImportPlan(Group, [ShortNameFieldType, NameFieldType])
+    assert plan.alternatives == []
+
+
+def test_plan_multiple_columns():
+    plan = ImportPlan(
+        Group, [ShortNameFieldType, GroupOwnerByShortNameFieldType, GroupOwnerByShortNameFieldType]
+    )
+    columns = plan.multiple_columns[GroupOwnerByShortNameFieldType]
+    assert len(columns) == 2
+    assert columns == plan.cols[1:]
+
+
+@pytest.mark.django_db
+def test_plan_for_template_cached_per_revision():
+    template = ImportTemplate.objects.create(
+        content_type=ContentType.objects.get_for_model(Person), name="foo", verbose_name="Bar",
+    )
+    template.fields.create(field_type=UniqueReferenceFieldType.name, index=0)
+
+    plan = ImportPlan.for_template(template)
+    assert ImportPlan.for_template(template) is plan
+
+    template.fields.create(field_type=FirstNameFieldType.name, index=1)
+    new_plan = ImportPlan.for_template(template)
+    assert new_plan is not plan
+    assert new_plan.cols == ["unique_reference", "first_name"]
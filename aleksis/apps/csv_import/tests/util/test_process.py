@@ -0,0 +1,20 @@
+import pandas
+
+from aleksis.apps.csv_import.util.process import get_partition, in_partition
+
+
+def test_get_partition():
+    values = [str(i) for i in range(100)]
+    partitions = [get_partition(value, 4) for value in values]
+
+    assert set(partitions) == {0, 1, 2, 3}
+    assert partitions == [get_partition(value, 4) for value in values]
+    assert get_partition("1", 1) == 0
+
+
+def test_in_partition():
+    chunk = pandas.DataFrame({"short_name": [str(i) for i in range(20)]})
+    selected = [in_partition("short_name", (index, 3), chunk) for index in range(3)]
+
+    assert sum(sum(rows) for rows in selected) == 20
+    assert list(selected[1]) == [get_partition(str(i), 3) == 1 for i in range(20)]
@@ -0,0 +1,192 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.db import DatabaseError
+
+import pytest
+
+from aleksis.apps.csv_import.models import ImportJob, ImportReference, ImportTemplate
+from aleksis.apps.csv_import.util.process import (
+    Importer,
+    finish_import_csv,
+    import_csv,
+    import_csv_partition,
+)
+from aleksis.core.models import Person
+from aleksis.core.util.core_helpers import get_site_preferences
+
+pytestmark = pytest.mark.django_db
+
+FIELDS = ["unique_reference", "first_name", "last_name", "is_active"]
+
+
+class FakeRecorder:
+    def __init__(self, task=None):
+        self.messages = []
+
+    def add_message(self, level, message):
+        self.messages.append((level, message))
+
+    def set_progress(self, current, total):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def recorder(monkeypatch):
+    monkeypatch.setattr("aleksis.core.util.celery_progress.ProgressRecorder", FakeRecorder)
+    monkeypatch.setattr("aleksis.apps.csv_import.util.process.ProgressRecorder", FakeRecorder)
+    get_site_preferences()["csv_import__chunk_size"] = 2
+
+
+def create_template(fields):
+    template = ImportTemplate.objects.create(
+        content_type=ContentType.objects.get_for_model(Person), name="foo", verbose_name="Bar",
+    )
+    for index, field_type in enumerate(fields):
+        template.fields.create(index=index, field_type=field_type)
+    return template
+
+
+@pytest.fixture
+def template():
+    return create_template(FIELDS)
+
+
+def get_content(*rows):
+    lines = [",".join(FIELDS)]
+    lines += [f"{ref},{first_name},Doe,{active}" for ref, first_name, active in rows]
+    return "\n".join(lines).encode() + b"\n"
+
+
+def run_import(template, content, force=True, **kwargs) -> ImportJob:
+    import_job = ImportJob(template=template, force=force, **kwargs)
+    import_job.attach_file(ContentFile(content, name="test.csv"))
+    import_csv(import_job.pk)
+    import_job.refresh_from_db()
+    return import_job
+
+
+def get_persons():
+    return sorted(Person.objects.filter(last_name="Doe").values_list("first_name", "is_active"))
+
+
+def test_import_csv_counts(template):
+    content = get_content(("1", "Ann", 1), ("2", "Ben", 1), ("3", "Cid", 1))
+
+    diff = run_import(template, content).diff
+    assert (diff["created"], diff["updated"], diff["unchanged"]) == (3, 0, 0)
+
+    diff = run_import(template, content).diff
+    assert (diff["created"], diff["updated"], diff["unchanged"]) == (0, 0, 3)
+
+    content = get_content(("1", "Ann", 1), ("2", "Bob", 1), ("3", "Cid", 1))
+    diff = run_import(template, content).diff
+    assert (diff["created"], diff["updated"], diff["unchanged"]) == (0, 1, 2)
+    assert get_persons() == [("Ann", True), ("Bob", True), ("Cid", True)]
+
+
+def test_import_csv_ignore_column():
+    template = create_template(["unique_reference", "ignore", "first_name", "last_name"])
+    content = b"ref,x,first_name,last_name\n1,foo,Ann,Doe\n2,bar,Ben,Doe\n"
+
+    diff = run_import(template, content).diff
+    assert (diff["created"], diff["failed"]) == (2, 0)
+
+    # Changes in ignored columns do not change the fingerprint
+    content = content.replace(b"foo", b"baz")
+    assert run_import(template, content).diff["unchanged"] == 2
+    assert get_persons() == [("Ann", True), ("Ben", True)]
+
+
+def test_import_csv_dry_run(template):
+    content = get_content(("1", "Ann", 1), ("2", "Ben", 1))
+
+    import_job = run_import(template, content, dry_run=True)
+
+    assert import_job.diff["created"] == 2
+    assert get_persons() == []
+    assert not ImportReference.objects.exists()
+
+
+def test_import_csv_dry_run_after_import(template):
+    content = get_content(("1", "Ann", 1), ("2", "Ben", 1))
+    run_import(template, content, force=False)
+
+    import_job = run_import(template, content, force=False, dry_run=True)
+
+    assert import_job.duplicate_of is None
+    assert import_job.diff["unchanged"] == 2
+
+
+def test_import_csv_full_sync(template):
+    run_import(template, get_content(("1", "Ann", 1), ("2", "Ben", 1), ("3", "Cid", 1)))
+
+    import_job = run_import(template, get_content(("1", "Ann", 1)), full_sync=True)
+
+    assert import_job.diff["deactivated"] == 2
+    assert get_persons() == [("Ann", True), ("Ben", False), ("Cid", False)]
+
+
+def test_import_csv_full_sync_other_template(template):
+    run_import(create_template(FIELDS), get_content(("9", "Zoe", 1)))
+    run_import(template, get_content(("1", "Ann", 1), ("2", "Ben", 1)))
+
+    import_job = run_import(template, get_content(("1", "Ann", 1)), full_sync=True)
+
+    assert import_job.diff["deactivated"] == 1
+    assert get_persons() == [("Ann", True), ("Ben", False), ("Zoe", True)]
+    assert not import_job.seen_objects.exists()
+
+
+def test_import_csv_failed_chunk(template, monkeypatch):
+    process_chunk = Importer._process_chunk
+
+    def _process_chunk(self, chunk):
+        process_chunk(self, chunk)
+        if "3" in chunk["unique_reference"].tolist():
+            raise DatabaseError("Chunk failed")
+
+    monkeypatch.setattr(Importer, "_process_chunk", _process_chunk)
+    content = get_content(("1", "Ann", 1), ("2", "Ben", 1), ("3", "Cid", 1), ("4", "Dan", 1))
+
+    import_job = run_import(template, content)
+
+    assert (import_job.diff["created"], import_job.diff["failed"]) == (2, 2)
+    assert import_job.stats["failed"] == 2
+    assert get_persons() == [("Ann", True), ("Ben", True)]
+    assert ImportReference.objects.count() == 2
+
+
+def test_import_csv_failed_related(template, monkeypatch):
+    process_related = Importer.process_related
+
+    def _process_related(self, row, instance):
+        if row["unique_reference"] == "2":
+            raise ValueError("Related object failed")
+        return process_related(self, row, instance)
+
+    monkeypatch.setattr(Importer, "process_related", _process_related)
+    content = get_content(("1", "Ann", 1), ("2", "Ben", 1))
+
+    import_job = run_import(template, content)
+
+    assert (import_job.diff["created"], import_job.diff["failed"]) == (1, 1)
+    assert import_job.stats["failed"] == 1
+
+
+def test_import_csv_partitions(template):
+    content = get_content(*[(str(i), f"Person{i}", 1) for i in range(10)])
+    single = run_import(template, content).diff
+    persons = get_persons()
+
+    Person.objects.filter(last_name="Doe").delete()
+    import_job = ImportJob(template=template, force=True)
+    import_job.attach_file(ContentFile(content, name="test.csv"))
+    results = [import_csv_partition(import_job.pk, index, 3, "reducer") for index in range(3)]
+    finish_import_csv(results, import_job.pk)
+    import_job.refresh_from_db()
+
+    for key in ["created", "updated", "unchanged", "deactivated"]:
+        assert import_job.diff[key] == single[key]
+    assert single["created"] == 10
+    assert get_persons() == persons
+    assert ImportReference.objects.count() == 10
@@ -0,0 +1,33 @@
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+
+import pytest
+
+from aleksis.apps.csv_import.models import ImportJob, ImportTemplate
+from aleksis.apps.csv_import.util.profiling import profile_import
+from aleksis.core.models import Person
+
+pytestmark = pytest.mark.django_db
+
+
+def test_profile_import():
+    template = ImportTemplate.objects.create(
+        content_type=ContentType.objects.get_for_model(Person), name="foo", verbose_name="Bar",
+    )
+    import_job = ImportJob(template=template, profile=True)
+    import_job.attach_file(ContentFile(b"unique_reference\n1\n", name="test.csv"))
+
+    with profile_import(import_job):
+        list(Person.objects.all())
+        data = [str(i) for i in range(10000)]
+
+    import_job.refresh_from_db()
+    with import_job.profile_file.open("r") as f:
+        report = f.read()
+
+    assert "Functions by cumulative time" in report
+    assert "Memory allocation sites" in report
+    assert "test_profiling.py" in report
+    assert data
+    import_job.profile_file.delete(save=False)
+    import_job.data_file.delete(save=False)
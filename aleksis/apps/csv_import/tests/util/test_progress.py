@@ -0,0 +1,58 @@
+from aleksis.apps.csv_import.util.progress import ThrottledProgress
+
+
+class FakeRecorder:
+    def __init__(self):
+        self.updates = []
+
+    def set_progress(self, current, total):
+        self.updates.append((current, total))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_throttled_progress_interval():
+    recorder, clock = FakeRecorder(), FakeClock()
+    progress = ThrottledProgress(recorder, interval=1.0, clock=clock)
+
+    progress.set_progress(0, 100)
+    progress.set_progress(10, 100)
+    clock.now = 0.5
+    progress.set_progress(20, 100)
+    clock.now = 1.0
+    progress.set_progress(30, 100)
+    progress.set_progress(100, 100, force=True)
+
+    assert recorder.updates == [(0, 100), (30, 100), (100, 100)]
+    assert progress.updates == 3
+
+
+def test_throttled_progress_rows():
+    recorder, clock = FakeRecorder(), FakeClock()
+    progress = ThrottledProgress(recorder, interval=60.0, rows=50, clock=clock)
+
+    for current in range(0, 201, 10):
+        progress.set_progress(current, 200)
+
+    assert [current for current, __ in recorder.updates] == [0, 50, 100, 150, 200]
+
+
+def test_throttled_progress_bounded():
+    """The number of updates only depends on the duration, not on the number of rows."""
+    for rows in (1_000, 100_000, 1_000_000):
+        recorder, clock = FakeRecorder(), FakeClock()
+        progress = ThrottledProgress(recorder, interval=1.0, clock=clock)
+
+        # Import all rows in ten seconds, reporting progress after every row
+        for current in range(rows):
+            clock.now = current * 10 / rows
+            progress.set_progress(current, rows)
+        progress.set_progress(rows, rows, force=True)
+
+        assert progress.updates <= 12
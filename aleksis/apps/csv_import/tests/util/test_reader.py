@@ -0,0 +1,148 @@
+from io import BytesIO
+
+import pytest
+
+from aleksis.apps.csv_import.util.reader import (
+    PARSER_ENGINES,
+    estimate_row_count,
+    is_parser_engine_available,
+    read_csv_chunks,
+)
+
+SEPARATOR_FILES = [
+    (",", b'\xef\xbb\xbfname,value,x\na,"b, c",1\n\nd,e,\n"f ""g""",h,2\n'),
+    ("\t", b"name\tvalue\tx\na\tb\t1\nd\te\t2\n"),
+    (r"\s+", b'name value x\n  a\t"b c"   1 \n\nd e 2\n'),
+    (r"\|\|", b"name||value||x\na||b||1\n d || e||2\n"),
+]
+
+
+def test_estimate_row_count_small_file():
+    data = b"a,b\n1,2\n3,4\n5,6\n"
+    csv = BytesIO(data)
+    assert estimate_row_count(csv, len(data)) == 3
+    assert estimate_row_count(csv, len(data), has_header_row=False) == 4
+    assert csv.tell() == 0
+
+
+def test_estimate_row_count_missing_newline():
+    data = b"a,b\n1,2\n3,4"
+    assert estimate_row_count(BytesIO(data), len(data)) == 2
+
+
+def test_estimate_row_count_empty_file():
+    assert estimate_row_count(BytesIO(b""), 0) == 0
+
+
+def test_estimate_row_count_large_file():
+    data = b"a,b\n" + b"10,20\n" * 10000
+    csv = BytesIO(data)
+    estimate = estimate_row_count(csv, len(data), sample_size=600)
+    assert 9900 <= estimate <= 10100
+    assert csv.tell() == 0
+
+
+def read_records(data, separator, engine, chunk_size=2, **kwargs):
+    if not is_parser_engine_available(engine):
+        pytest.skip(f"The CSV parser {engine} is not installed")
+    chunks = read_csv_chunks(
+        BytesIO(data),
+        ["name", "value", "_ignore"],
+        {"name": str, "value": str},
+        kwargs.pop("converters", {}),
+        {},
+        separator=separator,
+        has_header_row=True,
+        chunk_size=chunk_size,
+        engine=engine,
+        **kwargs,
+    )
+    return [record for chunk in chunks for record in chunk.to_dict("records")]
+
+
+@pytest.mark.parametrize("engine", PARSER_ENGINES)
+@pytest.mark.parametrize("separator,data", SEPARATOR_FILES)
+def test_read_csv_chunks_separators(separator, data, engine):
+    assert read_records(data, separator, engine) == read_records(data, separator, "pandas")
+
+
+@pytest.mark.parametrize("engine", ["pandas", "csv"])
+def test_read_csv_chunks_missing_fields(engine):
+    data = b"name,value,x\na,b,1\nc\n"
+    assert read_records(data, ",", engine) == [
+        {"name": "a", "value": "b"},
+        {"name": "c", "value": ""},
+    ]
+
+
+@pytest.mark.parametrize("engine", PARSER_ENGINES)
+def test_read_csv_chunks_chunk_size(engine):
+    data = b"name,value,x\n" + b"".join(b"n%d,v%d,\n" % (i, i) for i in range(10))
+    records = read_records(data, ",", engine, chunk_size=3)
+    assert [record["name"] for record in records] == [f"n{i}" for i in range(10)]
+
+
+@pytest.mark.parametrize("engine", PARSER_ENGINES)
+def test_read_csv_chunks_converters(engine):
+    data = b"name,value,x\na,x,1\nb,y,2\nc,x,3\n"
+    records = read_records(
+        data, ",", engine, converters={"value": str.upper}, categorical=["value"]
+    )
+    assert records == [
+        {"name": "a", "value": "X"},
+        {"name": "b", "value": "Y"},
+        {"name": "c", "value": "X"},
+    ]
+
+
+@pytest.mark.parametrize("engine", PARSER_ENGINES)
+def test_read_csv_chunks_row_filter(engine):
+    if not is_parser_engine_available(engine):
+        pytest.skip(f"The CSV parser {engine} is not installed")
+    converted = []
+
+    def converter(value):
+        converted.append(value)
+        return value.upper()
+
+    data = b"name,value,x\na,x,1\nb,y,2\nc,z,3\n"
+    chunks = list(
+        read_csv_chunks(
+            BytesIO(data),
+            ["name", "value", "_ignore"],
+            {"name": str, "value": str},
+            {"value": converter},
+            {},
+            separator=",",
+            has_header_row=True,
+            chunk_size=2,
+            engine=engine,
+            row_filter=lambda chunk: chunk["name"] != "b",
+        )
+    )
+
+    assert [record for chunk in chunks for record in chunk.to_dict("records")] == [
+        {"name": "a", "value": "X"},
+        {"name": "c", "value": "Z"},
+    ]
+    assert [chunk.attrs["rows"] for chunk in chunks] == [2, 1]
+    assert converted == ["x", "z"]
+
+
+@pytest.mark.parametrize("engine", PARSER_ENGINES)
+def test_read_csv_chunks_booleans(engine):
+    if not is_parser_engine_available(engine):
+        pytest.skip(f"The CSV parser {engine} is not installed")
+    data = b"name,active\na,Ja\nb,nein\nc,+\nd,-\n"
+    chunks = read_csv_chunks(
+        BytesIO(data),
+        ["name", "active"],
+        {"name": str, "active": bool},
+        {},
+        {},
+        separator=",",
+        has_header_row=True,
+        chunk_size=10,
+        engine=engine,
+    )
+    assert next(chunks)["active"].tolist() == [True, False, True, False]
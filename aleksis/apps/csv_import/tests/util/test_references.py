@@ -0,0 +1,124 @@
+from datetime import date
+
+import pytest
+
+from aleksis.apps.csv_import.models import ImportReference
+from aleksis.apps.csv_import.util.bulk_writer import BulkWriter
+from aleksis.apps.csv_import.util.lookup_index import LookupIndex
+from aleksis.apps.csv_import.util.references import (
+    get_objects_by_reference,
+    get_reference_queryset,
+    set_references,
+)
+from aleksis.core.models import Group, Person, SchoolTerm
+
+pytestmark = pytest.mark.django_db
+
+
+def test_set_and_get_references():
+    jane = Person.objects.create(first_name="Jane", last_name="Doe")
+    john = Person.objects.create(first_name="John", last_name="Doe")
+
+    set_references([(jane, "1"), (john, "2"), (john, "")], "csv")
+    set_references([(jane, "1")], "csv")
+
+    assert get_reference_queryset(Person, "csv").count() == 2
+    assert get_reference_queryset(Group, "csv").count() == 0
+    assert sorted(get_objects_by_reference(Person, "csv"), key=lambda r: r[0]) == [
+        ("1", jane),
+        ("2", john),
+    ]
+    assert get_objects_by_reference(Person, "csv", ["2", "3"]) == [("2", john)]
+    assert get_objects_by_reference(Person, "other") == []
+
+
+def test_get_objects_by_reference_filters():
+    jane = Person.objects.create(first_name="Jane", last_name="Doe", is_active=False)
+    set_references([(jane, "1")], "csv")
+
+    assert get_objects_by_reference(Person, "csv", is_active=True) == []
+
+
+def test_lookup_index_uses_references(django_assert_num_queries):
+    jane = Person.objects.create(first_name="Jane", last_name="Doe")
+    set_references([(jane, "1")], "csv")
+
+    index = LookupIndex()
+    index.load(Person, "import_ref_csv", ["1", "2"])
+
+    with django_assert_num_queries(0):
+        assert index.get(Person, "import_ref_csv", "1") == jane
+        assert index.get_all(Person, "import_ref_csv", "2") == []
+
+
+def test_set_references_replaces_stale_references():
+    jane = Person.objects.create(first_name="Jane", last_name="Doe")
+    set_references([(jane, "1")], "csv")
+    ImportReference.objects.filter(object_id=jane.pk).update(object_id=0)
+
+    set_references([(jane, "1")], "csv")
+    assert get_objects_by_reference(Person, "csv", ["1"]) == [("1", jane)]
+    assert get_reference_queryset(Person, "csv").count() == 1
+
+
+def test_deleted_object_is_imported_again():
+    def import_person():
+        writer = BulkWriter(Person)
+        writer.add({}, "import_ref_csv", "1", {"first_name": "Jane", "last_name": "Doe"})
+        writer.flush()
+
+    import_person()
+    Person.objects.get(last_name="Doe").delete()
+    assert get_reference_queryset(Person, "csv").count() == 0
+
+    import_person()
+    import_person()
+
+    person = Person.objects.get(last_name="Doe")
+    assert get_objects_by_reference(Person, "csv") == [("1", person)]
+
+
+def test_references_per_school_term():
+    old_term = SchoolTerm.objects.create(
+        name="2020", date_start=date(2020, 8, 1), date_end=date(2021, 7, 31)
+    )
+    new_term = SchoolTerm.objects.create(
+        name="2021", date_start=date(2021, 8, 1), date_end=date(2022, 7, 31)
+    )
+
+    def import_group(school_term):
+        writer = BulkWriter(Group, {"school_term": school_term})
+        writer.add({}, "import_ref_csv", "5a", {"name": "Class 5a", "short_name": "5a"})
+        writer.flush()
+        return Group.objects.get(school_term=school_term, short_name="5a")
+
+    old_group = import_group(old_term)
+    new_group = import_group(new_term)
+    assert old_group != new_group
+
+    # Importing a term again finds its own group instead of creating a new one
+    assert import_group(old_term) == old_group
+    assert import_group(new_term) == new_group
+    assert Group.objects.filter(short_name="5a").count() == 2
+    assert get_objects_by_reference(Group, "csv", ["5a"], school_term=old_term) == [
+        ("5a", old_group)
+    ]
+    assert get_reference_queryset(Group, "csv").count() == 2
+
+
+def test_references_of_updated_objects():
+    jane = Person.objects.create(first_name="Jane", last_name="Doe", email="jane@example.com")
+
+    writer = BulkWriter(Person)
+    writer.add({}, "email", "jane@example.com", {"import_ref_csv": "1"})
+    writer.flush()
+    assert get_objects_by_reference(Person, "csv") == [("1", jane)]
+
+    jane.refresh_from_db()
+    jane.import_ref_csv = "2"
+    jane.save()
+    assert get_objects_by_reference(Person, "csv") == [("2", jane)]
+
+    jane.import_ref_csv = ""
+    jane.save()
+    assert get_objects_by_reference(Person, "csv") == []
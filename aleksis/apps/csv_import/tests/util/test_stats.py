@@ -0,0 +1,49 @@
+from aleksis.apps.csv_import.util.stats import ImportStats, format_stats
+
+
+def test_import_stats_measure():
+    stats = ImportStats()
+    stats.rows = 10
+
+    with stats.measure("write"):
+        with stats.measure_field_type("departments"):
+            pass
+    with stats.measure("read"):
+        pass
+
+    result = stats.as_dict()
+    assert result["rows"] == 10
+    assert list(result["phases"].keys()) == ["read", "write"]
+    assert result["phases"]["write"]["seconds"] >= result["field_types"]["departments"]["seconds"]
+    assert result["phases"]["write"]["queries"] == 0
+
+
+def test_import_stats_timed():
+    stats = ImportStats()
+    convert = stats.timed("convert", str.upper)
+
+    assert convert("foo") == "FOO"
+    assert stats.phases["convert"]["seconds"] > 0
+
+
+def test_import_stats_merge():
+    stats = ImportStats()
+    stats.rows = 5
+    with stats.measure("read"):
+        pass
+
+    other = ImportStats()
+    other.rows = 3
+    with other.measure("read"):
+        pass
+    with other.measure_field_type("class_range"):
+        pass
+
+    stats.merge(other.as_dict())
+    result = stats.as_dict()
+    assert result["rows"] == 8
+    assert "class_range" in result["field_types"]
+
+    lines = format_stats(result)
+    assert lines[0].startswith("8 rows")
+    assert any("field type class_range" in line for line in lines)
@@ -0,0 +1,22 @@
+import pytest
+
+from aleksis.apps.csv_import.util.stats import ImportStats
+from aleksis.core.models import Person
+
+pytestmark = pytest.mark.django_db
+
+
+def test_import_stats_queries():
+    stats = ImportStats()
+
+    with stats.record():
+        with stats.measure("match"):
+            list(Person.objects.all())
+            with stats.measure_field_type("departments"):
+                list(Person.objects.all())
+        list(Person.objects.all())
+
+    result = stats.as_dict()
+    assert result["queries"] == 3
+    assert result["phases"]["match"]["queries"] == 2
+    assert result["field_types"]["departments"]["queries"] == 1
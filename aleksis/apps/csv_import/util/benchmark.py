@@ -0,0 +1,265 @@
+"""Benchmarks of imports with synthetic files shaped like the default templates."""
+
+import csv
+import io
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set
+
+from django.contrib import messages
+from django.core.files.base import ContentFile
+from django.db import connection
+
+from aleksis.apps.csv_import.default_templates import get_default_template_definitions
+from aleksis.apps.csv_import.models import ImportJob, ImportTemplate
+from aleksis.apps.csv_import.util.process import Importer
+from aleksis.core.models import SchoolTerm
+
+LAST_NAMES = ["Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner", "Becker"]
+FIRST_NAMES = ["Anna", "Ben", "Clara", "David", "Emma", "Finn", "Greta", "Hannah", "Jonas"]
+SUBJECTS = ["D", "E", "M", "BI", "CH", "PH", "GE", "EK", "KU", "MU", "SP", "IF"]
+
+#: Number of distinct teachers, classes and courses referenced by generated rows
+TEACHERS = 100
+CLASSES = 36
+COURSES = 500
+
+#: Templates which have to be imported before a template, with their number of rows
+PREREQUISITES = {
+    "pedasos_classes": [("pedasos_teachers", TEACHERS)],
+    "pedasos_courses": [("pedasos_teachers", TEACHERS), ("pedasos_classes", CLASSES)],
+    "pedasos_students": [("pedasos_classes", CLASSES), ("pedasos_courses", COURSES)],
+    "pedasos_guardians_1": [("pedasos_students", None)],
+    "pedasos_guardians_2": [("pedasos_students", None)],
+}
+
+
+def get_teacher(i: int) -> str:
+    return f"T{i:05d}"
+
+
+def get_class(i: int) -> str:
+    return f"{5 + i // 4}{'abcd'[i % 4]}"
+
+
+def get_course(i: int) -> str:
+    return f"K{i:06d}"
+
+
+def get_student(i: int) -> str:
+    return f"S{i:07d}"
+
+
+def get_class_range(rng: random.Random) -> str:
+    grade = 5 + rng.randrange(CLASSES // 4 - 1)
+    return rng.choice([f"{grade}a", f"{grade}a-d", f"{grade}b-c", f"{grade}-{grade + 1}"])
+
+
+#: Generators of values by field type, called with a random generator and the row number
+VALUES: Dict[str, Callable[[random.Random, int], str]] = {
+    "unique_reference": lambda rng, i: get_student(i),
+    "child_by_unique_reference": lambda rng, i: get_student(i),
+    "last_name": lambda rng, i: rng.choice(LAST_NAMES),
+    "first_name": lambda rng, i: rng.choice(FIRST_NAMES),
+    "date_of_birth": lambda rng, i: (
+        f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.{rng.randint(1960, 2015)}"
+    ),
+    "sex": lambda rng, i: rng.choice(["m", "w"]),
+    "email": lambda rng, i: f"guardian{i}@example.org",
+    "departments": lambda rng, i: ",".join(rng.sample(SUBJECTS, 2)),
+    "class_range": lambda rng, i: get_class_range(rng),
+    "group_subject_short_name": lambda rng, i: rng.choice(SUBJECTS),
+    "group_owner_short_name": lambda rng, i: get_teacher(rng.randrange(TEACHERS)),
+    "primary_group_short_name": lambda rng, i: get_class(rng.randrange(CLASSES)),
+    "group_membership_short_name": lambda rng, i: (
+        get_course(rng.randrange(COURSES)) if rng.random() < 0.4 else ""
+    ),
+    "ignore": lambda rng, i: rng.choice(["", "x"]),
+}
+
+#: Generators of short names by template
+SHORT_NAMES = {
+    "pedasos_teachers": get_teacher,
+    "pedasos_classes": get_class,
+    "pedasos_courses": get_course,
+}
+
+
+def generate_file(name: str, rows: int, seed: int = 0) -> bytes:
+    """Generate a synthetic file for a default template.
+
+    The same name, number of rows and seed always result in the same file.
+    References to teachers, classes and courses stay within the first
+    ``TEACHERS``, ``CLASSES`` and ``COURSES`` objects of the other templates.
+    """
+    definition = get_default_template_definitions()[name]
+    fields = definition["fields"]
+    separator = definition.get("extra_args", {}).get("separator", ",")
+    rng = random.Random(f"{name}-{seed}")
+
+    out = io.StringIO()
+    writer = csv.writer(out, delimiter=separator, lineterminator="\n")
+    writer.writerow([f"{field}_{i}" for i, field in enumerate(fields)])
+    for i in range(rows):
+        writer.writerow(
+            [
+                SHORT_NAMES[name](i) if field == "short_name" else VALUES[field](rng, i)
+                for field in fields
+            ]
+        )
+    return out.getvalue().encode()
+
+
+class BenchmarkRecorder:
+    """Collect the messages of a benchmarked import instead of reporting them."""
+
+    def __init__(self):
+        self.errors = 0
+        self.progress_updates = 0
+
+    def add_message(self, level: int, message: str):
+        if level == messages.ERROR:
+            self.errors += 1
+
+    def set_progress(self, current: int, total: int):
+        self.progress_updates += 1
+
+
+@dataclass
+class BenchmarkResult:
+    """Measurements of one benchmarked import."""
+
+    template: str
+    engine: str
+    rows: int
+    seconds: float
+    read_seconds: float
+    queries: int
+    peak_memory: int
+    errors: int
+    failed: int
+    progress_updates: int
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def queries_per_row(self) -> float:
+        return self.queries / self.rows if self.rows else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "rows_per_second": round(self.rows_per_second, 1),
+            "queries_per_row": round(self.queries_per_row, 3),
+            "peak_memory": self.peak_memory,
+        }
+
+
+def run_import(
+    name: str,
+    content: bytes,
+    school_term: Optional[SchoolTerm] = None,
+    measure: bool = False,
+    engine: str = "",
+) -> Optional[BenchmarkResult]:
+    """Import a file with a default template in this process.
+
+    :param measure: Measure duration, database queries and peak memory of the import
+    :param engine: Parser engine, defaults to the one of the template
+    """
+    template = ImportTemplate.objects.get(name=name)
+    import_job = ImportJob(
+        template=template, school_term=school_term, force=True, parser_engine=engine
+    )
+    import_job.attach_file(ContentFile(content, name=f"{name}.csv"))
+    recorder = BenchmarkRecorder()
+
+    queries = 0
+
+    def count_queries(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    try:
+        if measure:
+            tracemalloc.start()
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_queries):
+            importer = Importer(import_job, recorder)
+            importer.run()
+            importer.finish()
+        seconds = time.perf_counter() - start
+        if measure:
+            __, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+    finally:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        # The database is rolled back after benchmarks, but stored files are not
+        for file in (import_job.data_file, import_job.errors_file, import_job.profile_file):
+            file.delete(save=False)
+
+    if not measure:
+        return None
+
+    rows = content.count(b"\n") - (1 if template.has_header_row else 0)
+    return BenchmarkResult(
+        name,
+        import_job.get_parser_engine(),
+        rows,
+        seconds,
+        importer.stats.phases["read"]["seconds"],
+        queries,
+        peak_memory,
+        recorder.errors,
+        importer.diff.failed,
+        recorder.progress_updates,
+    )
+
+
+def prepare_benchmark(
+    name: str,
+    rows: int,
+    school_term: Optional[SchoolTerm] = None,
+    done: Optional[Set[str]] = None,
+):
+    """Import the files of all templates a template refers to."""
+    done = set() if done is None else done
+    for prerequisite, prerequisite_rows in PREREQUISITES.get(name, []):
+        if prerequisite in done:
+            continue
+        prerequisite_rows = prerequisite_rows or rows
+        prepare_benchmark(prerequisite, prerequisite_rows, school_term, done)
+        run_import(prerequisite, generate_file(prerequisite, prerequisite_rows), school_term)
+        done.add(prerequisite)
+
+
+def run_benchmark(
+    name: str,
+    rows: int,
+    seed: int = 0,
+    school_term: Optional[SchoolTerm] = None,
+    engine: str = "",
+) -> BenchmarkResult:
+    """Benchmark the import of a synthetic file with a default template.
+
+    All data the file refers to is imported first and not measured. Peak memory
+    is measured with ``tracemalloc``, which slows down the import, so the number
+    of rows per second is only comparable to other benchmarks.
+
+    :param engine: Parser engine, defaults to the one of the template. The time
+        spent reading the file is measured separately to compare engines.
+    """
+    prepare_benchmark(name, rows, school_term)
+    return run_import(
+        name, generate_file(name, rows, seed), school_term, measure=True, engine=engine
+    )
+
+
+def get_benchmark_names() -> List[str]:
+    """Get the names of all default templates which can be benchmarked."""
+    return list(get_default_template_definitions().keys())
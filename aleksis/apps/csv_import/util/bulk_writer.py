@@ -0,0 +1,293 @@
+"""Batched writing of imported objects to the database."""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models import Model
+
+from aleksis.apps.csv_import.settings import IMPORT_BATCH_SIZE
+from aleksis.apps.csv_import.util.import_helpers import is_transient_error
+from aleksis.apps.csv_import.util.lookup_index import LookupIndex
+from aleksis.apps.csv_import.util.references import (
+    REFERENCE_FIELDS,
+    defer_references,
+    set_references,
+)
+from aleksis.core.models import Group, Person
+
+#: Fields whose changes have to be propagated by the model's own ``save()``
+SAVE_TRIGGER_FIELDS = {
+    Person: {"first_name", "last_name", "email"},
+    Group: {"name", "short_name"},
+}
+
+
+@dataclass
+class WriteOperation:
+    """One buffered row, together with the result of writing it."""
+
+    row: dict
+    match_field: str
+    match_value: Any
+    values: dict
+    instance: Optional[Model] = None
+    created: bool = False
+    changed_fields: Set[str] = field(default_factory=set)
+    # Old and new values of all changed fields
+    diff: Dict[str, Tuple[Any, Any]] = field(default_factory=dict)
+    error: Optional[Exception] = None
+
+    @property
+    def key(self) -> Tuple[str, Any]:
+        return self.match_field, self.match_value
+
+
+def needs_save(instance: Model, created: bool, changed_fields: Set[str]) -> bool:
+    """Check whether an imported object has to be written using its ``save()`` method.
+
+    ``Group.save()`` synchronises Django groups and ``Person.save()`` synchronises
+    linked users, so these objects cannot be written by bulk operations.
+    """
+    if isinstance(instance, Group):
+        return created or bool(changed_fields & SAVE_TRIGGER_FIELDS[Group])
+    if isinstance(instance, Person):
+        return bool(instance.user_id) and bool(changed_fields & SAVE_TRIGGER_FIELDS[Person])
+    return False
+
+
+def get_update_field_name(model: Model, name: str) -> str:
+    """Get the name of the concrete field which stores the value of a model field.
+
+    Fields added by ``ExtensibleModel.field`` live in a JSON field and
+    have to be written by updating this JSON field.
+    """
+    model_field = model._meta.get_field(name)
+    if not model_field.concrete and hasattr(model_field, "json_field_name"):
+        return model_field.json_field_name
+    return model_field.name
+
+
+def get_comparable_values(instance: Model, name: str, value: Any) -> Tuple[Any, Any]:
+    """Get the value stored in a model instance and a new value in a comparable form.
+
+    For foreign keys, primary keys are compared to avoid fetching the related object.
+    """
+    model_field = instance._meta.get_field(name)
+    if model_field.many_to_one:
+        return getattr(instance, model_field.attname), getattr(value, "pk", value)
+    return getattr(instance, name), value
+
+
+def has_changed(instance: Model, name: str, value: Any) -> bool:
+    """Check whether a value differs from the value stored in a model instance."""
+    old_value, new_value = get_comparable_values(instance, name, value)
+    return old_value != new_value
+
+
+class BulkWriter:
+    """Buffer imported rows and write them to the database in batches.
+
+    Each batch is split into new and existing objects. New objects are
+    inserted with one ``bulk_create``, existing objects are updated with
+    ``bulk_update`` on only the fields that actually changed. If a bulk
+    operation fails, the affected objects are written one by one, so
+    errors can be reported per row.
+
+    Existing objects are resolved using a ``LookupIndex``, so they can
+    be prefetched for the whole file at once.
+
+    In a dry run, all changes are only computed in memory and nothing
+    is written to the database.
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        filters: Optional[dict] = None,
+        index: Optional[LookupIndex] = None,
+        batch_size: int = IMPORT_BATCH_SIZE,
+        dry_run: bool = False,
+    ):
+        self.model = model
+        self.filters = filters or {}
+        self.index = index or LookupIndex()
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+
+        self.created_count = 0
+        self.updated_count = 0
+
+        self._buffer = []
+        self._keys = set()
+
+    def add(
+        self, row: dict, match_field: str, match_value: Any, values: dict
+    ) -> List[WriteOperation]:
+        """Add a row to the buffer.
+
+        :return: All operations which were written to make room for this row
+        """
+        written = []
+        if (match_field, match_value) in self._keys:
+            # The same object is referenced twice, so the first row has to be written first
+            written = self.flush()
+
+        operation = WriteOperation(row, match_field, match_value, values)
+        self._buffer.append(operation)
+        self._keys.add(operation.key)
+
+        if len(self._buffer) >= self.batch_size:
+            written += self.flush()
+
+        return written
+
+    def flush(self) -> List[WriteOperation]:
+        """Write all buffered rows to the database.
+
+        Objects which would be created in a dry run are still added to the
+        index, so later rows for the same object are treated as updates.
+
+        :return: All written operations, including failed ones
+        """
+        operations, self._buffer, self._keys = self._buffer, [], set()
+        if not operations:
+            return []
+
+        existing = self.get_existing(operations)
+
+        to_create, to_update, to_save = [], [], []
+        for operation in operations:
+            candidates = existing.get(operation.key, [])
+            if len(candidates) > 1:
+                operation.error = self.model.MultipleObjectsReturned(
+                    f"{len(candidates)} objects found for {operation.match_field} "
+                    f"{operation.match_value}."
+                )
+                continue
+
+            if candidates:
+                instance = candidates[0]
+                for name, value in operation.values.items():
+                    old_value, new_value = get_comparable_values(instance, name, value)
+                    if old_value != new_value:
+                        operation.diff[name] = (old_value, new_value)
+                        setattr(instance, name, value)
+                        operation.changed_fields.add(name)
+            else:
+                instance = self.model(
+                    **{
+                        operation.match_field: operation.match_value,
+                        **self.filters,
+                        **operation.values,
+                    }
+                )
+                operation.created = True
+            operation.instance = instance
+
+            if needs_save(instance, operation.created, operation.changed_fields):
+                to_save.append(operation)
+            elif operation.created:
+                to_create.append(operation)
+            elif operation.changed_fields:
+                to_update.append(operation)
+
+        if not self.dry_run:
+            with defer_references():
+                self._create(to_create)
+                self._update(to_update)
+                self._save(to_save)
+            self._set_references(to_create + to_update + to_save)
+
+        for operation in operations:
+            if operation.error is None:
+                if operation.created:
+                    self.index.add(operation.instance, operation.match_field, **self.filters)
+                    self.created_count += 1
+                elif operation.changed_fields:
+                    self.updated_count += 1
+
+        return operations
+
+    def clear(self):
+        """Discard all buffered rows, e. g. after the transaction they were read in failed."""
+        self._buffer, self._keys = [], set()
+
+    def get_existing(
+        self, operations: Iterable[WriteOperation]
+    ) -> Dict[Tuple[str, Any], List[Model]]:
+        """Get all existing objects for a list of operations.
+
+        Objects which are not in the index yet are fetched with one query per match field.
+        """
+        values_per_field = {}
+        for operation in operations:
+            values_per_field.setdefault(operation.match_field, set()).add(operation.match_value)
+
+        existing = {}
+        for match_field, values in values_per_field.items():
+            objects = self.index.get_many(self.model, match_field, values, **self.filters)
+            for value, objs in objects.items():
+                existing[(match_field, value)] = objs
+
+        return existing
+
+    def _create(self, operations: List[WriteOperation]):
+        if not operations:
+            return
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create([operation.instance for operation in operations])
+        except (DatabaseError, ValueError, ValidationError) as e:
+            if isinstance(e, DatabaseError) and is_transient_error(e):
+                raise
+            for operation in operations:
+                operation.instance.pk = None
+                operation.instance._state.adding = True
+            self._save(operations)
+
+    def _set_references(self, operations: List[WriteOperation]):
+        # Store import references of new objects and changed references in the reference table
+        references_per_source = {}
+        for operation in operations:
+            if operation.error is not None:
+                continue
+            for name, source in REFERENCE_FIELDS.items():
+                if operation.created or name in operation.changed_fields:
+                    references_per_source.setdefault(source, []).append(
+                        (operation.instance, getattr(operation.instance, name, None))
+                    )
+
+        for source, references in references_per_source.items():
+            set_references(references, source)
+
+    def _update(self, operations: List[WriteOperation]):
+        # Group objects by their changed fields to update only these fields
+        operations_per_fields = {}
+        for operation in operations:
+            fields = frozenset(
+                get_update_field_name(self.model, name) for name in operation.changed_fields
+            )
+            operations_per_fields.setdefault(fields, []).append(operation)
+
+        for fields, operations_for_fields in operations_per_fields.items():
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_update(
+                        [operation.instance for operation in operations_for_fields], fields
+                    )
+            except (DatabaseError, ValueError, ValidationError) as e:
+                if isinstance(e, DatabaseError) and is_transient_error(e):
+                    raise
+                self._save(operations_for_fields)
+
+    def _save(self, operations: List[WriteOperation]):
+        for operation in operations:
+            try:
+                with transaction.atomic():
+                    operation.instance.save()
+            except (DatabaseError, ValueError, ValidationError) as e:
+                if isinstance(e, DatabaseError) and is_transient_error(e):
+                    raise
+                operation.error = e
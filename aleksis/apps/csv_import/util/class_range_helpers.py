@@ -2,13 +2,25 @@
 
 import re
 from collections import OrderedDict
-from typing import Dict, List, Sequence, Tuple
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import uuid4
 
-from aleksis.core.models import Group
+from django.core.cache import cache
+from django.utils.translation import gettext as _
 
-REGEX_CLASS_RANGE = r"^([0-9]+|E|Q1|Q2)([a-z]?)-((?:[0-9]+|E|Q1|Q2)?)([a-z]?)"
-REGEX_CLASS = r"^([0-9]+|E|Q1|Q2)([a-z])$"
-REGEX_CLASS_DB = r"^([0-9]+|E|Q1|Q2)([a-z])$"
+from aleksis.core.models import Group, SchoolTerm
+
+REGEX_CLASS_RANGE = re.compile(r"^([0-9]+|E|Q1|Q2)([a-z]?)-((?:[0-9]+|E|Q1|Q2)?)([a-z]?)")
+REGEX_CLASS = re.compile(r"^([0-9]+|E|Q1|Q2)([a-z])$")
+
+#: Grades of the upper school level, in the order they follow the numeric grades
+UPPER_GRADES = ["E", "Q1", "Q2"]
+
+#: Fields of groups which decide if and how they are part of class ranges
+CLASS_RANGE_FIELDS = ["short_name", "school_term", "group_type"]
+
+# Resolvers with the cache version they were built for, by school term
+_resolvers: Dict[Optional[int], Tuple[str, "ClassRangeResolver"]] = {}
 
 
 def get_classes_per_grade(classes: Sequence[str]):
@@ -23,7 +35,7 @@ def get_classes_per_grade(classes: Sequence[str]):
     """
     classes_per_grade = OrderedDict()
     for class_ in classes:
-        match = re.match(REGEX_CLASS, class_)
+        match = REGEX_CLASS.match(class_)
 
         grade, group = match.group(1), match.group(2)
 
@@ -36,11 +48,31 @@ def get_classes_per_grade(classes: Sequence[str]):
     return classes_per_grade
 
 
-def get_classes_per_short_name(school_term):
-    """Get all groups which match the class range schema and group them by their short names."""
-    qs = Group.objects.filter(short_name__regex=REGEX_CLASS_DB, school_term=school_term)
+def get_class_sort_key(short_name: str) -> Tuple[int, int, str]:
+    """Get a key to sort classes by grade and class label.
+
+    Numeric grades are sorted by their number, followed by the upper grades.
+
+    >>> sorted(["10a", "Ea", "5b", "5a"], key=get_class_sort_key)
+    ['5a', '5b', '10a', 'Ea']
+    """
+    match = REGEX_CLASS.match(short_name)
+    grade, label = match.group(1), match.group(2)
+    if grade in UPPER_GRADES:
+        return (1, UPPER_GRADES.index(grade), label)
+    return (0, int(grade), label)
+
+
+def get_classes_per_short_name(school_term: Optional[SchoolTerm]) -> Dict[str, Group]:
+    """Get all groups which match the class range schema, sorted and keyed by their short names."""
+    classes = [
+        group
+        for group in Group.objects.filter(school_term=school_term, short_name__isnull=False)
+        if REGEX_CLASS.match(group.short_name)
+    ]
+    classes.sort(key=lambda group: get_class_sort_key(group.short_name))
 
-    return {obj.short_name: obj for obj in qs}
+    return OrderedDict((group.short_name, group) for group in classes)
 
 
 def get_min_class(classes_per_grade: Dict[str, Sequence[str]], grade: str):
@@ -62,7 +94,7 @@ def get_grade_and_class_from_class_range(
     :param class_range: Range to parse
     :return: Start grade, start class label, stop grade, stop class label
     """
-    match = re.match(REGEX_CLASS_RANGE, class_range)
+    match = REGEX_CLASS_RANGE.match(class_range)
 
     grade_start = match.group(1)
     class_start = match.group(2)
@@ -77,35 +109,123 @@ def get_grade_and_class_from_class_range(
     return (grade_start, class_start, grade_stop, class_stop)
 
 
-def parse_class_range(
-    classes_per_short_name: Dict[str, Group],
-    classes_per_grade: Dict[str, Sequence[str]],
-    class_range: str,
-) -> List[Group]:
-    """Parse a class range into AlekSIS groups.
+def _get_cache_key(school_term_id: Optional[int]) -> str:
+    return f"csv_import_class_ranges_{school_term_id}"
 
-    :param classes_per_short_name: All available classes in an `OrderedDict` (key is short name)
-    :param classes_per_grade: All available class labels grouped by grades
-    :param class_range: Range to parse
-    :return: List of AlekSIS groups
+
+def invalidate_class_ranges(school_term_id: Optional[int]):
+    """Mark the cached class range resolver of a school term as outdated in all processes."""
+    cache.set(_get_cache_key(school_term_id), uuid4().hex, None)
+
+
+def group_saving(sender, instance: Group, update_fields=None, **kwargs):
+    """Find the school terms whose class ranges change by saving a group.
+
+    The group is compared to its stored row, so groups which are saved
+    without changes to their class range fields keep the cached class ranges.
     """
-    if re.match(REGEX_CLASS, class_range):
-        # Single class
-        return [classes_per_short_name[class_range]]
-    else:
-        # Class range
-        (grade_start, group_start, grade_stop, group_stop,) = get_grade_and_class_from_class_range(
-            classes_per_grade, class_range
+    instance._class_range_school_terms = set()
+    fields = [name for name in CLASS_RANGE_FIELDS if update_fields is None or name in update_fields]
+    if not fields:
+        return
+
+    attnames = [Group._meta.get_field(name).attname for name in fields]
+    old_values = None
+    if instance.pk:
+        old_values = (
+            Group._base_manager.filter(pk=instance.pk)
+            .values_list("school_term_id", *attnames)
+            .first()
         )
 
-        class_a = f"{grade_start}{group_start}"
-        class_b = f"{grade_stop}{group_stop}"
+    if old_values is None:
+        instance._class_range_school_terms = {instance.school_term_id}
+    elif list(old_values[1:]) != [getattr(instance, attname) for attname in attnames]:
+        instance._class_range_school_terms = {instance.school_term_id, old_values[0]}
 
-        classes = list(classes_per_short_name.keys())
-        i_a = classes.index(class_a)
-        i_b = classes.index(class_b)
 
-        # Get all classes in this range
-        classes_tuple = list(classes_per_short_name.items())[i_a : i_b + 1]
+def group_saved(sender, instance: Group, **kwargs):
+    """Invalidate the class ranges of the school terms changed by saving a group."""
+    for school_term_id in getattr(instance, "_class_range_school_terms", ()):
+        invalidate_class_ranges(school_term_id)
+
+
+def group_deleted(sender, instance: Group, **kwargs):
+    """Invalidate the class ranges of the school term of a deleted group."""
+    invalidate_class_ranges(instance.school_term_id)
 
-        return [class_t[1] for class_t in classes_tuple]
+
+class ClassRangeResolver:
+    """Resolve class ranges like ``7a-d`` or ``5-Q2`` into the groups of a school term.
+
+    The classes are sorted by grade and class label once, so a range is resolved
+    by slicing the sorted classes between the positions of its first and last class.
+    Resolved ranges are remembered, as the same ranges occur in many rows.
+    """
+
+    def __init__(self, classes: Iterable[Group]):
+        #: All classes, sorted by grade and class label
+        self.classes = sorted(classes, key=lambda group: get_class_sort_key(group.short_name))
+        #: Positions of the classes in the sorted list by their short names
+        self.positions = {group.short_name: i for i, group in enumerate(self.classes)}
+        self.classes_per_grade = get_classes_per_grade(self.positions.keys())
+        self._ranges: Dict[str, List[Group]] = {}
+
+    @classmethod
+    def for_school_term(cls, school_term: Optional[SchoolTerm]) -> "ClassRangeResolver":
+        """Get the resolver for the classes of a school term.
+
+        Resolvers are cached per school term until a group
+        of the school term is changed in any process.
+        """
+        school_term_id = school_term.pk if school_term else None
+        key = _get_cache_key(school_term_id)
+        version = cache.get(key)
+        if version is None:
+            version = uuid4().hex
+            cache.set(key, version, None)
+
+        cached = _resolvers.get(school_term_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        resolver = cls(get_classes_per_short_name(school_term).values())
+        _resolvers[school_term_id] = (version, resolver)
+        return resolver
+
+    def resolve(self, class_range: str) -> List[Group]:
+        """Parse a class range into AlekSIS groups.
+
+        :param class_range: Range to parse
+        :return: List of AlekSIS groups
+        :raises ValueError: If the range is invalid or contains unknown classes
+        """
+        if class_range not in self._ranges:
+            self._ranges[class_range] = self._resolve(class_range)
+        return self._ranges[class_range]
+
+    def _resolve(self, class_range: str) -> List[Group]:
+        if REGEX_CLASS.match(class_range):
+            # Single class
+            class_a = class_b = class_range
+        elif REGEX_CLASS_RANGE.match(class_range):
+            try:
+                (
+                    grade_start,
+                    group_start,
+                    grade_stop,
+                    group_stop,
+                ) = get_grade_and_class_from_class_range(self.classes_per_grade, class_range)
+            except KeyError as e:
+                raise ValueError(_(f"Unknown grade {e} in class range {class_range}."))
+            class_a = f"{grade_start}{group_start}"
+            class_b = f"{grade_stop}{group_stop}"
+        else:
+            raise ValueError(_(f"Invalid class range {class_range}."))
+
+        for class_ in (class_a, class_b):
+            if class_ not in self.positions:
+                raise ValueError(_(f"Unknown class {class_} in class range {class_range}."))
+
+        # Get all classes in this range
+        return self.classes[self.positions[class_a] : self.positions[class_b] + 1]
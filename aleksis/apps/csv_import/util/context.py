@@ -0,0 +1,48 @@
+"""State and settings of one import job."""
+
+from functools import partial
+from typing import Callable, Dict, Optional
+
+from django.apps import apps
+
+from aleksis.apps.csv_import.util.lookup_index import LookupIndex
+from aleksis.apps.csv_import.util.m2m_writer import M2MWriter
+from aleksis.core.models import SchoolTerm
+from aleksis.core.util.core_helpers import get_site_preferences
+
+
+class ImportContext:
+    """Settings and state of one import job.
+
+    Site preferences and installed apps are read once when the job starts,
+    so they are not looked up again for every row or value.
+    """
+
+    def __init__(
+        self, school_term: Optional[SchoolTerm] = None, lookup_index: Optional[LookupIndex] = None
+    ):
+        self.school_term = school_term
+        self.lookup_index = lookup_index or LookupIndex()
+        self.m2m_writer = M2MWriter()
+        # Set by field types if related objects of the current row could not be found
+        self.unresolved = False
+
+        preferences = get_site_preferences()
+        self.phone_number_country = preferences["csv_import__phone_number_country"]
+        languages_raw = preferences["csv_import__date_languages"]
+        self.date_languages = tuple(languages_raw.split(",")) if languages_raw else ()
+        self.group_type_departments = preferences["csv_import__group_type_departments"]
+        self.group_prefix_departments = preferences["csv_import__group_prefix_departments"]
+        self.chunk_size = preferences["csv_import__chunk_size"]
+
+        self.with_chronos = apps.is_installed("aleksis.apps.chronos")
+
+    def bind(self, converter: Callable, settings: Dict[str, str]) -> Callable:
+        """Pass settings of this context to a converter.
+
+        :param converter: Converter function
+        :param settings: Mapping of argument names of the converter to attributes of the context
+        """
+        if not settings:
+            return converter
+        return partial(converter, **{arg: getattr(self, attr) for arg, attr in settings.items()})
@@ -1,21 +1,49 @@
 from datetime import date
-from typing import Sequence, Union
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple, Union
 
-import dateparser
-import phonenumbers
-
-from aleksis.apps.csv_import.settings import SEXES
+from aleksis.apps.csv_import.settings import BOOLEAN_VALUES, CONVERTER_CACHE_SIZE, SEXES
 from aleksis.core.util.core_helpers import get_site_preferences
 
+# pandas, dateparser and phonenumbers are slow to import and only needed
+# when importing, so they are imported in the functions using them
+if TYPE_CHECKING:
+    import pandas
+    import phonenumbers
+
+
+@lru_cache(maxsize=CONVERTER_CACHE_SIZE)
+def _parse_phone_number(value: str, country: str) -> Union["phonenumbers.PhoneNumber", None]:
+    import phonenumbers  # noqa
 
-def parse_phone_number(value: str) -> Union[phonenumbers.PhoneNumber, None]:
-    """Parse a phone number."""
     try:
-        return phonenumbers.parse(value, get_site_preferences()["csv_import__phone_number_country"])
+        return phonenumbers.parse(value, country)
     except phonenumbers.NumberParseException:
         return None
 
 
+def parse_phone_number(
+    value: str, country: Optional[str] = None
+) -> Union["phonenumbers.PhoneNumber", None]:
+    """Parse a phone number.
+
+    :param country: Country for numbers without country code, defaults to the site preference
+    """
+    if country is None:
+        country = get_site_preferences()["csv_import__phone_number_country"]
+
+    number = _parse_phone_number(value, country)
+    if number is None:
+        return None
+
+    import phonenumbers  # noqa
+
+    # Cached numbers are shared, so return a copy
+    copy = phonenumbers.PhoneNumber()
+    copy.merge_from(number)
+    return copy
+
+
 def parse_sex(value: str) -> str:
     """Parse sex via SEXES dictionary."""
     value = value.lower()
@@ -25,16 +53,117 @@ def parse_sex(value: str) -> str:
     return ""
 
 
-def parse_date(value: str) -> Union[date, None]:
-    """Parse string date."""
+def parse_sexes(values: "pandas.Series") -> "pandas.Series":
+    """Parse a column of sexes via SEXES dictionary."""
+    return values.str.lower().map(SEXES).fillna("")
+
+
+def parse_booleans(values: "pandas.Series") -> "pandas.Series":
+    """Parse a column of boolean values via TRUE_VALUES and FALSE_VALUES.
+
+    Like pandas' own parser, this fails on values which are neither true nor false.
+    """
+    parsed = values.map(BOOLEAN_VALUES)
+    invalid = values[parsed.isna()]
+    if not invalid.empty:
+        raise ValueError(f"Invalid boolean value: {invalid.iloc[0]}")
+    return parsed.astype(bool)
+
+
+def get_date_languages() -> List[str]:
+    """Get languages for date parsing."""
     languages_raw = get_site_preferences()["csv_import__date_languages"]
-    languages = languages_raw.split(",") if languages_raw else []
+    return languages_raw.split(",") if languages_raw else []
+
+
+@lru_cache(maxsize=None)
+def get_date_formats(languages: Tuple[str, ...]) -> Tuple[str, ...]:
+    """Get fixed date formats which are parsed in the same way dateparser would parse them.
+
+    Numeric dates are parsed by dateparser in the date order of the language
+    (or English if no language is set). If several languages are set, the
+    order is not predictable, so only ISO dates are parsed without dateparser.
+    """
+    import dateparser  # noqa
+    from dateparser.languages import default_loader  # noqa
+
     try:
-        return dateparser.parse(value, languages=languages).date()
+        dateparser.parse("2000-01-01", languages=list(languages))
+    except ValueError:
+        # dateparser does not accept these languages, so no date can be parsed at all
+        return ()
+
+    formats = ["%Y-%m-%d"]
+    if len(languages) > 1:
+        return tuple(formats)
+
+    date_order = "MDY"
+    if languages:
+        date_order = default_loader.get_locale(languages[0]).info.get("date_order", date_order)
+
+    if date_order in ("DMY", "MDY"):
+        directives = {"D": "%d", "M": "%m", "Y": "%Y"}
+        for separator in (".", "/", "-"):
+            formats.append(separator.join(directives[part] for part in date_order))
+    return tuple(formats)
+
+
+@lru_cache(maxsize=CONVERTER_CACHE_SIZE)
+def _parse_date(value: str, languages: Tuple[str, ...]) -> Union[date, None]:
+    import dateparser  # noqa
+
+    try:
+        return dateparser.parse(value, languages=list(languages)).date()
     except (ValueError, AttributeError):
         return None
 
 
+def parse_date(value: str, languages: Optional[Sequence[str]] = None) -> Union[date, None]:
+    """Parse string date.
+
+    :param languages: Languages for date parsing, default to the site preference
+    """
+    if languages is None:
+        languages = get_date_languages()
+    return _parse_date(value, tuple(languages))
+
+
+def parse_dates(
+    values: "pandas.Series", languages: Optional[Sequence[str]] = None
+) -> "pandas.Series":
+    """Parse a column of string dates.
+
+    Dates in fixed formats are parsed by pandas. Only the remaining
+    values are parsed by dateparser, each distinct value only once.
+
+    :param languages: Languages for date parsing, default to the site preference
+    """
+    import pandas  # noqa
+
+    if languages is None:
+        languages = get_date_languages()
+    languages = tuple(languages)
+
+    parsed = pandas.Series([None] * len(values), index=values.index, dtype=object)
+    remaining = values.notna() & (values != "")
+
+    for date_format in get_date_formats(languages):
+        if not remaining.any():
+            break
+        dates = pandas.to_datetime(values[remaining], format=date_format, errors="coerce")
+        dates = dates[dates.notna()]
+        parsed[dates.index] = dates.dt.date
+        remaining[dates.index] = False
+
+    if remaining.any():
+        leftovers = values[remaining]
+        parsed[leftovers.index] = leftovers.map(
+            {v: parse_date(v, languages) for v in leftovers.unique()}
+        )
+
+    return parsed
+
+
 def parse_comma_separated_data(value: str) -> Sequence[str]:
     """Parse a string with comma-separated data."""
     return list(filter(lambda v: v, value.split(",")))
@@ -0,0 +1,90 @@
+"""Summaries of the changes made (or planned) by an import job."""
+
+from typing import Any, Iterable
+
+from aleksis.apps.csv_import.settings import DIFF_MAX_CHANGES
+from aleksis.apps.csv_import.util.bulk_writer import WriteOperation
+
+
+def serialize_value(value: Any) -> Any:
+    """Convert a value to something which can be stored as JSON."""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+class ImportDiff:
+    """Count created, updated, unchanged and deactivated objects of an import job.
+
+    For changed objects, the old and new values of all changed fields are
+    recorded, up to a maximum number of objects.
+    """
+
+    def __init__(self, max_changes: int = DIFF_MAX_CHANGES):
+        self.max_changes = max_changes
+
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deactivated = 0
+        self.failed = 0
+        self.changes = []
+        self.truncated = False
+
+    def add(self, operations: Iterable[WriteOperation]):
+        """Add the results of written (or planned) operations."""
+        for operation in operations:
+            if operation.error is not None:
+                self.failed += 1
+            elif operation.created:
+                self.created += 1
+                fields = {
+                    name: [None, serialize_value(value)] for name, value in operation.values.items()
+                }
+                self._add_change(operation, "create", fields)
+            elif operation.changed_fields:
+                self.updated += 1
+                fields = {
+                    name: [serialize_value(old), serialize_value(new)]
+                    for name, (old, new) in operation.diff.items()
+                }
+                self._add_change(operation, "update", fields)
+            else:
+                self.unchanged += 1
+
+    def merge(self, other: dict):
+        """Merge a diff of another part of the same import, as returned by ``as_dict``."""
+        self.created += other["created"]
+        self.updated += other["updated"]
+        self.unchanged += other["unchanged"]
+        self.deactivated += other["deactivated"]
+        self.failed += other["failed"]
+
+        free = self.max_changes - len(self.changes)
+        self.changes += other["changes"][:free]
+        self.truncated = self.truncated or other["truncated"] or len(other["changes"]) > free
+
+    def _add_change(self, operation: WriteOperation, action: str, fields: dict):
+        if len(self.changes) >= self.max_changes:
+            self.truncated = True
+            return
+
+        self.changes.append(
+            {
+                "action": action,
+                "reference": serialize_value(operation.match_value),
+                "fields": fields,
+            }
+        )
+
+    def as_dict(self) -> dict:
+        """Get the diff in a form which can be stored as JSON."""
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "deactivated": self.deactivated,
+            "failed": self.failed,
+            "changes": self.changes,
+            "truncated": self.truncated,
+        }
@@ -0,0 +1,162 @@
+"""Aggregated reports of rows which failed to be imported."""
+
+import csv
+import io
+import tempfile
+from typing import IO, Any, Dict, List, Optional, Sequence, Tuple
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils.translation import gettext as _
+
+from aleksis.apps.csv_import.models import ImportJob
+from aleksis.apps.csv_import.settings import ERROR_MESSAGE_LENGTH, ERROR_SAMPLES
+
+#: Columns of the files with all errors of an import job
+ERROR_COLUMNS = ["reference", "error", "field_type", "message"]
+
+#: A failed row with its reference, error class, field type and message
+RowError = Tuple[str, str, str, str]
+
+
+def get_row_error(
+    error: Exception, reference: Any = None, field_type: Optional[str] = None
+) -> RowError:
+    """Describe why a row failed in a compact form."""
+    return (
+        "" if reference is None else str(reference),
+        error.__class__.__name__,
+        field_type or "",
+        str(error),
+    )
+
+
+def _shorten(message: str) -> str:
+    message = " ".join(message.split())
+    if len(message) > ERROR_MESSAGE_LENGTH:
+        return f"{message[:ERROR_MESSAGE_LENGTH]} …"
+    return message
+
+
+class ErrorReport:
+    """Group failed rows by error class and field type.
+
+    Only the number of failed rows and a few samples are kept per group. All
+    failed rows are streamed to a temporary CSV file, which can be attached to
+    the import job as a whole.
+    """
+
+    def __init__(self, max_samples: int = ERROR_SAMPLES):
+        self.max_samples = max_samples
+        self.count = 0
+        self.groups: Dict[str, dict] = {}
+        self._file: Optional[IO[bytes]] = None
+        self._text: Optional[io.TextIOWrapper] = None
+        self._writer = None
+
+    def add(self, row_error: RowError):
+        """Add a failed row."""
+        reference, error, field_type, message = row_error
+        self.count += 1
+
+        group = self._get_group(error, field_type)
+        group["count"] += 1
+        if len(group["samples"]) < self.max_samples:
+            group["samples"].append([reference, _shorten(message)])
+
+        self._write(row_error)
+
+    def merge(self, other: dict, file_name: Optional[str] = None):
+        """Merge a report of another part of the same import, as returned by ``as_dict``.
+
+        :param file_name: Name of a file in the default storage with all failed rows of
+            the other part, as returned by ``save_part``. It is deleted after merging.
+        """
+        self.count += other["count"]
+        for other_group in other["groups"].values():
+            group = self._get_group(other_group["error"], other_group["field_type"])
+            group["count"] += other_group["count"]
+            free = self.max_samples - len(group["samples"])
+            group["samples"] += other_group["samples"][:free]
+
+        if file_name:
+            with default_storage.open(file_name, "rb") as f:
+                reader = csv.reader(io.TextIOWrapper(f, encoding="utf-8", newline=""))
+                next(reader)
+                for row_error in reader:
+                    self._write(row_error)
+            default_storage.delete(file_name)
+
+    def _get_group(self, error: str, field_type: str) -> dict:
+        return self.groups.setdefault(
+            f"{error}:{field_type}",
+            {"error": error, "field_type": field_type, "count": 0, "samples": []},
+        )
+
+    def _write(self, row_error: Sequence[str]):
+        if self._writer is None:
+            self._file = tempfile.TemporaryFile()
+            self._text = io.TextIOWrapper(self._file, encoding="utf-8", newline="")
+            self._writer = csv.writer(self._text)
+            self._writer.writerow(ERROR_COLUMNS)
+        self._writer.writerow(row_error)
+
+    def _get_file(self) -> File:
+        self._text.flush()
+        self._file.seek(0)
+        return File(self._file)
+
+    def get_messages(self, verbose_name_plural: str) -> List[str]:
+        """Get one message per group of errors, with samples."""
+        result = []
+        for group in sorted(self.groups.values(), key=lambda group: -group["count"]):
+            if group["field_type"]:
+                message = _(
+                    f"{group['count']} {verbose_name_plural} failed to be imported due to "
+                    f"{group['error']} in field type {group['field_type']}."
+                )
+            else:
+                message = _(
+                    f"{group['count']} {verbose_name_plural} failed to be imported "
+                    f"due to {group['error']}."
+                )
+            samples = "\n".join(
+                f"{reference}: {text}" if reference else text
+                for reference, text in group["samples"]
+            )
+            result.append(f"{message}\n{samples}")
+
+        if self.count:
+            result.append(_("All failed rows are listed in the error report of the import job."))
+        return result
+
+    def save(self, import_job: ImportJob):
+        """Attach all failed rows to an import job."""
+        if self._file is None:
+            return
+        import_job.errors_file.save(f"import_job_{import_job.pk}.csv", self._get_file(), save=False)
+        import_job.save(update_fields=["errors_file"])
+        self.close()
+
+    def save_part(self, import_job: ImportJob, index: int) -> Optional[str]:
+        """Store all failed rows of one partition of an import to be merged later.
+
+        :return: Name of the file in the default storage
+        """
+        if self._file is None:
+            return None
+        name = default_storage.save(
+            f"csv_import/errors/import_job_{import_job.pk}_{index}.csv", self._get_file()
+        )
+        self.close()
+        return name
+
+    def close(self):
+        """Remove the temporary file with all failed rows."""
+        if self._file is not None:
+            self._text.close()
+        self._file = self._text = self._writer = None
+
+    def as_dict(self) -> dict:
+        """Get the groups of errors in a form which can be sent to other tasks."""
+        return {"count": self.count, "groups": self.groups}
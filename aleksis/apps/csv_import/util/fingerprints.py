@@ -0,0 +1,49 @@
+"""Fingerprints of imported rows, used to skip rows which did not change."""
+
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Sequence
+
+from django.db import transaction
+
+from aleksis.apps.csv_import.models import ImportFingerprint, ImportTemplate
+from aleksis.apps.csv_import.util.diff import serialize_value
+
+
+def get_row_fingerprint(
+    row: dict, cols: Sequence[str], revision: str, scope: Sequence[Any] = ()
+) -> str:
+    """Get a fingerprint of the converted values of a row.
+
+    The revision of the template is included, so all fingerprints
+    change if the template is changed.
+
+    :param scope: Settings of the import job which change how rows are imported,
+        e. g. the school term related objects are looked up in
+    """
+    data = [revision, list(scope), [serialize_value(row[col]) for col in cols]]
+    return hashlib.sha1(json.dumps(data).encode()).hexdigest()
+
+
+def get_fingerprints(template: ImportTemplate, object_ids: Iterable[int]) -> Dict[int, str]:
+    """Get the stored fingerprints of objects imported with a template."""
+    return dict(
+        ImportFingerprint.objects.filter(template=template, object_id__in=object_ids).values_list(
+            "object_id", "fingerprint"
+        )
+    )
+
+
+def set_fingerprints(template: ImportTemplate, fingerprints: Dict[int, str]):
+    """Store the fingerprints of objects imported with a template with two queries."""
+    if not fingerprints:
+        return
+
+    with transaction.atomic():
+        ImportFingerprint.objects.filter(template=template, object_id__in=fingerprints).delete()
+        ImportFingerprint.objects.bulk_create(
+            [
+                ImportFingerprint(template=template, object_id=object_id, fingerprint=fingerprint)
+                for object_id, fingerprint in fingerprints.items()
+            ]
+        )
@@ -1,8 +1,15 @@
-from typing import Optional, Sequence, Union
+import hashlib
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Sequence, Union
 
-from django.db.models import Model
+from django.apps import apps
+from django.core.files import File
+from django.db import DatabaseError
+from django.db.models import Exists, Model, OuterRef
 
-from aleksis.apps.csv_import.settings import STATE_ACTIVE
+from aleksis.apps.csv_import.settings import STATE_ACTIVE, TRANSIENT_ERROR_CODES
+
+if TYPE_CHECKING:
+    from aleksis.apps.csv_import.models import ImportJob, ImportTemplate
 
 
 def is_active(row: dict) -> bool:
@@ -23,6 +30,116 @@ def has_is_active_field(model: Model) -> bool:
     return False
 
 
+def deactivate(model: Model, pks: Iterable[int], dry_run: bool = False) -> int:
+    """Deactivate all active objects with the given primary keys with one query.
+
+    :param dry_run: Only count the objects which would be deactivated
+    :return: Number of deactivated objects
+    """
+    qs = model.objects.filter(pk__in=pks, is_active=True)
+    if dry_run:
+        return qs.count()
+    return qs.update(is_active=False)
+
+
+def set_seen_objects(import_job: "ImportJob", pks: Iterable[int]):
+    """Store the primary keys of objects found in the file of an import job with one query."""
+    ImportSeenObject = apps.get_model("csv_import", "ImportSeenObject")
+
+    ImportSeenObject.objects.bulk_create(
+        [ImportSeenObject(import_job=import_job, object_id=pk) for pk in pks]
+    )
+
+
+def deactivate_missing(
+    model: Model,
+    template: "ImportTemplate",
+    import_job: "ImportJob",
+    dry_run: bool = False,
+    **filters,
+) -> int:
+    """Deactivate all active objects imported with a template which an import job did not find.
+
+    Only objects with a fingerprint of the template are affected, so objects
+    imported with other templates are kept. Objects found in the file are excluded
+    by joining the objects stored for the import job, so this is done with one query.
+
+    :param model: Model of the imported objects
+    :param template: Template the objects were imported with
+    :param import_job: Import job whose found objects were stored with ``set_seen_objects``
+    :param dry_run: Only count the objects which would be deactivated
+    :param filters: Additional filters, e. g. the school term or the base group
+    :return: Number of deactivated objects
+    """
+    ImportFingerprint = apps.get_model("csv_import", "ImportFingerprint")
+    ImportSeenObject = apps.get_model("csv_import", "ImportSeenObject")
+
+    imported = ImportFingerprint.objects.filter(template=template).values("object_id")
+    seen = ImportSeenObject.objects.filter(import_job=import_job, object_id=OuterRef("pk"))
+    qs = model.objects.filter(~Exists(seen), is_active=True, pk__in=imported, **filters)
+    if dry_run:
+        return qs.count()
+    return qs.update(is_active=False)
+
+
+def is_transient_error(error: DatabaseError) -> bool:
+    """Check whether a database error is a deadlock or serialization failure.
+
+    Transactions which failed due to such errors can be retried.
+    """
+    return getattr(error.__cause__, "pgcode", None) in TRANSIENT_ERROR_CODES
+
+
+def get_content_hash(file: File) -> str:
+    """Get the SHA-256 hash of the content of a file, reading it chunk by chunk."""
+    content_hash = hashlib.sha256()
+    for chunk in file.chunks():
+        content_hash.update(chunk)
+    file.seek(0)
+    return content_hash.hexdigest()
+
+
+class HashingReader:
+    """Wrap a file to compute the SHA-256 hash of its content while it is read.
+
+    The hash is only computed on the fly if the file is read from the start to
+    the end in order, as storages do when saving a file. Otherwise, the file is
+    read again to compute it.
+    """
+
+    def __init__(self, file: File):
+        self.file = file
+        self._hash = hashlib.sha256()
+        # Number of bytes hashed, or None if the file was not read in order
+        self._hashed: Optional[int] = 0
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.file, name)
+
+    def read(self, size: int = -1) -> bytes:
+        position = self.file.tell()
+        data = self.file.read(size)
+        if self._hashed is not None and position == self._hashed:
+            self._hash.update(data)
+            self._hashed += len(data)
+        else:
+            self._hashed = None
+        return data
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        result = self.file.seek(offset, whence)
+        if self.file.tell() == 0:
+            self._hash = hashlib.sha256()
+            self._hashed = 0
+        return result
+
+    def hexdigest(self) -> str:
+        """Get the hash of the content of the file."""
+        if self._hashed is None or self._hashed != self.file.size:
+            return get_content_hash(self.file)
+        return self._hash.hexdigest()
+
+
 def with_prefix(prefix: Optional[str], value: str) -> str:
     """Add prefix to string.
 
@@ -38,20 +155,23 @@ def with_prefix(prefix: Optional[str], value: str) -> str:
 
 def bulk_get_or_create(
     model: Model,
-    objs: Sequence,
+    objs: Iterable,
     attr: str,
     default_attrs: Optional[Union[Sequence[str], str]] = None,
     defaults: Optional[dict] = None,
-) -> Sequence[Model]:
+) -> Dict[Any, Model]:
     """
     Do get_or_create on a list of values.
 
+    Existing objects are fetched with one query and missing
+    objects are created with one ``bulk_create``.
+
     :param model: Model on which get_or_create should be executed
     :param objs: List of values
     :param attr: Field of model which should be set
     :param default_attrs: One or more extra fields of model which also should be set to the value
     :param defaults: Extra fields of model which should be set to a specific value
-    :return: List of instances
+    :return: Instances by value
     """
     if not defaults:
         defaults = {}
@@ -63,20 +183,24 @@ def bulk_get_or_create(
         default_attrs = [default_attrs]
 
     attrs = default_attrs + [attr]
-
-    qs = model.objects.filter(**{f"{attr}__in": objs})
-    existing_values = qs.values_list(attr, flat=True)
-
-    instances = [x for x in qs]
-    for obj in objs:
-        if obj in existing_values:
-            continue
-
-        kwargs = defaults
-        for _attr in attrs:
-            kwargs[_attr] = obj
-        instance = model.objects.create(**kwargs)
-
-        instances.append(instance)
+    values = set(objs)
+
+    instances = {
+        getattr(instance, attr): instance
+        for instance in model.objects.filter(**{f"{attr}__in": values})
+    }
+
+    new_instances = [
+        model(**{**defaults, **{_attr: value for _attr in attrs}})
+        for value in values
+        if value not in instances
+    ]
+    if new_instances:
+        model.objects.bulk_create(new_instances)
+        # Not all databases return primary keys of bulk created objects
+        instances = {
+            getattr(instance, attr): instance
+            for instance in model.objects.filter(**{f"{attr}__in": values})
+        }
 
     return instances
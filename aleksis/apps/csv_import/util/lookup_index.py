@@ -0,0 +1,124 @@
+"""In-memory index of existing objects used while importing."""
+
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from django.db.models import Model
+
+from aleksis.apps.csv_import.util.references import REFERENCE_FIELDS, get_objects_by_reference
+
+
+class LookupIndex:
+    """Index of existing objects for one import job.
+
+    Objects are fetched with one query per model, field and filters and
+    are afterwards resolved from memory, so resolving a row costs no query.
+
+    An index can either be loaded completely (all objects matching the filters)
+    or only for a set of values; values which were not loaded yet are fetched
+    on demand.
+
+    Import reference fields are resolved using the indexed reference table.
+    """
+
+    def __init__(self):
+        self._objects = {}
+        self._loaded_values = {}
+        self._complete = set()
+
+    @staticmethod
+    def _get_key(model: Model, field: str, filters: dict) -> Tuple[Hashable, ...]:
+        return (model, field, tuple(sorted(filters.items())))
+
+    def load(self, model: Model, field: str, values: Optional[Iterable] = None, **filters):
+        """Fetch objects with one query and add them to the index.
+
+        :param model: Model of the objects
+        :param field: Field the objects are looked up by
+        :param values: Values to fetch; if not set, all objects matching the filters are fetched
+        :param filters: Additional filters, e. g. the school term
+        """
+        key = self._get_key(model, field, filters)
+        if key in self._complete:
+            return
+
+        objects = self._objects.setdefault(key, {})
+        loaded_values = self._loaded_values.setdefault(key, set())
+
+        if values is None:
+            self._complete.add(key)
+        else:
+            values = set(values) - loaded_values
+            if not values:
+                return
+            loaded_values.update(values)
+
+        for value, obj in self._fetch(model, field, values, filters):
+            if value is not None and obj not in objects.get(value, []):
+                objects.setdefault(value, []).append(obj)
+
+    @staticmethod
+    def _fetch(
+        model: Model, field: str, values: Optional[Iterable], filters: dict
+    ) -> Iterable[Tuple[Any, Model]]:
+        if field in REFERENCE_FIELDS:
+            return get_objects_by_reference(model, REFERENCE_FIELDS[field], values, **filters)
+
+        qs = model.objects.filter(**filters)
+        if values is not None:
+            qs = qs.filter(**{f"{field}__in": values})
+        return ((getattr(obj, field), obj) for obj in qs)
+
+    def add(self, obj: Model, field: str, **filters):
+        """Add a new object to the index, e. g. after it was created."""
+        key = self._get_key(obj.__class__, field, filters)
+        value = getattr(obj, field)
+        self._loaded_values.setdefault(key, set()).add(value)
+        self._objects.setdefault(key, {}).setdefault(value, []).append(obj)
+
+    def clear(self, model: Model, field: str, **filters):
+        """Remove all objects for a model, field and filters from the index."""
+        key = self._get_key(model, field, filters)
+        self._objects.pop(key, None)
+        self._loaded_values.pop(key, None)
+        self._complete.discard(key)
+
+    def get_all(self, model: Model, field: str, value: Any, **filters) -> List[Model]:
+        """Get all objects with the given value."""
+        key = self._get_key(model, field, filters)
+        if key not in self._complete and value not in self._loaded_values.get(key, set()):
+            self.load(model, field, [value], **filters)
+        return self._objects.get(key, {}).get(value, [])
+
+    def get(self, model: Model, field: str, value: Any, **filters) -> Model:
+        """Get exactly one object with the given value.
+
+        Raises ``DoesNotExist`` and ``MultipleObjectsReturned`` like ``QuerySet.get()``.
+        """
+        objects = self.get_all(model, field, value, **filters)
+        if not objects:
+            raise model.DoesNotExist(
+                f"{model._meta.object_name} with {field} {value} does not exist."
+            )
+        if len(objects) > 1:
+            raise model.MultipleObjectsReturned(
+                f"{len(objects)} objects of {model._meta.object_name} found for {field} {value}."
+            )
+        return objects[0]
+
+    def filter(self, model: Model, field: str, values: Iterable, **filters) -> List[Model]:
+        """Get all objects with one of the given values."""
+        values = [value for value in values if value is not None]
+        self.load(model, field, values, **filters)
+
+        objects = []
+        for value in dict.fromkeys(values):
+            objects += self.get_all(model, field, value, **filters)
+        return objects
+
+    def get_many(
+        self, model: Model, field: str, values: Iterable, **filters
+    ) -> Dict[Any, List[Model]]:
+        """Get all objects with one of the given values, grouped by their value."""
+        values = set(values)
+        self.load(model, field, values, **filters)
+        return {value: self.get_all(model, field, value, **filters) for value in values}
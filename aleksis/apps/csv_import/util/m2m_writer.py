@@ -0,0 +1,125 @@
+"""Batched writing of many-to-many relations of imported objects."""
+
+from typing import Dict, Iterable, Set, Tuple
+
+from django.db.models import Model
+
+from aleksis.core.models import Group
+
+
+class M2MRelation:
+    """Through model and columns of a many-to-many relation, seen from one model."""
+
+    def __init__(self, model: Model, name: str):
+        model_field = model._meta.get_field(name)
+        if model_field.auto_created:
+            # Reverse side of a relation, e. g. ``Person.member_of``
+            field = model_field.field
+            source_name, target_name = field.m2m_reverse_field_name(), field.m2m_field_name()
+        else:
+            field = model_field
+            source_name, target_name = field.m2m_field_name(), field.m2m_reverse_field_name()
+
+        self.through = field.remote_field.through
+        self.source = self.through._meta.get_field(source_name).attname
+        self.target = self.through._meta.get_field(target_name).attname
+
+
+class M2MWriter:
+    """Collect many-to-many links of imported objects and write them in bulk.
+
+    Links are collected per relation as pairs of instances and targets. When
+    written, the existing through rows of all collected instances are fetched
+    with one query, missing rows are inserted with one ``bulk_create`` and,
+    for relations with sync semantics, rows which were not collected are
+    removed with one delete.
+
+    Bulk operations do not send ``m2m_changed`` signals, so all groups whose
+    links changed are saved once afterwards to synchronise them.
+    """
+
+    def __init__(self):
+        self._relations: Dict[Tuple[Model, str], M2MRelation] = {}
+        self._links: Dict[Tuple[Model, str], Dict[int, Set[int]]] = {}
+        self._sync: Set[Tuple[Model, str]] = set()
+        self._objects: Dict[Tuple[Model, int], Model] = {}
+
+    def add(self, instance: Model, name: str, targets: Iterable[Model], sync: bool = False):
+        """Add links from an instance to targets.
+
+        :param name: Name of the many-to-many relation, e. g. ``member_of``
+        :param sync: Remove all other links of the instance in this relation when written
+        """
+        key = (instance.__class__, name)
+        if key not in self._relations:
+            self._relations[key] = M2MRelation(instance.__class__, name)
+        if sync:
+            self._sync.add(key)
+
+        links = self._links.setdefault(key, {}).setdefault(instance.pk, set())
+        self._objects[(instance.__class__, instance.pk)] = instance
+        for target in targets:
+            links.add(target.pk)
+            self._objects[(target.__class__, target.pk)] = target
+
+    def clear(self):
+        """Discard all collected links."""
+        self._links = {}
+        self._sync = set()
+        self._objects = {}
+
+    def write(self) -> Tuple[int, int]:
+        """Write all collected links and clear them.
+
+        :return: Number of added and removed links
+        """
+        added, removed = 0, 0
+        changed = set()
+
+        for key, links in self._links.items():
+            relation = self._relations[key]
+            model, __ = key
+            target_model = relation.through._meta.get_field(relation.target).related_model
+
+            existing = {}
+            for pk, source_id, target_id in relation.through.objects.filter(
+                **{f"{relation.source}__in": links.keys()}
+            ).values_list("pk", relation.source, relation.target):
+                existing[(source_id, target_id)] = pk
+
+            new_rows = [
+                relation.through(**{relation.source: source_id, relation.target: target_id})
+                for source_id, target_ids in links.items()
+                for target_id in target_ids
+                if (source_id, target_id) not in existing
+            ]
+            relation.through.objects.bulk_create(new_rows)
+            added += len(new_rows)
+            changed_pairs = [
+                (getattr(row, relation.source), getattr(row, relation.target)) for row in new_rows
+            ]
+
+            if key in self._sync:
+                old_pairs = [
+                    (source_id, target_id)
+                    for source_id, target_id in existing
+                    if target_id not in links[source_id]
+                ]
+                if old_pairs:
+                    relation.through.objects.filter(
+                        pk__in=[existing[pair] for pair in old_pairs]
+                    ).delete()
+                removed += len(old_pairs)
+                changed_pairs += old_pairs
+
+            for source_id, target_id in changed_pairs:
+                changed.add((model, source_id))
+                changed.add((target_model, target_id))
+
+        for model, pk in changed:
+            if issubclass(model, Group):
+                group = self._objects.get((model, pk)) or Group.objects.get(pk=pk)
+                group.save(force=True)
+
+        self.clear()
+        return added, removed
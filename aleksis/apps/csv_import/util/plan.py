@@ -0,0 +1,124 @@
+"""Import plans compiled once per import template."""
+
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple, Type
+
+from django.db.models import Model
+from django.utils.translation import gettext as _
+
+from aleksis.apps.csv_import.field_types import (
+    DirectMappingFieldType,
+    FieldType,
+    IsActiveFieldType,
+    MatchFieldType,
+    MultipleValuesFieldType,
+    ProcessFieldType,
+    field_type_registry,
+)
+from aleksis.apps.csv_import.models import ImportTemplate
+from aleksis.apps.csv_import.settings import PLAN_CACHE_SIZE
+from aleksis.apps.csv_import.util.import_helpers import has_is_active_field
+
+
+class ImportPlan:
+    """Everything about importing rows with one template which does not depend on the rows.
+
+    The plan is compiled once from the fields of the template, so processing a
+    row only has to look up values instead of scanning the field type registry.
+    """
+
+    def __init__(self, model: Model, field_types: Sequence[Type[FieldType]], revision: str = ""):
+        self.model = model
+        #: Revision of the template the plan was compiled from
+        self.revision = revision
+
+        #: Column names with their field types, in the order of the CSV file
+        self.columns: List[Tuple[str, Type[FieldType]]] = []
+        for field_type in field_types:
+            self.columns.append((field_type.column_name, field_type))
+        self.cols = [column for column, __ in self.columns]
+        #: Columns which are read from the file, as columns starting with an underscore are skipped
+        self.read_cols = [column for column in self.cols if not column.startswith("_")]
+
+        self.has_is_active_field = has_is_active_field(model)
+        self.has_is_active_column = IsActiveFieldType.name in self.cols
+
+        #: Columns which are written to the database directly, with their database fields
+        self.direct_mappings: List[Tuple[str, str]] = [
+            (column, field_type.db_field)
+            for column, field_type in self.columns
+            if issubclass(field_type, DirectMappingFieldType) and column == field_type.name
+        ]
+        if self.has_is_active_field and not self.has_is_active_column:
+            self.direct_mappings.append((IsActiveFieldType.name, IsActiveFieldType.db_field))
+
+        #: Fields which are filled from other columns if their own column is missing
+        self.alternatives: List[Tuple[str, str]] = [
+            (field_type.name, alternative)
+            for field_type, alternative in field_type_registry.alternatives.items()
+            if model in field_type.models
+            and field_type.name not in self.cols
+            and alternative in self.cols
+        ]
+
+        #: Field types which process the values of several columns at once
+        self.multiple_columns: Dict[Type[FieldType], List[str]] = {}
+        #: Columns which are processed by field types with custom logic
+        self.process_columns: List[Tuple[str, Type[FieldType]]] = []
+        #: All field types with custom logic, with their columns
+        self.process_field_types: Dict[Type[FieldType], List[str]] = {}
+        for column, field_type in self.columns:
+            if issubclass(field_type, MultipleValuesFieldType):
+                self.multiple_columns.setdefault(field_type, []).append(column)
+            elif issubclass(field_type, ProcessFieldType) and column == field_type.name:
+                self.process_columns.append((column, field_type))
+            else:
+                continue
+            self.process_field_types.setdefault(field_type, []).append(column)
+
+        #: Field types creating related objects, with their columns
+        self.related_field_types: Dict[Type[FieldType], List[str]] = {
+            field_type: columns
+            for field_type, columns in self.process_field_types.items()
+            if field_type.creates_related
+        }
+
+        self.match_field_type = self.get_match_field_type()
+
+    def get_match_field_type(self) -> Type[MatchFieldType]:
+        """Get the field type with the highest priority which can be used to match objects."""
+        for field_type in field_type_registry.unique_references_by_priority:
+            if field_type.name in self.cols:
+                return field_type
+
+        raise ValueError(_("Missing unique reference."))
+
+    @classmethod
+    def from_template(cls, template: ImportTemplate, revision: str = "") -> "ImportPlan":
+        """Compile a plan from the fields of an import template."""
+        return cls(
+            template.content_type.model_class(),
+            [field.field_type_class for field in template.fields.all()],
+            revision or template.revision,
+        )
+
+    @classmethod
+    def for_template(cls, template: ImportTemplate) -> "ImportPlan":
+        """Get the plan for an import template.
+
+        Plans are cached per template and revision, so they are compiled again
+        if the template has changed. Only the most recently used plans are kept.
+        """
+        return _get_plan(template, template.revision)
+
+    def build_values(self, row: dict) -> dict:
+        """Get all values of a row which are written to the database directly."""
+        values = {db_field: row[column] for column, db_field in self.direct_mappings}
+        for field, alternative in self.alternatives:
+            values[field] = row[alternative]
+        return values
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _get_plan(template: ImportTemplate, revision: str) -> ImportPlan:
+    return ImportPlan.from_template(template, revision)
@@ -1,198 +1,790 @@
+import zlib
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from functools import partial
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Collection,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
 from django.contrib import messages
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models import Model
 from django.utils.translation import gettext as _
 
-import pandas
-from pandas.errors import ParserError
-
-from aleksis.apps.csv_import.field_types import (
-    DirectMappingFieldType,
-    MultipleValuesFieldType,
-    field_type_registry,
+from celery import chain, chord, group
+from celery.result import AsyncResult
+from celery.utils import uuid
+
+from aleksis.apps.csv_import.settings import IMPORT_RETRIES
+from aleksis.apps.csv_import.util.bulk_writer import BulkWriter, WriteOperation
+from aleksis.apps.csv_import.util.class_range_helpers import invalidate_class_ranges
+from aleksis.apps.csv_import.util.context import ImportContext
+from aleksis.apps.csv_import.util.diff import ImportDiff
+from aleksis.apps.csv_import.util.errors import ErrorReport, RowError, get_row_error
+from aleksis.apps.csv_import.util.fingerprints import (
+    get_fingerprints,
+    get_row_fingerprint,
+    set_fingerprints,
+)
+from aleksis.apps.csv_import.util.import_helpers import (
+    deactivate,
+    deactivate_missing,
+    is_active,
+    is_transient_error,
+    set_seen_objects,
+)
+from aleksis.apps.csv_import.util.plan import ImportPlan
+from aleksis.apps.csv_import.util.profiling import profile_import
+from aleksis.apps.csv_import.util.progress import ThrottledProgress
+from aleksis.apps.csv_import.util.reader import (
+    estimate_row_count,
+    is_parser_engine_available,
+    read_csv_chunks,
 )
-from aleksis.apps.csv_import.settings import FALSE_VALUES, TRUE_VALUES
-from aleksis.apps.csv_import.util.import_helpers import has_is_active_field, is_active
+from aleksis.apps.csv_import.util.stats import ImportStats, format_stats
+from aleksis.core.celery import app
 from aleksis.core.models import Group, Person
 from aleksis.core.util.celery_progress import ProgressRecorder, recorded_task
+from aleksis.core.util.core_helpers import get_site_preferences
 
 from ..models import ImportJob
 
+# pandas is slow to import and only needed when importing, which
+# happens in workers, so it is imported in the methods using it
+if TYPE_CHECKING:
+    import pandas
 
-@recorded_task
-def import_csv(import_job: int, recorder: ProgressRecorder,) -> None:
-    import_job = ImportJob.objects.get(pk=import_job)
-    template = import_job.template
-    model = template.content_type.model_class()
-    school_term = import_job.school_term
-    csv = import_job.data_file.open("rb")
-
-    data_types = {}
-    cols = []
-    cols_for_multiple_fields = {}
-    for field in template.fields.all():
-        field_type = field.field_type_class
-        column_name = field_type.column_name
-
-        # Get column header
-        if issubclass(field_type, MultipleValuesFieldType):
-            cols_for_multiple_fields.setdefault(field_type, [])
-            cols_for_multiple_fields[field_type].append(column_name)
-
-        # Get data type
-        data_types[column_name] = field_type.data_type
-
-        # Prepare field type for import
-        field_type.prepare(school_term)
-
-        cols.append(column_name)
-        print(cols)
-    try:
-        data = pandas.read_csv(
-            csv,
-            sep=template.parsed_separator,
-            names=cols,
-            header=0 if template.has_header_row else None,
-            dtype=data_types,
-            usecols=lambda k: not k.startswith("_"),
-            keep_default_na=False,
-            converters=field_type_registry.converters,
-            quotechar='"',
-            encoding="utf-8-sig",
-            true_values=TRUE_VALUES,
-            false_values=FALSE_VALUES,
+#: Seconds the progress of partitions is kept in the cache
+PARTITION_PROGRESS_TIMEOUT = 24 * 60 * 60
+
+
+@dataclass
+class ChunkResult:
+    """Changes made while importing one chunk.
+
+    They are only merged into the result of the import once the
+    chunk was committed, so a chunk can be retried.
+    """
+
+    diff: ImportDiff = field(default_factory=ImportDiff)
+    # Objects found in the chunk, only stored with full sync
+    seen_pks: Set[int] = field(default_factory=set)
+    inactive_refs: List[int] = field(default_factory=list)
+    messages: List[Tuple[int, str]] = field(default_factory=list)
+    errors: List[RowError] = field(default_factory=list)
+    all_ok: bool = True
+
+    def add_message(self, level: int, message: str):
+        self.messages.append((level, message))
+
+
+def get_partition(value: Any, count: int) -> int:
+    """Get the partition a row belongs to by the value of its match field.
+
+    The partition is the same in every worker process, so all rows
+    for the same object are always imported by the same worker.
+    """
+    return zlib.crc32(str(value).encode()) % count
+
+
+def in_partition(
+    column: str, partition: Tuple[int, int], chunk: "pandas.DataFrame"
+) -> "pandas.Series":
+    """Select the rows of a chunk which belong to a partition by the raw values of a column."""
+    index, count = partition
+    return chunk[column].map(lambda v: get_partition(v, count) == index)
+
+
+class Importer:
+    """Import the rows of the file of an import job.
+
+    All state of one import is kept here, so the rows of a file can be
+    imported at once or in several partitions whose results are merged.
+    """
+
+    def __init__(self, import_job: ImportJob, recorder: ProgressRecorder):
+        self.import_job = import_job
+        self.recorder = recorder
+
+        self.template = import_job.template
+        self.model = self.template.content_type.model_class()
+        self.school_term = import_job.school_term
+        self.dry_run = import_job.dry_run
+
+        self.context = ImportContext(self.school_term)
+        self.lookup_index = self.context.lookup_index
+
+        self.plan = ImportPlan.for_template(self.template)
+        self.match_field_type = self.plan.match_field_type
+
+        self.filters = {}
+        if hasattr(self.model, "school_term") and self.school_term:
+            self.filters["school_term"] = self.school_term
+
+        # Settings of the job which change the result of importing the same rows
+        self.fingerprint_scope = [
+            self.school_term.pk if self.school_term else None,
+            self.template.group_id,
+        ]
+
+        # Values which are the same for all rows
+        self.constant_values = {}
+        if self.template.group_type and self.model == Group:
+            self.constant_values["group_type"] = self.template.group_type
+
+        self.writer = BulkWriter(
+            self.model,
+            self.filters,
+            self.lookup_index,
+            batch_size=self.context.chunk_size,
+            dry_run=self.dry_run,
         )
-    except ParserError as e:
-        recorder.add_message(
-            messages.ERROR, _(f"There was an error while parsing the CSV file:\n{e}")
+        self.diff = ImportDiff()
+        self.stats = ImportStats()
+        self.errors = ErrorReport()
+        self.progress = ThrottledProgress(
+            recorder, import_job.progress_interval, import_job.progress_rows
         )
-        return
 
-    # Exclude all empty rows
-    data = data.where(data.notnull(), None)
+        self.all_ok = True
+        self.parsed_completely = True
+        self.inactive_refs = []
+
+        # Changes of the current chunk
+        self.chunk = ChunkResult()
+        # Fingerprints of the last import of the objects in the current chunk
+        self.stored_fingerprints = {}
+        # Fingerprints of rows which are still to be written, and of successfully written rows
+        self.pending_fingerprints = {}
+        self.new_fingerprints = {}
+        # Field type which is processing the current row, to report errors
+        self.current_field_type = None
+
+    def read_chunks(
+        self,
+        csv: IO[bytes],
+        columns: Optional[Collection[str]] = None,
+        row_filter: Optional[Callable[["pandas.DataFrame"], "pandas.Series"]] = None,
+    ) -> Iterator["pandas.DataFrame"]:
+        """Prepare all field types and read the file chunk by chunk.
+
+        :param columns: Columns to read, all columns if not given
+        :param row_filter: Function selecting the rows to convert, see ``read_csv_chunks``
+        """
+        cols = self.plan.cols
+        if columns is not None:
+            # Columns starting with an underscore are skipped by the reader
+            cols = [col if col in columns else f"_{col}" for col in cols]
+
+        data_types = {}
+        converters = {}
+        column_converters = {}
+        categorical = []
+        for column_name, field_type in self.plan.columns:
+            if column_name not in cols:
+                continue
+
+            # Get data type and converters
+            data_types[column_name] = field_type.data_type
+            converter = field_type.get_converter(self.context)
+            if converter:
+                converters[column_name] = self.stats.timed("convert", converter)
+            column_converter = field_type.get_column_converter(self.context)
+            if column_converter:
+                column_converters[column_name] = self.stats.timed("convert", column_converter)
+            if field_type.low_cardinality:
+                categorical.append(column_name)
+
+            # Prepare field type for import
+            field_type.prepare(self.context)
+
+        engine = self.import_job.get_parser_engine()
+        if not is_parser_engine_available(engine):
+            self.recorder.add_message(
+                messages.WARNING,
+                _(f"The CSV parser {engine} is not installed, so pandas is used instead."),
+            )
+            engine = "pandas"
 
-    all_ok = True
-    inactive_refs = []
-    created_count = 0
+        return read_csv_chunks(
+            csv,
+            cols,
+            data_types,
+            converters,
+            column_converters,
+            separator=self.template.parsed_separator,
+            has_header_row=self.template.has_header_row,
+            chunk_size=self.context.chunk_size,
+            engine=engine,
+            categorical=categorical,
+            row_filter=row_filter,
+        )
 
-    data_as_dict = data.transpose().to_dict().values()
+    def run(self, partition: Optional[Tuple[int, int]] = None):
+        """Import all rows of the file.
+
+        :param partition: Index and number of partitions, to import only the rows of one partition
+        """
+        with self.stats.record():
+            self._run(partition)
+
+    def _run(self, partition: Optional[Tuple[int, int]]):
+        from pandas.errors import ParserError  # noqa
+
+        data_file = self.import_job.data_file
+        csv = data_file.open("rb")
+
+        total = estimate_row_count(csv, data_file.size, self.template.has_header_row)
+        current = 0
+        self.progress.set_progress(current, total, force=True)
+
+        row_filter = None
+        if partition:
+            # Rows of other partitions are dropped before their values are converted
+            row_filter = partial(in_partition, self.match_field_type.name, partition)
+
+        try:
+            chunks = self.read_chunks(csv, row_filter=row_filter)
+            while True:
+                with self.stats.measure("read"):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                current += chunk.attrs["rows"]
+                self.stats.rows += len(chunk)
+                self.process_chunk(chunk)
+
+                total = max(total, current)
+                self.progress.set_progress(current, total)
+        except ParserError as e:
+            self.recorder.add_message(
+                messages.ERROR, _(f"There was an error while parsing the CSV file:\n{e}")
+            )
+            self.all_ok = False
+            self.parsed_completely = False
 
-    for row in recorder.iterate(data_as_dict):
-        # Fill the is_active field from other fields if necessary
-        obj_is_active = is_active(row)
-        if has_is_active_field(model):
-            row["is_active"] = obj_is_active
+        self.progress.set_progress(current, current, force=True)
 
-        # Build dict with all fields that should be directly updated
-        update_dict = {}
-        for key, value in row.items():
-            if key in field_type_registry.field_types:
-                field_type = field_type_registry.get_from_name(key)
-                if issubclass(field_type, DirectMappingFieldType):
-                    update_dict[field_type.db_field] = value
+    def create_related(self):
+        """Create the related objects of all rows before the rows are imported.
 
-        # Set alternatives for some fields
-        for (field_type_origin, alternative_name,) in field_type_registry.alternatives.items():
-            if (
-                model in field_type_origin.models
-                and field_type_origin.name not in row
-                and alternative_name in row
-            ):
-                update_dict[field_type_origin.name] = row[alternative_name]
+        Partitions of an import run at the same time and would otherwise try
+        to create the same related objects, like department groups, concurrently.
+        """
+        import pandas  # noqa
+        from pandas.errors import ParserError  # noqa
+
+        field_types = self.plan.related_field_types
+        if self.dry_run or not field_types:
+            return
+
+        columns = {column for columns in field_types.values() for column in columns}
+        with self.stats.record(), self.import_job.data_file.open("rb") as csv:
+            try:
+                for chunk in self.read_chunks(csv, columns=columns):
+                    with transaction.atomic():
+                        for field_type, field_columns in field_types.items():
+                            values = pandas.concat([chunk[column] for column in field_columns])
+                            field_type.prepare_chunk(values)
+            except ParserError:
+                # Errors in the file are reported by the partitions
+                pass
+
+    def process_chunk(self, chunk: "pandas.DataFrame"):
+        """Import all rows of a chunk in one transaction.
 
-        if template.group_type and model == Group:
-            update_dict["group_type"] = template.group_type
+        Rows which fail get rolled back to their own savepoint. If the transaction
+        fails due to a deadlock or serialization failure, the whole chunk is retried.
+        """
+        model, match_field = self.model, self.match_field_type.db_field
 
-        get_dict = {}
-        match_field_found = False
-        for (priority, match_field_type,) in field_type_registry.match_field_types:
-            if match_field_type.name in row:
-                get_dict[match_field_type.db_field] = row[match_field_type.name]
-                match_field_found = True
+        for attempt in range(1, IMPORT_RETRIES + 1):
+            self.chunk = ChunkResult()
+            self.pending_fingerprints.clear()
+            self.new_fingerprints.clear()
+            self.context.m2m_writer.clear()
+            try:
+                with transaction.atomic():
+                    self._process_chunk(chunk)
+                break
+            except DatabaseError as e:
+                self.writer.clear()
+                if is_transient_error(e) and attempt < IMPORT_RETRIES:
+                    continue
+
+                # Objects of a failed chunk are unknown, so none may be deactivated as missing
+                self.chunk = ChunkResult(all_ok=False)
+                self.parsed_completely = False
+                # All rows of the chunk were rolled back
+                self.chunk.diff.failed = len(chunk)
+                for match_value in chunk[self.match_field_type.name]:
+                    self.chunk.errors.append(get_row_error(e, match_value))
                 break
+            finally:
+                # Objects of this chunk are not needed anymore
+                self.lookup_index.clear(model, match_field, **self.filters)
 
-        if not match_field_found:
-            raise ValueError(_("Missing unique reference."))
+        self.merge(self.chunk)
 
-        if hasattr(model, "school_term") and school_term:
-            get_dict["school_term"] = school_term
+    def _process_chunk(self, chunk: "pandas.DataFrame"):
+        import pandas  # noqa
 
-        if obj_is_active:
-            created = False
+        model, match_field = self.model, self.match_field_type.db_field
 
-            try:
-                get_dict["defaults"] = update_dict
+        # Fetch all existing objects for the chunk and their fingerprints at once
+        with self.stats.measure("match"):
+            existing = self.lookup_index.get_many(
+                model, match_field, chunk[self.match_field_type.name].tolist(), **self.filters
+            )
+            self.stored_fingerprints = get_fingerprints(
+                self.template, [obj.pk for objs in existing.values() for obj in objs]
+            )
+
+        if not self.dry_run:
+            # Let field types get or create related objects for the whole chunk
+            with self.stats.measure("prepare"):
+                for field_type, columns in self.plan.process_field_types.items():
+                    with self.stats.measure_field_type(field_type.name):
+                        field_type.prepare_chunk(
+                            pandas.concat([chunk[column] for column in columns])
+                        )
+
+        for row in chunk.to_dict("records"):
+            self.process_row(row)
+
+        with self.stats.measure("write"):
+            operations = self.writer.flush()
+        self.process_written(operations)
+
+        if not self.dry_run:
+            with self.stats.measure("write_related"):
+                self.context.m2m_writer.write()
+                set_fingerprints(self.template, self.new_fingerprints)
+
+        if self.import_job.full_sync:
+            # Missing objects are found by joining the found objects after the import
+            with self.stats.measure("write"):
+                set_seen_objects(self.import_job, self.chunk.seen_pks)
 
-                instance, created = model.objects.update_or_create(**get_dict)
+    def process_row(self, row: dict):
+        model, match_field = self.model, self.match_field_type.db_field
+        match_value = row[self.match_field_type.name]
 
-                # Get values for multiple fields
-                values_for_multiple_fields = {}
-                for field_type, cols_for_field_type in cols_for_multiple_fields.items():
-                    values_for_multiple_fields[field_type] = []
-                    for col in cols_for_field_type:
-                        value = row[col]
-                        values_for_multiple_fields[field_type].append(value)
+        # Fill the is_active field from other fields if necessary
+        obj_is_active = is_active(row)
+        if self.plan.has_is_active_field:
+            row["is_active"] = obj_is_active
 
-                    # Process
-                    field_type().process(instance, values_for_multiple_fields[field_type])
+        update_dict = self.plan.build_values(row)
+        update_dict.update(self.constant_values)
 
-                # Process field types with custom logic
-                for process_field_type in field_type_registry.process_field_types:
-                    if process_field_type.name in row:
-                        try:
-                            process_field_type().process(instance, row[process_field_type.name])
-                        except RuntimeError as e:
-                            recorder.add_message(messages.ERROR, str(e))
+        if obj_is_active:
+            # Skip rows which did not change since the last import
+            fingerprint = get_row_fingerprint(
+                row, self.plan.read_cols, self.plan.revision, self.fingerprint_scope
+            )
+            objs = self.lookup_index.get_all(model, match_field, match_value, **self.filters)
+            if (
+                len(objs) == 1
+                and getattr(objs[0], "is_active", True)
+                and self.stored_fingerprints.get(objs[0].pk) == fingerprint
+            ):
+                self.chunk.seen_pks.add(objs[0].pk)
+                self.chunk.diff.unchanged += 1
+                return
 
-                if template.group and isinstance(instance, Person):
-                    instance.member_of.add(template.group)
+            self.pending_fingerprints[id(row)] = fingerprint
+            with self.stats.measure("write"):
+                operations = self.writer.add(row, match_field, match_value, update_dict)
+            self.process_written(operations)
 
-                if created:
-                    created_count += 1
+        else:
+            # Store import refs to deactivate later
+            try:
+                obj = self.lookup_index.get(model, match_field, match_value, **self.filters)
+                self.chunk.inactive_refs.append(obj.pk)
+                self.chunk.seen_pks.add(obj.pk)
+            except (model.DoesNotExist, model.MultipleObjectsReturned):
+                pass
+
+    def process_written(self, operations: Sequence[WriteOperation]):
+        model, plan = self.model, self.plan
+
+        for operation in operations:
+            row, instance = operation.row, operation.instance
+            if instance and instance.pk:
+                self.chunk.seen_pks.add(instance.pk)
+            fingerprint = self.pending_fingerprints.pop(id(row), None)
+
+            try:
+                if operation.error:
+                    raise operation.error
+
+                if self.dry_run:
+                    # Related objects are only changed by real imports
+                    continue
+
+                # Roll back only this row if processing it fails
+                self.context.unresolved = False
+                with self.stats.measure("process"), transaction.atomic():
+                    row_ok = self.process_related(row, instance)
+                if not row_ok:
+                    # The errors were reported by the failed field types
+                    operation.error = RuntimeError("Related objects failed to be imported.")
+                    self.chunk.all_ok = False
+
+                # Rows with related objects which do not exist yet are imported again,
+                # but their objects are still known as imported with the template
+                if row_ok and fingerprint and not self.context.unresolved:
+                    self.new_fingerprints[instance.pk] = fingerprint
+                else:
+                    self.new_fingerprints[instance.pk] = ""
 
             except (
                 ValueError,
                 ValidationError,
+                DatabaseError,
                 model.MultipleObjectsReturned,
                 model.DoesNotExist,
             ) as e:
+                if isinstance(e, DatabaseError) and is_transient_error(e):
+                    raise
+                self.chunk.errors.append(
+                    get_row_error(e, operation.match_value, self.current_field_type)
+                )
+                self.chunk.all_ok = False
+                # Rows whose related objects failed are counted as failed, not as written
+                operation.error = e
+                if instance and instance.pk and not self.dry_run:
+                    self.new_fingerprints[instance.pk] = ""
+            finally:
+                self.current_field_type = None
+
+        self.chunk.diff.add(operations)
+
+    def process_related(self, row: dict, instance: Model) -> bool:
+        """Run all field types with custom logic for a written row.
+
+        :return: Whether all field types succeeded
+        """
+        row_ok = True
+
+        # Process field types with multiple columns
+        for field_type, cols_for_field_type in self.plan.multiple_columns.items():
+            self.current_field_type = field_type.name
+            with self.stats.measure_field_type(field_type.name):
+                field_type().process(instance, [row[col] for col in cols_for_field_type])
+
+        # Process field types with custom logic
+        for column, process_field_type in self.plan.process_columns:
+            self.current_field_type = process_field_type.name
+            try:
+                with self.stats.measure_field_type(process_field_type.name):
+                    process_field_type().process(instance, row[column])
+            except RuntimeError as e:
+                self.chunk.errors.append(
+                    get_row_error(e, row[self.match_field_type.name], process_field_type.name)
+                )
+                row_ok = False
+
+        self.current_field_type = None
+        if self.template.group and isinstance(instance, Person):
+            self.context.m2m_writer.add(instance, "member_of", [self.template.group])
+
+        return row_ok
+
+    def get_stats(self) -> dict:
+        """Get the timing and database statistics of the import with the numbers of objects."""
+        return {
+            **self.stats.as_dict(),
+            "created": self.diff.created,
+            "updated": self.diff.updated,
+            "unchanged": self.diff.unchanged,
+            "failed": self.diff.failed,
+            "deactivated": self.diff.deactivated,
+        }
+
+    def get_result(self) -> dict:
+        """Get the result of importing a partition in a form which can be sent to other tasks."""
+        return {
+            "all_ok": self.all_ok,
+            "parsed_completely": self.parsed_completely,
+            "inactive_refs": self.inactive_refs,
+            "diff": self.diff.as_dict(),
+            "stats": self.stats.as_dict(),
+            "errors": self.errors.as_dict(),
+        }
+
+    def merge(self, result: Union[ChunkResult, dict]):
+        """Merge the result of a committed chunk or of an imported partition into this import."""
+        if isinstance(result, ChunkResult):
+            self.all_ok = self.all_ok and result.all_ok
+            self.inactive_refs += result.inactive_refs
+            self.diff.merge(result.diff.as_dict())
+            for level, message in result.messages:
+                self.recorder.add_message(level, message)
+            for row_error in result.errors:
+                self.errors.add(row_error)
+            return
+
+        self.all_ok = self.all_ok and result["all_ok"]
+        self.parsed_completely = self.parsed_completely and result["parsed_completely"]
+        self.inactive_refs += result["inactive_refs"]
+        self.diff.merge(result["diff"])
+        self.stats.merge(result["stats"])
+        self.errors.merge(result["errors"], result.get("errors_file"))
+
+    def deactivate(self) -> int:
+        """Deactivate all objects which are inactive or, with full sync, missing in the file.
+
+        :return: Number of deactivated objects
+        """
+        model, template = self.model, self.template
+
+        # Deactivate all objects that existed but are now inactive
+        deactivated_count = deactivate(model, self.inactive_refs, dry_run=self.dry_run)
+
+        if self.import_job.full_sync:
+            if self.parsed_completely:
+                sync_filters = dict(self.filters)
+                if template.group:
+                    sync_filters["member_of"] = template.group
+                deactivated_count += deactivate_missing(
+                    model, template, self.import_job, dry_run=self.dry_run, **sync_filters
+                )
+            else:
+                self.recorder.add_message(
+                    messages.WARNING,
+                    _(
+                        f"No missing {model._meta.verbose_name_plural} were deactivated "
+                        f"as the file could not be imported completely."
+                    ),
+                )
+
+        return deactivated_count
+
+    def finish(self):
+        """Deactivate objects and report the result after all rows were imported."""
+        model, recorder, diff = self.model, self.recorder, self.diff
+        verbose_name_plural = model._meta.verbose_name_plural
+
+        if self.plan.has_is_active_field:
+            with self.stats.record(), self.stats.measure("deactivate"):
+                diff.deactivated = self.deactivate()
+
+            if diff.deactivated and not self.dry_run:
                 recorder.add_message(
-                    messages.ERROR, _(f"Failed to import {model._meta.verbose_name} {row}:\n{e}"),
+                    messages.WARNING,
+                    _(f"{diff.deactivated} existing {verbose_name_plural} were deactivated."),
                 )
-                all_ok = False
 
-        else:
-            # Store import refs to deactivate later
-            try:
-                obj = model.objects.get(**get_dict)
-                inactive_refs.append(obj.pk)
-            except model.DoesNotExist:
-                pass
+        if self.import_job.full_sync:
+            # Found objects are only needed to deactivate missing ones
+            self.import_job.seen_objects.all().delete()
+
+        for message in self.errors.get_messages(verbose_name_plural):
+            recorder.add_message(messages.ERROR, message)
+        self.errors.save(self.import_job)
 
-        # Deactivate all persons that existed but are now inactive
-        affected = None
-        if has_is_active_field(model):
-            affected = model.objects.filter(pk__in=inactive_refs, is_active=True).update(
-                is_active=False
+        self.import_job.diff = diff.as_dict()
+        self.import_job.stats = self.get_stats()
+        self.import_job.save(update_fields=["diff", "stats"])
+        recorder.add_message(
+            messages.INFO,
+            "\n".join([_("Import statistics:")] + format_stats(self.import_job.stats)),
+        )
+
+        if model is Group and not self.dry_run:
+            # Bulk writes do not send signals, so cached class ranges have to be dropped here
+            invalidate_class_ranges(self.school_term.pk if self.school_term else None)
+
+        if self.dry_run:
+            recorder.add_message(
+                messages.INFO,
+                _(
+                    f"Dry run: {diff.created} {verbose_name_plural} would be newly "
+                    f"created, {diff.updated} would be updated, {diff.unchanged} would be left "
+                    f"unchanged and {diff.deactivated} would be deactivated."
+                ),
             )
+            if not self.all_ok:
+                recorder.add_message(
+                    messages.WARNING, _(f"Some {verbose_name_plural} would fail to be imported."),
+                )
+            return
 
-        if affected:
+        if diff.created:
             recorder.add_message(
-                messages.WARNING,
-                _(f"{affected} existing {model._meta.verbose_name_plural} were deactivated."),
+                messages.SUCCESS, _(f"{diff.created} {verbose_name_plural} were newly created."),
             )
 
-    if created_count:
-        recorder.add_message(
-            messages.SUCCESS,
-            _(f"{created_count} {model._meta.verbose_name_plural} were newly created."),
-        )
+        if diff.updated:
+            recorder.add_message(
+                messages.SUCCESS,
+                _(f"{diff.updated} existing {verbose_name_plural} were updated."),
+            )
 
-    if all_ok:
-        recorder.add_message(
-            messages.SUCCESS,
-            _(f"All {model._meta.verbose_name_plural} were imported successfully."),
-        )
-    else:
+        if diff.unchanged:
+            recorder.add_message(
+                messages.INFO,
+                _(f"{diff.unchanged} existing {verbose_name_plural} were unchanged."),
+            )
+
+        if self.all_ok:
+            recorder.add_message(
+                messages.SUCCESS, _(f"All {verbose_name_plural} were imported successfully."),
+            )
+        else:
+            recorder.add_message(
+                messages.WARNING, _(f"Some {verbose_name_plural} failed to be imported."),
+            )
+
+
+def _report_duplicate(import_job: ImportJob, recorder: ProgressRecorder) -> bool:
+    if import_job.duplicate_of:
         recorder.add_message(
-            messages.WARNING, _(f"Some {model._meta.verbose_name_plural} failed to be imported."),
+            messages.INFO,
+            _(
+                f"This file was already imported with import job {import_job.duplicate_of.pk}, "
+                f"so nothing was imported."
+            ),
         )
+        return True
+    return False
+
+
+@recorded_task
+def import_csv(import_job: int, recorder: ProgressRecorder,) -> None:
+    import_job = ImportJob.objects.get(pk=import_job)
+    if _report_duplicate(import_job, recorder):
+        return
+
+    importer = Importer(import_job, recorder)
+    with profile_import(import_job) if import_job.profile else nullcontext():
+        importer.run()
+        importer.finish()
+
+
+class _ForeignTask:
+    """Proxy for a task which updates the state of another task."""
+
+    def __init__(self, task, task_id: str):
+        self._task = task
+        self._task_id = task_id
+
+    def __getattr__(self, name: str):
+        return getattr(self._task, name)
+
+    def update_state(self, **kwargs):
+        self._task.update_state(task_id=self._task_id, **kwargs)
+
+
+class PartitionRecorder:
+    """Collect the messages of one partition and report the progress of all partitions.
+
+    The progress of all partitions is summed up using the cache and reported
+    as the progress of the task which merges the partitions.
+    """
+
+    def __init__(self, task, import_job: int, index: int, count: int, reducer_id: str):
+        self.messages: List[Tuple[int, str]] = []
+        self.index = index
+        self.count = count
+
+        self._keys = [f"csv_import_progress_{import_job}_{i}" for i in range(count)]
+        self._recorder = ProgressRecorder(_ForeignTask(task, reducer_id))
+
+    def add_message(self, level: int, message: str):
+        self.messages.append((level, message))
+
+    def set_progress(self, current: int, total: int):
+        cache.set(self._keys[self.index], current, PARTITION_PROGRESS_TIMEOUT)
+        done = sum(cache.get_many(self._keys).values())
+        self._recorder.set_progress(done // self.count, total)
+
+
+@app.task(bind=True)
+def prepare_import_csv(task, import_job: int, reducer_id: str) -> None:
+    """Create the related objects of all partitions of an import before they start."""
+    recorder = ProgressRecorder(_ForeignTask(task, reducer_id))
+    import_job = ImportJob.objects.get(pk=import_job)
+
+    Importer(import_job, recorder).create_related()
+
+
+@app.task(bind=True)
+def import_csv_partition(task, import_job: int, index: int, count: int, reducer_id: str) -> dict:
+    """Import all rows of one partition of a file."""
+    recorder = PartitionRecorder(task, import_job, index, count, reducer_id)
+    import_job = ImportJob.objects.get(pk=import_job)
+
+    importer = Importer(import_job, recorder)
+    importer.run(partition=(index, count))
+
+    result = importer.get_result()
+    result["messages"] = recorder.messages
+    result["errors_file"] = importer.errors.save_part(import_job, index)
+    return result
+
+
+@recorded_task
+def finish_import_csv(results: List[dict], import_job: int, recorder: ProgressRecorder) -> None:
+    """Merge the results of all partitions of an import, then deactivate objects."""
+    import_job = ImportJob.objects.get(pk=import_job)
+    importer = Importer(import_job, recorder)
+
+    for result in results:
+        for level, message in result["messages"]:
+            recorder.add_message(level, message)
+        importer.merge(result)
+
+    importer.finish()
+
+
+def start_import(import_job: ImportJob) -> AsyncResult:
+    """Start the import of a job in the background.
+
+    Files larger than one chunk are split into partitions by their match field
+    if more than one partition is configured and the import is not profiled. Each
+    partition is imported by its own task and the results are merged by a final
+    task, whose result is returned. Related objects shared by several partitions
+    are created by a task running before the partitions.
+    """
+    preferences = get_site_preferences()
+    count = preferences["csv_import__partitions"]
+
+    # Profiles are only complete if the whole file is imported in one process
+    if count > 1 and not import_job.duplicate_of and not import_job.profile:
+        with import_job.data_file.open("rb") as csv:
+            rows = estimate_row_count(
+                csv, import_job.data_file.size, import_job.template.has_header_row
+            )
+
+        if rows > preferences["csv_import__chunk_size"]:
+            reducer_id = uuid()
+            partitions = group(
+                import_csv_partition.s(import_job.pk, index, count, reducer_id)
+                for index in range(count)
+            )
+            reducer = finish_import_csv.s(import_job.pk).set(task_id=reducer_id)
+
+            plan = ImportPlan.for_template(import_job.template)
+            if plan.related_field_types and not import_job.dry_run:
+                prepare = prepare_import_csv.si(import_job.pk, reducer_id)
+                return chain(prepare, chord(partitions, reducer)).delay()
+            return chord(partitions)(reducer)
+
+    return import_csv.delay(import_job.pk)
@@ -0,0 +1,74 @@
+"""Profiling of import jobs to diagnose slow imports where they happen."""
+
+import cProfile
+import io
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator
+
+from django.core.files.base import ContentFile
+
+from aleksis.apps.csv_import.models import ImportJob
+from aleksis.apps.csv_import.settings import (
+    PROFILE_ALLOCATION_SITES,
+    PROFILE_FUNCTIONS,
+    PROFILE_TRACEBACK_FRAMES,
+)
+
+
+def format_profile(profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot) -> str:
+    """Format the slowest functions and the largest memory allocation sites as text."""
+    out = io.StringIO()
+
+    out.write("Functions by cumulative time\n")
+    out.write("============================\n")
+    stats = pstats.Stats(profiler, stream=out)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_FUNCTIONS)
+
+    out.write("Functions by own time\n")
+    out.write("=====================\n")
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(PROFILE_FUNCTIONS)
+
+    out.write("Memory allocation sites still allocated at the end of the import\n")
+    out.write("================================================================\n\n")
+    for statistic in snapshot.statistics("traceback")[:PROFILE_ALLOCATION_SITES]:
+        out.write(f"{statistic.size / 1024:.1f} KiB in {statistic.count} blocks\n")
+        for line in statistic.traceback.format():
+            out.write(f"{line}\n")
+        out.write("\n")
+
+    __, peak = tracemalloc.get_traced_memory()
+    out.write(f"Peak traced memory: {peak / 2 ** 20:.1f} MiB\n")
+
+    return out.getvalue()
+
+
+@contextmanager
+def profile_import(import_job: ImportJob) -> Iterator[None]:
+    """Run an import under ``cProfile`` and ``tracemalloc`` and attach a report to the job.
+
+    The report is also attached if the import fails, as that is
+    often when it is needed most.
+    """
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(PROFILE_TRACEBACK_FRAMES)
+    profiler = cProfile.Profile()
+
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, tracemalloc.__file__)]
+        )
+        report = format_profile(profiler, snapshot)
+        if not was_tracing:
+            tracemalloc.stop()
+
+        import_job.profile_file.save(
+            f"import_job_{import_job.pk}.txt", ContentFile(report.encode()), save=False
+        )
+        import_job.save(update_fields=["profile_file"])
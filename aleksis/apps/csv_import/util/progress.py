@@ -0,0 +1,51 @@
+"""Throttled progress reporting of import jobs."""
+
+import time
+from typing import Callable
+
+from aleksis.core.util.celery_progress import ProgressRecorder
+
+
+class ThrottledProgress:
+    """Report the progress of an import to a recorder only from time to time.
+
+    Every update of a recorder is written to the Celery result backend, so
+    progress is only reported if at least ``interval`` seconds passed since
+    the last update or, if ``rows`` is set, at least that many rows were
+    imported since then. The number of updates per second is thereby bounded
+    independently of the number of rows and the speed of the import.
+    """
+
+    def __init__(
+        self,
+        recorder: ProgressRecorder,
+        interval: float,
+        rows: int = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.recorder = recorder
+        self.interval = interval
+        self.rows = rows
+        self.clock = clock
+
+        #: Number of updates written to the recorder
+        self.updates = 0
+        self._last_time = None
+        self._last_current = 0
+
+    def set_progress(self, current: int, total: int, force: bool = False):
+        """Report progress if it is due.
+
+        :param force: Report progress in any case, e. g. the final count
+        """
+        now = self.clock()
+        if not force and self._last_time is not None:
+            due_by_time = now - self._last_time >= self.interval
+            due_by_rows = self.rows and current - self._last_current >= self.rows
+            if not (due_by_time or due_by_rows):
+                return
+
+        self.recorder.set_progress(current, total)
+        self.updates += 1
+        self._last_time = now
+        self._last_current = current
@@ -0,0 +1,328 @@
+"""Streaming reading of CSV files."""
+
+import csv as csv_module
+import io
+import re
+from importlib.util import find_spec
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Callable,
+    Collection,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+)
+
+from aleksis.apps.csv_import.settings import FALSE_VALUES, TRUE_VALUES
+
+if TYPE_CHECKING:
+    import pandas
+
+#: Number of bytes read to estimate the number of rows in a file
+ROW_COUNT_SAMPLE_SIZE = 64 * 1024
+
+#: Parser engines which can be chosen per import template or import job
+PARSER_ENGINES = ["pandas", "arrow", "csv"]
+
+#: Optional modules needed by parser engines
+PARSER_ENGINE_MODULES = {"arrow": "pyarrow"}
+
+#: Separator which pandas treats as runs of whitespace outside of quotes
+WHITESPACE_SEPARATOR = r"\s+"
+
+#: Fields of a line separated by whitespace, which may be quoted
+WHITESPACE_FIELD = re.compile(r'(?:"(?:[^"]|"")*"|[^\s"])+')
+
+
+def estimate_row_count(
+    csv: IO[bytes], size: int, has_header_row: bool = True, sample_size: int = ROW_COUNT_SAMPLE_SIZE
+) -> int:
+    """Estimate the number of rows in a CSV file from its size.
+
+    The average length of a row is determined from a sample at the start of the file.
+    Files smaller than the sample are counted exactly. The position in the file is
+    restored afterwards.
+    """
+    position = csv.tell()
+    sample = csv.read(sample_size)
+    csv.seek(position)
+
+    lines = sample.count(b"\n")
+    if len(sample) < sample_size:
+        # The whole file was read, so count the last row even without a line break
+        if sample and not sample.endswith(b"\n"):
+            lines += 1
+    elif lines:
+        lines = round(size * lines / len(sample))
+
+    if has_header_row:
+        lines -= 1
+
+    return max(lines, 0)
+
+
+def is_parser_engine_available(engine: str) -> bool:
+    """Check whether the modules needed by a parser engine are installed."""
+    module = PARSER_ENGINE_MODULES.get(engine)
+    return module is None or find_spec(module) is not None
+
+
+def read_csv_chunks(
+    csv: IO[bytes],
+    cols: Sequence[str],
+    data_types: Dict[str, type],
+    converters: Dict[str, Callable],
+    column_converters: Dict[str, Callable],
+    separator: str,
+    has_header_row: bool,
+    chunk_size: int,
+    engine: str = "pandas",
+    categorical: Collection[str] = (),
+    row_filter: Optional[Callable[["pandas.DataFrame"], "pandas.Series"]] = None,
+) -> Iterator["pandas.DataFrame"]:
+    """Read a CSV file chunk by chunk.
+
+    Only one chunk is held in memory at once. Columns with a column
+    converter are read as strings and converted as a whole afterwards.
+    Empty values are replaced by ``None`` in every chunk.
+
+    All engines split rows at the same separators, including regular expressions,
+    and parse booleans by ``TRUE_VALUES`` and ``FALSE_VALUES``:
+
+    * ``pandas`` uses the C parser of pandas.
+    * ``arrow`` uses the multithreaded parser of PyArrow and keeps strings in Arrow
+      memory. Columns listed in ``categorical`` are read as categoricals, so their
+      converters run once per distinct value. PyArrow only supports separators of
+      one character, so files with other separators are read by pandas. Unlike
+      the other engines, it fails on rows with missing fields.
+    * ``csv`` uses the ``csv`` module of the standard library, which has no setup
+      costs and is the fastest engine for small files.
+
+    :param converters: Converters for single values, by column
+    :param column_converters: Converters for whole columns, by column
+    :param engine: Name of the parser engine, one of ``PARSER_ENGINES``
+    :param categorical: Columns with only few distinct values
+    :param row_filter: Function selecting the rows of a chunk which are converted and
+        returned, called with the unconverted chunk. The number of rows read before
+        filtering is stored in ``chunk.attrs["rows"]``.
+    """
+    from pandas.errors import ParserError  # noqa
+
+    data_types = {
+        col: str if col in column_converters else data_type for col, data_type in data_types.items()
+    }
+    usecols = [col for col in cols if not col.startswith("_")]
+
+    if engine == "arrow" and len(separator) == 1:
+        chunks = _read_arrow_chunks(
+            csv, cols, usecols, separator, has_header_row, chunk_size, categorical
+        )
+    elif engine == "csv":
+        chunks = _read_stdlib_chunks(csv, cols, usecols, separator, has_header_row, chunk_size)
+    elif row_filter:
+        # Values are only converted after the rows are filtered
+        chunks = _read_pandas_chunks(
+            csv, cols, dict.fromkeys(data_types, str), {}, separator, has_header_row, chunk_size
+        )
+    else:
+        chunks = _read_pandas_chunks(
+            csv, cols, data_types, converters, separator, has_header_row, chunk_size
+        )
+        # pandas applies converters and data types while parsing
+        data_types, converters = {}, {}
+
+    for chunk in chunks:
+        rows = len(chunk)
+        if row_filter:
+            chunk = chunk[row_filter(chunk)].copy()
+
+        for col in usecols:
+            if col in converters:
+                chunk[col] = _convert(chunk[col], converters[col])
+            elif data_types.get(col, str) is not str:
+                chunk[col] = _convert_type(chunk[col], data_types[col])
+
+        for col, converter in column_converters.items():
+            try:
+                chunk[col] = converter(chunk[col])
+            except ValueError as e:
+                raise ParserError(f"Invalid value in column {col}: {e}")
+
+        # Exclude all empty rows
+        chunk = chunk.where(chunk.notnull(), None)
+        chunk.attrs["rows"] = rows
+        yield chunk
+
+
+def _convert(values: "pandas.Series", converter: Callable) -> "pandas.Series":
+    """Apply a converter for single values, once per distinct value of categoricals."""
+    from pandas.errors import ParserError  # noqa
+
+    try:
+        if values.dtype == "category":
+            mapping = {value: converter(value) for value in values.cat.categories}
+            return values.astype(object).map(mapping)
+        return values.astype(object).map(converter, na_action="ignore")
+    except ValueError as e:
+        raise ParserError(f"Invalid value in column {values.name}: {e}")
+
+
+def _convert_type(values: "pandas.Series", data_type: type) -> "pandas.Series":
+    """Convert strings to a data type like pandas' parser does."""
+    from pandas.errors import ParserError  # noqa
+
+    from aleksis.apps.csv_import.util.converters import parse_booleans  # noqa
+
+    try:
+        if data_type is bool:
+            return parse_booleans(values.astype(object))
+        return values.astype(data_type)
+    except (TypeError, ValueError) as e:
+        raise ParserError(f"Invalid value in column {values.name}: {e}")
+
+
+def _read_pandas_chunks(
+    csv: IO[bytes],
+    cols: Sequence[str],
+    data_types: Dict[str, type],
+    converters: Dict[str, Callable],
+    separator: str,
+    has_header_row: bool,
+    chunk_size: int,
+) -> Iterator["pandas.DataFrame"]:
+    import pandas  # noqa
+
+    return pandas.read_csv(
+        csv,
+        sep=separator,
+        names=cols,
+        header=0 if has_header_row else None,
+        dtype=data_types,
+        usecols=lambda k: not k.startswith("_"),
+        keep_default_na=False,
+        converters=converters,
+        quotechar='"',
+        encoding="utf-8-sig",
+        true_values=TRUE_VALUES,
+        false_values=FALSE_VALUES,
+        chunksize=chunk_size,
+    )
+
+
+def _read_arrow_chunks(
+    csv: IO[bytes],
+    cols: Sequence[str],
+    usecols: Sequence[str],
+    separator: str,
+    has_header_row: bool,
+    chunk_size: int,
+    categorical: Collection[str],
+) -> Iterator["pandas.DataFrame"]:
+    import pandas  # noqa
+    import pyarrow  # noqa
+    from pandas.errors import ParserError  # noqa
+    from pyarrow import csv as arrow_csv  # noqa
+
+    column_types = {
+        col: pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+        if col in categorical
+        else pyarrow.string()
+        for col in usecols
+    }
+    string_dtype = pandas.StringDtype("pyarrow")
+
+    def _to_pandas(table: "pyarrow.Table") -> "pandas.DataFrame":
+        return table.to_pandas(types_mapper={pyarrow.string(): string_dtype}.get)
+
+    try:
+        reader = arrow_csv.open_csv(
+            csv,
+            read_options=arrow_csv.ReadOptions(
+                column_names=cols, skip_rows=1 if has_header_row else 0
+            ),
+            parse_options=arrow_csv.ParseOptions(delimiter=separator, quote_char='"'),
+            convert_options=arrow_csv.ConvertOptions(
+                column_types=column_types,
+                include_columns=usecols,
+                strings_can_be_null=False,
+                quoted_strings_can_be_null=False,
+            ),
+        )
+
+        # PyArrow reads blocks of bytes, which are regrouped to chunks of rows
+        batches, rows = [], 0
+        for batch in reader:
+            batches.append(batch)
+            rows += batch.num_rows
+            while rows >= chunk_size:
+                table = pyarrow.Table.from_batches(batches, schema=reader.schema)
+                yield _to_pandas(table.slice(0, chunk_size))
+                batches = table.slice(chunk_size).to_batches()
+                rows -= chunk_size
+    except pyarrow.ArrowInvalid as e:
+        raise ParserError(str(e))
+
+    if rows:
+        yield _to_pandas(pyarrow.Table.from_batches(batches, schema=reader.schema))
+
+
+def _split_whitespace(line: str) -> List[str]:
+    """Split a line at runs of whitespace outside of quotes."""
+    return [
+        field[1:-1].replace('""', '"') if field.startswith('"') and field.endswith('"') else field
+        for field in WHITESPACE_FIELD.findall(line)
+    ]
+
+
+def _split_rows(text: IO[str], separator: str) -> Iterator[List[str]]:
+    """Split the lines of a file into fields like pandas, without empty lines."""
+    if len(separator) == 1:
+        rows = csv_module.reader(text, delimiter=separator, quotechar='"')
+    elif separator == WHITESPACE_SEPARATOR:
+        rows = (_split_whitespace(line) for line in text)
+    else:
+        # Like pandas, regular expressions are applied to whole lines, ignoring quotes
+        pattern = re.compile(separator)
+        rows = (pattern.split(line.strip()) for line in text if line.strip())
+    return (row for row in rows if row)
+
+
+def _read_stdlib_chunks(
+    csv: IO[bytes],
+    cols: Sequence[str],
+    usecols: Sequence[str],
+    separator: str,
+    has_header_row: bool,
+    chunk_size: int,
+) -> Iterator["pandas.DataFrame"]:
+    import pandas  # noqa
+    from pandas.errors import ParserError  # noqa
+
+    text = io.TextIOWrapper(csv, encoding="utf-8-sig", newline="")
+    indices = [cols.index(col) for col in usecols]
+    try:
+        rows = _split_rows(text, separator)
+        if has_header_row:
+            next(rows, None)
+
+        chunk: List[List[str]] = []
+        for line, row in enumerate(rows, 2 if has_header_row else 1):
+            if len(row) > len(cols):
+                raise ParserError(f"Expected {len(cols)} fields in row {line}, saw {len(row)}")
+            # Missing fields at the end of a row are empty
+            row += [""] * (len(cols) - len(row))
+            chunk.append([row[i] for i in indices])
+            if len(chunk) == chunk_size:
+                yield pandas.DataFrame(chunk, columns=usecols, dtype=object)
+                chunk = []
+        if chunk:
+            yield pandas.DataFrame(chunk, columns=usecols, dtype=object)
+    except csv_module.Error as e:
+        raise ParserError(str(e))
+    finally:
+        # Do not close the file when the wrapper is garbage collected
+        if not csv.closed:
+            text.detach()
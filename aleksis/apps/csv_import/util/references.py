@@ -0,0 +1,146 @@
+"""Import references of imported objects, stored in an indexed table."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterable, List, Optional, Tuple
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Model, Q, QuerySet
+
+#: Fields of imported models whose values are stored as import references, with their source
+REFERENCE_FIELDS = {"import_ref_csv": "csv"}
+
+# Set while references of saved objects are stored in bulk by the caller
+_deferred = ContextVar("csv_import_deferred_references", default=False)
+
+
+def get_reference_queryset(
+    model: Model, source: str, references: Optional[Iterable[str]] = None
+) -> QuerySet:
+    """Get all import references of a model and source, optionally limited to some values."""
+    ImportReference = apps.get_model("csv_import", "ImportReference")
+
+    qs = ImportReference.objects.filter(
+        content_type=ContentType.objects.get_for_model(model), source=source
+    )
+    if references is not None:
+        qs = qs.filter(reference__in=references)
+    return qs
+
+
+def get_objects_by_reference(
+    model: Model, source: str, references: Optional[Iterable[str]] = None, **filters
+) -> List[Tuple[str, Model]]:
+    """Resolve import references to objects.
+
+    :param model: Model of the objects
+    :param source: Source of the import references
+    :param references: References to resolve; if not set, all references are resolved
+    :param filters: Additional filters for the objects, e. g. the school term
+    :return: List of pairs of references and objects
+    """
+    qs = get_reference_queryset(model, source, references)
+    if "school_term" in filters:
+        # The same references are used for the objects of each school term
+        qs = qs.filter(school_term=filters["school_term"])
+
+    references_per_object = {}
+    for object_id, reference in qs.values_list("object_id", "reference"):
+        references_per_object.setdefault(object_id, []).append(reference)
+
+    objects = model.objects.filter(pk__in=qs.values("object_id"), **filters)
+    return [
+        (reference, obj) for obj in objects for reference in references_per_object.get(obj.pk, [])
+    ]
+
+
+def set_references(objects: Iterable[Tuple[Model, str]], source: str):
+    """Store import references for objects.
+
+    References are unique per school term of the objects. References which already
+    point to the same object are kept. References which point to other objects of
+    the same school term, e. g. objects which were deleted, are replaced, as are
+    other references of the objects, e. g. after their reference was changed.
+
+    :param objects: Pairs of objects and their references, which may be empty
+    :param source: Source of the import references
+    """
+    ImportReference = apps.get_model("csv_import", "ImportReference")
+
+    object_ids, objects_per_type = {}, {}
+    for obj, reference in objects:
+        content_type_id = ContentType.objects.get_for_model(obj).pk
+        objects_per_type.setdefault(content_type_id, set()).add(obj.pk)
+        if reference:
+            key = (content_type_id, getattr(obj, "school_term_id", None), reference)
+            object_ids[key] = obj.pk
+    if not objects_per_type:
+        return
+
+    query = Q(reference__in={reference for *__, reference in object_ids})
+    for content_type_id, pks in objects_per_type.items():
+        query |= Q(content_type_id=content_type_id, object_id__in=pks)
+
+    stale, current = [], set()
+    existing = ImportReference.objects.filter(query, source=source).values_list(
+        "pk", "content_type_id", "school_term_id", "reference", "object_id"
+    )
+    for pk, content_type_id, school_term_id, reference, object_id in existing:
+        key = (content_type_id, school_term_id, reference)
+        if object_ids.get(key) == object_id:
+            current.add(key)
+        elif key in object_ids or object_id in objects_per_type.get(content_type_id, ()):
+            stale.append(pk)
+
+    if stale:
+        ImportReference.objects.filter(pk__in=stale).delete()
+    ImportReference.objects.bulk_create(
+        [
+            ImportReference(
+                content_type_id=content_type_id,
+                object_id=object_id,
+                source=source,
+                reference=reference,
+                school_term_id=school_term_id,
+            )
+            for (content_type_id, school_term_id, reference), object_id in object_ids.items()
+            if (content_type_id, school_term_id, reference) not in current
+        ],
+        ignore_conflicts=True,
+    )
+
+
+@contextmanager
+def defer_references():
+    """Skip storing the references of saved objects, as the caller stores them in bulk."""
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+
+def sync_references(sender: type, instance: Model, created: bool, **kwargs):
+    """Store the import references of a saved object."""
+    if _deferred.get():
+        return
+
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and "extended_data" not in update_fields:
+        return
+
+    for field, source in REFERENCE_FIELDS.items():
+        reference = getattr(instance, field, None)
+        # New objects without a reference cannot have references yet
+        if reference or not created:
+            set_references([(instance, reference)], source)
+
+
+def delete_references(sender: type, instance: Model, **kwargs):
+    """Delete the import references of a deleted object."""
+    ImportReference = apps.get_model("csv_import", "ImportReference")
+
+    ImportReference.objects.filter(
+        content_type=ContentType.objects.get_for_model(sender), object_id=instance.pk
+    ).delete()
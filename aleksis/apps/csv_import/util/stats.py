@@ -0,0 +1,134 @@
+"""Timing and database statistics of import jobs."""
+
+from contextlib import contextmanager
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Dict, Iterator, List
+
+from django.db import connection
+
+#: Phases of an import in the order they happen for each chunk
+PHASES = ["read", "convert", "match", "prepare", "write", "process", "write_related", "deactivate"]
+
+
+def _new_entry() -> dict:
+    return {"seconds": 0.0, "queries": 0, "query_seconds": 0.0}
+
+
+class ImportStats:
+    """Measure wall time, database queries and database time of an import by phase.
+
+    Phases can be nested. Time and queries of a nested phase are also counted
+    for all phases around it, e. g. conversion is part of reading and the field
+    types are part of processing. If an import is split into partitions, the
+    statistics of all partitions are summed up.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.total = _new_entry()
+        self.phases: Dict[str, dict] = {}
+        self.field_types: Dict[str, dict] = {}
+        self._active: List[dict] = []
+
+    @contextmanager
+    def _measure(self, entry: dict) -> Iterator[None]:
+        self._active.append(entry)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            entry["seconds"] += perf_counter() - start
+            self._active.pop()
+
+    def measure(self, phase: str):
+        """Measure a phase of the import, to be used as context manager."""
+        return self._measure(self.phases.setdefault(phase, _new_entry()))
+
+    def measure_field_type(self, name: str):
+        """Measure processing with a field type, to be used as context manager."""
+        return self._measure(self.field_types.setdefault(name, _new_entry()))
+
+    @contextmanager
+    def record(self) -> Iterator[None]:
+        """Record the total time and all database queries of the import."""
+        with connection.execute_wrapper(self._execute), self._measure(self.total):
+            yield
+
+    def timed(self, phase: str, func: Callable) -> Callable:
+        """Wrap a function to add the time spent in it to a phase.
+
+        Unlike ``measure``, this is cheap enough for functions called for every value,
+        but the time is not added to surrounding phases and no queries are counted.
+        """
+        entry = self.phases.setdefault(phase, _new_entry())
+
+        @wraps(func)
+        def _timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                entry["seconds"] += perf_counter() - start
+
+        return _timed
+
+    def _execute(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - start
+            for entry in self._active:
+                entry["queries"] += 1
+                entry["query_seconds"] += duration
+
+    def merge(self, other: dict):
+        """Merge statistics of another part of the same import, as returned by ``as_dict``."""
+        self.rows += other["rows"]
+        for key in ("seconds", "queries", "query_seconds"):
+            self.total[key] += other[key]
+        for entries, other_entries in (
+            (self.phases, other["phases"]),
+            (self.field_types, other["field_types"]),
+        ):
+            for name, other_entry in other_entries.items():
+                entry = entries.setdefault(name, _new_entry())
+                for key in entry:
+                    entry[key] += other_entry[key]
+
+    def as_dict(self) -> dict:
+        """Get the statistics in a form which can be stored as JSON."""
+
+        def _round(entry: dict) -> dict:
+            return {
+                "seconds": round(entry["seconds"], 3),
+                "queries": entry["queries"],
+                "query_seconds": round(entry["query_seconds"], 3),
+            }
+
+        phases = sorted(
+            self.phases.items(),
+            key=lambda item: PHASES.index(item[0]) if item[0] in PHASES else len(PHASES),
+        )
+        return {
+            "rows": self.rows,
+            **_round(self.total),
+            "phases": {name: _round(entry) for name, entry in phases},
+            "field_types": {name: _round(entry) for name, entry in self.field_types.items()},
+        }
+
+
+def format_stats(stats: dict) -> List[str]:
+    """Format the statistics of an import job as lines of text."""
+    lines = [
+        f"{stats['rows']} rows: {stats['seconds']:.2f} s, {stats['queries']} queries "
+        f"({stats['query_seconds']:.2f} s)"
+    ]
+    for title, entries in (("", stats["phases"]), ("field type ", stats["field_types"])):
+        for name, entry in entries.items():
+            lines.append(
+                f"  {title}{name}: {entry['seconds']:.2f} s, {entry['queries']} queries "
+                f"({entry['query_seconds']:.2f} s)"
+            )
+    return lines
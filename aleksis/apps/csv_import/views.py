@@ -9,34 +9,45 @@ from aleksis.core.util.celery_progress import render_progress_page
 
 from .forms import CSVUploadForm
 from .models import ImportJob
-from .util.process import import_csv
+from .util.process import start_import
 
 
 @permission_required("csv_import.import_data_rule")
 def csv_import(request: HttpRequest) -> HttpResponse:
     context = {}
 
-    upload_form = CSVUploadForm()
+    upload_form = CSVUploadForm(user=request.user)
 
     if request.method == "POST":
-        upload_form = CSVUploadForm(request.POST, request.FILES)
+        upload_form = CSVUploadForm(request.POST, request.FILES, user=request.user)
 
         if upload_form.is_valid():
             import_job = ImportJob(
                 school_term=upload_form.cleaned_data["school_term"],
                 template=upload_form.cleaned_data["template"],
-                data_file=request.FILES["csv"],
+                full_sync=upload_form.cleaned_data["full_sync"],
+                dry_run=upload_form.cleaned_data["dry_run"],
+                force=upload_form.cleaned_data["force"],
+                parser_engine=upload_form.cleaned_data["parser_engine"],
+                profile=upload_form.cleaned_data.get("profile", False),
             )
-            import_job.save()
+            import_job.attach_file(request.FILES["csv"])
 
-            result = import_csv.delay(import_job.pk,)
+            result = start_import(import_job)
+
+            if import_job.dry_run:
+                progress_title = _("Compute changes …")
+                success_message = _("The changes were computed successfully.")
+            else:
+                progress_title = _("Import objects …")
+                success_message = _("The import was done successfully.")
 
             return render_progress_page(
                 request,
                 result,
                 title=_("Progress: Import data from CSV"),
-                progress_title=_("Import objects …"),
-                success_message=_("The import was done successfully."),
+                progress_title=progress_title,
+                success_message=success_message,
                 error_message=_("There was a problem while importing data."),
                 back_url=reverse("csv_import"),
             )